@@ -0,0 +1,8 @@
+""" Benchmarks of the notebook models. Each scenario is built
+programmatically at increasing scales, run for a short time, and timed.
+
+Run from the repository root:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --compare results.json
+"""
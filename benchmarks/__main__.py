@@ -0,0 +1,59 @@
+""" Command line interface of the benchmarks, e.g.
+
+    python -m benchmarks --scales 1 2 4 --output results.json
+    python -m benchmarks --scenarios logistic hipp --compare results.json
+    python -m benchmarks --scheduler calendar --scales 8 16
+    python -m benchmarks --hold 1000 100000 1000000
+
+exits with status 1 if a comparison finds a regression.
+"""
+import sys
+import argparse
+
+from .scenarios import SCENARIOS
+from .runner import run, save, load, compare, compare_schedulers, SCHEDULERS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='benchmark the notebook models')
+    parser.add_argument('--scenarios', nargs='+', default=None,
+                        choices=list(SCENARIOS), help='scenarios to run, all by default')
+    parser.add_argument('--scales', nargs='+', type=float, default=[1, 2, 4],
+                        help='population and environment scales')
+    parser.add_argument('--runtime', type=float, default=None,
+                        help='simulation time of every case, scenario defaults otherwise')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs of every case, the fastest is kept')
+    parser.add_argument('--no-isolate', action='store_true',
+                        help=('run every case in this process instead of a new one, '
+                              'peak memory is then the highest of all cases so far'))
+    parser.add_argument('--output', default=None, help='file to save results to')
+    parser.add_argument('--compare', default=None, help='baseline results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed fraction of slowdown before a regression')
+    parser.add_argument('--scheduler', default='heap', choices=list(SCHEDULERS),
+                        help='event scheduler of the simulations')
+    parser.add_argument('--hold', nargs='+', type=int, default=None,
+                        help='only time the schedulers alone at these numbers of pending events')
+    args = parser.parse_args(argv)
+
+    if args.hold:
+        compare_schedulers(args.hold)
+        return 0
+
+    # integer scales read better in the results
+    scales = [int(s) if float(s).is_integer() else s for s in args.scales]
+    results = run(args.scenarios, scales, args.runtime, args.repeat,
+                  isolate=not args.no_isolate, scheduler=args.scheduler)
+    if args.output:
+        save(results, args.output)
+    if args.compare:
+        regressions = compare(results, load(args.compare), args.tolerance)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
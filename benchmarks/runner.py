@@ -0,0 +1,345 @@
+""" Functions to run the benchmark scenarios, save the results and compare
+them with a saved baseline.
+"""
+import json
+import time
+import random
+import platform
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, peak memory is not reported
+    resource = None
+
+import numpy as np
+import datatable as dt
+
+from iebm import kernels
+from iebm.schedulers import HeapScheduler, CalendarQueue
+
+from .scenarios import SCENARIOS
+
+# event schedulers by name
+SCHEDULERS = {'heap' : HeapScheduler, 'calendar' : CalendarQueue}
+
+
+def _peak_memory():
+    "helper function to get the peak resident memory of this process, in MB"
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    if platform.system() == 'Darwin':
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+def run_case(name, scale, runtime=None, scheduler='heap'):
+    """ function to build and run one scenario at one scale, in the current
+    process
+
+    Parameters
+    ----------
+
+    name : str
+        scenario name, a key of SCENARIOS
+
+    scale : float
+        scale of the population sizes and environment
+
+    runtime : float or None
+        simulation time to run for, the scenario default if None
+
+    scheduler : str
+        name of the event scheduler, a key of SCHEDULERS
+
+    Returns
+    -------
+
+    result : dict
+        startup and run wall times, number of handled events, events per
+        second, peak memory of the process so far and initial and final
+        population sizes
+    """
+    dt.options.nthreads = 1
+    start = time.perf_counter()
+    if runtime is None:
+        sim, runtime = SCENARIOS[name](scale)
+    else:
+        sim, _ = SCENARIOS[name](scale, runtime=runtime)
+    if scheduler != 'heap':
+        queue = SCHEDULERS[scheduler]()
+        queue.rebuild(sim.event_heap)
+        sim.scheduler = queue
+    startup_time = time.perf_counter() - start
+    init_sizes = dict((p, sim.population_history[p][0])
+                      for p in sim.population_history)
+
+    start = time.perf_counter()
+    sim.run(runtime, progress_bar=False)
+    run_time = time.perf_counter() - start
+    # not the history length, a batch of events is stored once
+    events = sim.handled
+
+    return dict(scenario=name,
+                scale=scale,
+                scheduler=scheduler,
+                runtime=runtime,
+                sim_time=sim.time,
+                startup_time=startup_time,
+                run_time=run_time,
+                events=events,
+                events_per_sec=events / run_time if run_time > 0 else None,
+                peak_memory_mb=_peak_memory(),
+                init_sizes=init_sizes,
+                final_sizes=dict((p, sim.population_history[p][-1])
+                                 for p in sim.population_history))
+
+
+def _run_case_worker(args):
+    "helper function to run a case in a fresh worker process"
+    return run_case(*args)
+
+
+def run(scenarios=None, scales=(1, 2, 4), runtime=None, repeat=1,
+        isolate=True, verbose=True, scheduler='heap'):
+    """ function to run scenarios at increasing scales
+
+    Parameters
+    ----------
+
+    scenarios : list of str or None
+        scenario names, all if None
+
+    scales : list of float
+        scales to run every scenario at
+
+    runtime : float or None
+        simulation time of every case, scenario defaults if None
+
+    repeat : int
+        number of runs of every case, the fastest run is kept
+
+    isolate : bool
+        run every case in a new process, so the peak memory belongs to that
+        case alone. without, the peak memory is the highest of all cases so
+        far and is marked as such
+
+    verbose : bool
+        print every result
+
+    scheduler : str
+        name of the event scheduler, a key of SCHEDULERS
+
+    Returns
+    -------
+
+    results : dict
+        'meta' with versions and platform, 'results' with a list of case
+        results
+    """
+    if scenarios is None:
+        scenarios = list(SCENARIOS)
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError(f'unknown scenario {name}, '
+                             f'choose from {list(SCENARIOS)}')
+    if scheduler not in SCHEDULERS:
+        raise ValueError(f'unknown scheduler {scheduler}, '
+                         f'choose from {list(SCHEDULERS)}')
+
+    if isolate:
+        context = multiprocessing.get_context('spawn')
+
+    results = []
+    for name in scenarios:
+        for scale in scales:
+            runs = []
+            for _ in range(repeat):
+                if isolate:
+                    with context.Pool(1, maxtasksperchild=1) as pool:
+                        runs.append(pool.apply(_run_case_worker,
+                                               ((name, scale, runtime, scheduler),)))
+                else:
+                    runs.append(run_case(name, scale, runtime, scheduler))
+            best = max(runs, key=lambda x: x['events_per_sec'] or 0)
+            best['repeat'] = repeat
+            # the peak of the process includes all earlier cases
+            best['isolated'] = isolate
+            results.append(best)
+            if verbose:
+                print(format_result(best), flush=True)
+
+    meta = dict(python=platform.python_version(),
+                numpy=np.__version__,
+                datatable=dt.__version__,
+                kernels=kernels.BACKEND,
+                platform=platform.platform(),
+                date=time.strftime('%Y-%m-%d %H:%M:%S'))
+    return dict(meta=meta, results=results)
+
+
+def format_result(result):
+    "helper function to format a case result as one line"
+    memory = result['peak_memory_mb']
+    memory = 'n/a' if memory is None else f'{memory:.0f} MB'
+    if memory != 'n/a' and not result.get('isolated', True):
+        memory += ' (all cases so far)'
+    eps = result['events_per_sec'] or 0
+    # results saved before schedulers were added ran with the heap
+    scheduler = result.get('scheduler', 'heap')
+    return (f"{result['scenario']:<22} scale {result['scale']:<5} "
+            f"{scheduler:<8} events {result['events']:<8} {eps:10.1f} events/s  "
+            f"startup {result['startup_time']:7.3f} s  "
+            f"run {result['run_time']:8.3f} s  peak {memory}")
+
+
+def save(results, path):
+    "function to save results as JSON"
+    with open(path, 'w') as fp:
+        json.dump(results, fp, indent=1)
+
+
+def load(path):
+    "function to load saved results"
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def compare(results, baseline, tolerance=0.2, verbose=True):
+    """ function to compare results with a saved baseline. cases are
+    matched by scenario and scale
+
+    Parameters
+    ----------
+
+    results : dict
+        results of run()
+
+    baseline : dict
+        saved results of an earlier run()
+
+    tolerance : float
+        allowed fraction of slowdown in events per second and startup time
+        before a case counts as a regression
+
+    verbose : bool
+        print every comparison
+
+    Returns
+    -------
+
+    regressions : list of dict
+        cases slower than the baseline by more than the tolerance
+    """
+    base = dict(((r['scenario'], r['scale'], r.get('scheduler', 'heap')), r)
+                for r in baseline['results'])
+    regressions = []
+    for r in results['results']:
+        key = (r['scenario'], r['scale'], r.get('scheduler', 'heap'))
+        if key not in base:
+            continue
+        b = base[key]
+        # above 1 is faster than baseline
+        speed = ((r['events_per_sec'] or 0) / b['events_per_sec']
+                 if b['events_per_sec'] else None)
+        startup = (b['startup_time'] / r['startup_time']
+                   if r['startup_time'] > 0 else None)
+        slower = []
+        if speed is not None and speed < 1 - tolerance:
+            slower.append('events/s')
+        if startup is not None and startup < 1 - tolerance:
+            slower.append('startup')
+        if slower:
+            regressions.append(dict(scenario=r['scenario'], scale=r['scale'],
+                                    speed=speed, startup=startup,
+                                    slower=slower))
+        if verbose:
+            flag = 'REGRESSION ' + ', '.join(slower) if slower else 'ok'
+            speed_text = 'n/a' if speed is None else f'{speed:5.2f}x'
+            startup_text = 'n/a' if startup is None else f'{startup:5.2f}x'
+            print(f"{r['scenario']:<22} scale {r['scale']:<5} "
+                  f"events/s {speed_text}  startup {startup_text}  {flag}")
+    return regressions
+
+
+def hold(scheduler, size, operations=100000, seed=0):
+    """ function to time a scheduler alone with the classic hold model: the
+    queue is filled with size records, then every operation pops the next
+    record and pushes one a rate 1 exponential time later, like an
+    individual drawing its next event
+
+    Parameters
+    ----------
+
+    scheduler : str
+        name of the scheduler, a key of SCHEDULERS
+
+    size : int
+        number of pending records
+
+    operations : int
+        number of timed pop and push pairs
+
+    seed : int
+        seed of the event times
+
+    Returns
+    -------
+
+    result : dict
+        scheduler, size, wall time and operations per second
+    """
+    rng = random.Random(seed)
+    queue = SCHEDULERS[scheduler]()
+    for i in range(size):
+        queue.push((rng.expovariate(1.), hash(i), 0, i, np.nan, None))
+    times = [rng.expovariate(1.) for _ in range(operations)]
+
+    start = time.perf_counter()
+    for i in range(operations):
+        record = queue.pop()
+        queue.push((record[0] + times[i], hash(size + i), 0, record[3],
+                    np.nan, None))
+    run_time = time.perf_counter() - start
+
+    return dict(scheduler=scheduler, size=size, run_time=run_time,
+                ops_per_sec=operations / run_time)
+
+
+def compare_schedulers(sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6),
+                       operations=100000, verbose=True):
+    """ function to run the hold model with every scheduler at increasing
+    numbers of pending events, to see where each one wins. the heap is
+    faster with few pending events, the calendar queue keeps the same
+    speed as the queue grows
+
+    Parameters
+    ----------
+
+    sizes : list of int
+        numbers of pending records
+
+    operations : int
+        number of timed pop and push pairs of every case
+
+    verbose : bool
+        print every result
+
+    Returns
+    -------
+
+    results : list of dict
+        results of hold()
+    """
+    results = []
+    for size in sizes:
+        for scheduler in SCHEDULERS:
+            result = hold(scheduler, size, operations)
+            results.append(result)
+            if verbose:
+                print(f"{scheduler:<8} pending {size:<9} "
+                      f"{result['ops_per_sec']:10.1f} pop+push/s", flush=True)
+    return results
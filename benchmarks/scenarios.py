@@ -0,0 +1,415 @@
+""" Canonical scenarios from the notebooks in experiments/, built as
+functions of a scale. A scale multiplies the initial population sizes and
+carrying capacities, and the environment dimensions by its square root, so
+densities (and the rates of interactions) stay the same as in the notebooks.
+Runtimes are short so that a benchmark finishes in seconds at scale 1.
+
+Every scenario returns (sim, runtime), a ready Simulation and the time to
+run it for.
+"""
+import numpy as np
+import datatable as dt
+
+from iebm.populations.population2D import Population2D
+from iebm.populations.density_grid import DensityGrid
+from iebm.traits.static_trait import StaticTrait
+from iebm.traits.linked_trait import LinkedTrait
+from iebm.traits.mutable_trait import MutableTrait
+from iebm.traits.categorical_trait import CategoricalTrait
+from iebm.events.birth import BirthEvent
+from iebm.events.death import DeathEvent
+from iebm.events.wall import WallEvent
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.pause import Pause2DEvent
+from iebm.events.rotate import RotateEvent
+from iebm.events.infection import InfectionSIREvent
+from iebm.events.consume import ConsumeEvent
+from iebm.simulation import Simulation
+
+
+def _dims(xdim, ydim, scale):
+    "helper function to scale environment dimensions with the population"
+    return xdim * np.sqrt(scale), ydim * np.sqrt(scale)
+
+
+def exponential(scale=1, runtime=1000):
+    """ exponential growth, single population with birth and death """
+    xdim, ydim = _dims(500, 500, scale)
+    pop = Population2D(name='exp_pop', init_size=int(500 * scale),
+                       xdim=xdim, ydim=ydim)
+    pop.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : 0.0011}),
+                    (StaticTrait, {'name' : 'death_rate', 'value' : 0.0001})])
+    pop.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                  'current_time' : 0}),
+                    (DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                  'current_time' : 0})])
+    return Simulation({str(pop) : pop}), runtime
+
+
+def logistic(scale=1, runtime=3000):
+    """ logistic growth with an implicit carrying capacity """
+    xdim, ydim = _dims(50, 50, scale)
+    pop = Population2D(name='log_pop', init_size=int(50 * scale),
+                       implicit_capacity=int(2500 * scale),
+                       xdim=xdim, ydim=ydim)
+    pop.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : 0.0011}),
+                    (StaticTrait, {'name' : 'death_rate', 'value' : 0.0001})])
+    pop.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                  'current_time' : 0}),
+                    (DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                  'current_time' : 0})])
+    return Simulation({str(pop) : pop}), runtime
+
+
+def lotka_volterra(scale=1, runtime=10):
+    """ Lotka-Volterra, moving prey and predators """
+    r, a, d = 0.1, 1, 0.1
+    prey_radius = pred_radius = 1
+    xdim, ydim = _dims(50, 50, scale)
+    prey = Population2D(name='prey', init_size=int(200 * scale),
+                        xdim=xdim, ydim=ydim)
+    pred = Population2D(name='pred', init_size=int(200 * scale),
+                        xdim=xdim, ydim=ydim)
+    vel = a * np.pi / (8 * (prey_radius + pred_radius))
+
+    prey.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : r}),
+                     (StaticTrait, {'name' : 'radius', 'value' : prey_radius}),
+                     (LinkedTrait, {'name' : 'predation_radius',
+                                    'link_trait' : 'radius',
+                                    'link_func' : lambda x : x}),
+                     (StaticTrait, {'name' : 'velocity', 'value' : vel})])
+    prey.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                  'bounce' : 'random', 'current_time' : 0}),
+                     (DeathEvent, {'name' : 'death', 'is_primary' : False,
+                                   'current_time' : 0})])
+    pred.add_traits([(StaticTrait, {'name' : 'radius', 'value' : pred_radius}),
+                     (LinkedTrait, {'name' : 'predation_radius',
+                                    'link_trait' : 'radius',
+                                    'link_func' : lambda x : x}),
+                     (StaticTrait, {'name' : 'velocity', 'value' : vel}),
+                     (StaticTrait, {'name' : 'death_rate', 'value' : d})])
+    pred.add_events([(DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                  'bounce' : 'random', 'current_time' : 0}),
+                     (Interact2DEvent, {'name' : 'predation',
+                                        'is_primary' : True,
+                                        'current_time' : 0, 'other' : prey}),
+                     (BirthEvent, {'name' : 'birth', 'is_primary' : False,
+                                   'current_time' : 0})])
+
+    prey.event_dict['birth'].triggers = pred.event_dict['predation'].set_other_next
+    def predation_trigger(params):
+        events = []
+        other_params = params.copy()
+        other_params['actor_id'] = other_params['extra']
+        events += prey.event_dict['death'].handle(other_params)
+        events += pred.event_dict['birth'].handle(params)
+        return events
+    pred.event_dict['predation'].triggers = predation_trigger
+    prey.event_dict['wall'].triggers = pred.event_dict['predation'].set_other_next
+    pred.event_dict['wall'].triggers = pred.event_dict['predation'].set_next
+
+    return Simulation({str(prey) : prey, str(pred) : pred}), runtime
+
+
+def _consumer_resource(scale, k, stoppage=None, hunt=None, evolve=None,
+                       pairs=False, dtypes='default'):
+    """ helper function to build the Rosenzweig-MacArthur family of models:
+    stationary prey with an implicit capacity and predators with handling
+    times. optionally with interference (stoppage), hunting (hunt radius
+    and rate factors) and an evolving predator radius. pairs handles every
+    interference once for both predators, dtypes is the storage profile of
+    both populations"""
+    r, a, d, h = 0.001, 1, 0.001, 75
+    prey_radius = pred_radius = 1.
+    xdim, ydim = _dims(500, 500, scale)
+    prey = Population2D(name='prey', init_size=int(100 * scale),
+                        xdim=xdim, ydim=ydim,
+                        implicit_capacity=int(k * scale), dtypes=dtypes)
+    pred = Population2D(name='pred', init_size=int(100 * scale),
+                        xdim=xdim, ydim=ydim, dtypes=dtypes)
+    vel = a / (2 * (prey_radius + pred_radius))
+
+    prey.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : r}),
+                     (StaticTrait, {'name' : 'radius', 'value' : prey_radius}),
+                     (LinkedTrait, {'name' : 'predation_radius',
+                                    'link_trait' : 'radius',
+                                    'link_func' : lambda x : x})])
+    prey.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (DeathEvent, {'name' : 'death', 'is_primary' : False,
+                                   'current_time' : 0})])
+
+    if evolve is None:
+        trait_pred = [(StaticTrait, {'name' : 'radius', 'value' : pred_radius}),
+                      (StaticTrait, {'name' : 'velocity', 'value' : vel}),
+                      (StaticTrait, {'name' : 'death_rate', 'value' : d})]
+    else:
+        bmet = d / (pred_radius ** (-1 / 4))
+        trait_pred = [(MutableTrait, {'name' : 'radius', 'track' : True,
+                                      'value' : pred_radius,
+                                      'min_value' : evolve['min_radius'],
+                                      'mutate_rate' : evolve['mutate_rate'],
+                                      'mutate_step' : evolve['mutate_step']}),
+                      (LinkedTrait, {'name' : 'velocity',
+                                     'link_trait' : 'radius',
+                                     'link_func' : lambda x : a / (2 * (prey_radius + x))}),
+                      (LinkedTrait, {'name' : 'death_rate',
+                                     'link_trait' : 'radius',
+                                     'link_func' : lambda x : bmet * x ** (-1 / 4)})]
+    trait_pred += [(LinkedTrait, {'name' : 'predation_radius',
+                                  'link_trait' : 'radius',
+                                  'link_func' : lambda x : x}),
+                   (StaticTrait, {'name' : 'handling', 'value' : h})]
+    event_pred = [(DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                'current_time' : 0}),
+                  (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                               'current_time' : 0, 'bounce' : 'random'}),
+                  (Interact2DEvent, {'name' : 'predation', 'is_primary' : True,
+                                     'current_time' : 0, 'other' : prey}),
+                  (Pause2DEvent, {'name' : 'handling',
+                                  'ignore_list' : ['death'],
+                                  'is_primary' : False}),
+                  (BirthEvent, {'name' : 'birth', 'is_primary' : False,
+                                'current_time' : 0})]
+    if stoppage is not None:
+        trait_pred += [(LinkedTrait, {'name' : 'interfer_radius',
+                                      'link_trait' : 'radius',
+                                      'link_func' : lambda x : x}),
+                       (StaticTrait, {'name' : 'stoppage', 'value' : stoppage})]
+        event_pred += [(Interact2DEvent, {'name' : 'interfer',
+                                          'is_primary' : True,
+                                          'current_time' : 0,
+                                          'pairs' : pairs}),
+                       (Pause2DEvent, {'name' : 'stoppage',
+                                       'ignore_list' : ['death'],
+                                       'is_primary' : False})]
+    if hunt is not None:
+        radius_factor, rate_factor = hunt
+        trait_pred += [(LinkedTrait, {'name' : 'hunt_radius',
+                                      'link_trait' : 'radius',
+                                      'link_func' : lambda x : x * radius_factor}),
+                       (LinkedTrait, {'name' : 'hunt_rate',
+                                      'link_trait' : 'death_rate',
+                                      'link_func' : lambda x : x * rate_factor})]
+        event_pred += [(RotateEvent, {'name' : 'hunt', 'is_primary' : True,
+                                      'attract_population' : prey,
+                                      'current_time' : 0})]
+    pred.add_traits(trait_pred)
+    pred.add_events(event_pred)
+
+    interactions = ['predation'] + (['interfer'] if stoppage is not None else [])
+    for pause in ['handling'] + (['stoppage'] if stoppage is not None else []):
+        ignore_list = pred.event_dict[pause].ignore_list
+        pred.event_dict[pause].set_list = [c for c in pred.event_list
+                                           if c not in ignore_list]
+
+    def prey_birth(params):
+        new_events = []
+        new_events += pred.event_dict['predation'].set_other_next(params)
+        if hunt is not None:
+            new_events += pred.event_dict['hunt'].add_attracted(params)
+        return new_events
+    prey.event_dict['birth'].triggers = prey_birth
+    if hunt is not None:
+        prey.event_dict['death'].triggers = pred.event_dict['hunt'].remove_attracted
+
+    def predation_trigger(params):
+        events = []
+        other_params = params.copy()
+        other_params['actor_id'] = other_params['extra']
+        events += prey.event_dict['death'].handle(other_params)
+        events += pred.event_dict['handling'].set_next(params)
+        return events
+    pred.event_dict['predation'].triggers = predation_trigger
+
+    def resume_trigger(params):
+        events = []
+        pred.event_dict['wall'].set_next(params)
+        for e in interactions:
+            pred.event_dict[e].set_next(params)
+        events += [pred.get_next_event(params['actor_id'])]
+        return events
+
+    def handle_trigger(params):
+        events = []
+        pred.event_dict['wall'].set_next(params)
+        for e in interactions:
+            pred.event_dict[e].set_next(params)
+        events += pred.event_dict['birth'].handle(params)
+        events += [pred.get_next_event(params['actor_id'])]
+        return events
+    pred.event_dict['handling'].triggers = handle_trigger
+
+    if stoppage is not None:
+        def stoppage_trigger(params):
+            events = []
+            other_params = params.copy()
+            other_params['actor_id'] = other_params['extra']
+            events += pred.event_dict['stoppage'].set_next(other_params)
+            events += pred.event_dict['stoppage'].set_next(params)
+            return events
+        pred.event_dict['interfer'].triggers = stoppage_trigger
+        pred.event_dict['stoppage'].triggers = resume_trigger
+
+    def new_interactions(params):
+        new_events = []
+        for e in interactions:
+            pred.event_dict[e].set_next(params)
+        return new_events
+    pred.event_dict['wall'].triggers = new_interactions
+    if hunt is not None:
+        pred.event_dict['hunt'].triggers = resume_trigger
+
+    return Simulation({str(prey) : prey, str(pred) : pred})
+
+
+def rosenzweig_macarthur(scale=1, runtime=3000):
+    """ Rosenzweig-MacArthur, predators with handling times """
+    return _consumer_resource(scale, k=2000), runtime
+
+
+def rosenzweig_macarthur_grid(scale=1, runtime=3000):
+    """ Rosenzweig-MacArthur with the prey as a density grid of 50 x 50
+    cells, predators consume from the cell they are in. offspring of the
+    prey land anywhere, like in rosenzweig_macarthur """
+    r, a, d, h, k = 0.001, 1, 0.001, 75, 2000
+    prey_radius = pred_radius = 1.
+    xdim, ydim = _dims(500, 500, scale)
+    cells = (max(int(xdim // 50), 1), max(int(ydim // 50), 1))
+    prey = DensityGrid(name='prey', init_size=int(100 * scale),
+                       xdim=xdim, ydim=ydim, cells=cells, growth_rate=r,
+                       implicit_capacity=int(k * scale), radius=prey_radius,
+                       dispersal='global')
+    pred = Population2D(name='pred', init_size=int(100 * scale),
+                        xdim=xdim, ydim=ydim)
+    vel = a / (2 * (prey_radius + pred_radius))
+    pred.add_traits([(StaticTrait, {'name' : 'radius', 'value' : pred_radius}),
+                     (StaticTrait, {'name' : 'velocity', 'value' : vel}),
+                     (StaticTrait, {'name' : 'death_rate', 'value' : d}),
+                     (StaticTrait, {'name' : 'handling', 'value' : h})])
+    pred.add_events([(DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                  'current_time' : 0, 'bounce' : 'random'}),
+                     (ConsumeEvent, {'name' : 'predation', 'is_primary' : True,
+                                     'current_time' : 0, 'resource' : prey}),
+                     (Pause2DEvent, {'name' : 'handling',
+                                     'ignore_list' : ['death'],
+                                     'is_primary' : False}),
+                     (BirthEvent, {'name' : 'birth', 'is_primary' : False,
+                                   'current_time' : 0})])
+    handling = pred.event_dict['handling']
+    handling.set_list = [c for c in pred.event_list
+                         if c not in handling.ignore_list]
+
+    pred.event_dict['predation'].triggers = handling.set_next
+
+    def handle_trigger(params):
+        events = []
+        pred.event_dict['wall'].set_next(params)
+        pred.event_dict['predation'].set_next(params)
+        events += pred.event_dict['birth'].handle(params)
+        events += [pred.get_next_event(params['actor_id'])]
+        return events
+    handling.triggers = handle_trigger
+
+    return Simulation({str(prey) : prey, str(pred) : pred}), runtime
+
+
+def interfering(scale=1, runtime=3000):
+    """ interfering predator-prey, predators stop when they collide """
+    return _consumer_resource(scale, k=2000, stoppage=5), runtime
+
+
+def interfering_pairs(scale=1, runtime=3000):
+    """ interfering predator-prey, every collision of two predators handled
+    once for both """
+    return _consumer_resource(scale, k=2000, stoppage=5, pairs=True), runtime
+
+
+def interfering_compact(scale=1, runtime=3000):
+    """ interfering predator-prey, stored in float32 and int32 columns """
+    return _consumer_resource(scale, k=2000, stoppage=5, dtypes='compact'), runtime
+
+
+def hipp(scale=1, runtime=600):
+    """ hunting and interfering predator-prey (HIPP) """
+    return _consumer_resource(scale, k=2000, stoppage=5, hunt=(10, 100)), runtime
+
+
+def evolving_hipp(scale=1, runtime=600):
+    """ HIPP with a mutable predator radius """
+    evolve = dict(min_radius=0.2, mutate_rate=0.01, mutate_step=0.01)
+    return _consumer_resource(scale, k=2000, stoppage=5, hunt=(10, 100),
+                              evolve=evolve), runtime
+
+
+def kermack_mckendrick(scale=1, runtime=400, pairs=False, dtypes='default'):
+    """ Kermack-McKendrick SIR with moving individuals, with pairs every
+    contact is handled once for both individuals. dtypes is the storage
+    profile of the population """
+    b, d, radius = 1000, 0.001, 1
+    pop_size = int(1000 * scale)
+    xdim, ydim = _dims(500, 500, scale)
+    pop = Population2D(name='pop', init_size=pop_size, xdim=xdim, ydim=ydim,
+                       dtypes=dtypes)
+    vel = b * np.pi / (8 * (radius + radius)) / 1000
+    pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : radius}),
+                    (LinkedTrait, {'name' : 'interact_radius',
+                                   'link_trait' : 'radius',
+                                   'link_func' : lambda x : x}),
+                    (StaticTrait, {'name' : 'velocity', 'value' : vel}),
+                    (CategoricalTrait, {'name' : 'infection',
+                                        'categories' : ['susceptible',
+                                                        'infected',
+                                                        'recovered'],
+                                        'fractions' : [0.9, 0.1, 0],
+                                        'track' : True}),
+                    (StaticTrait, {'name' : 'recovery_rate', 'value' : d})])
+    pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                 'current_time' : 0, 'bounce' : 'random'}),
+                    (Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                       'current_time' : 0, 'pairs' : pairs}),
+                    (InfectionSIREvent, {'name' : 'infection',
+                                         'is_primary' : False,
+                                         'current_time' : 0})])
+    pop.event_dict['wall'].triggers = pop.event_dict['interact'].set_next
+    pop.event_dict['interact'].triggers = pop.event_dict['infection'].handle
+
+    sim = Simulation({str(pop) : pop})
+    infected = pop.trait_dict['infection'].code('infected')
+    for i in pop.df[dt.f.infection == infected, 'id'].to_numpy().reshape(-1):
+        params = dict(actor_id=i, current_time=0)
+        sim.schedule(pop.event_dict['infection'].set_next(params)[0])
+    return sim, runtime
+
+
+def kermack_mckendrick_pairs(scale=1, runtime=400):
+    """ Kermack-McKendrick SIR, every contact handled once for both
+    individuals """
+    return kermack_mckendrick(scale, runtime, pairs=True)
+
+
+def kermack_mckendrick_compact(scale=1, runtime=400):
+    """ Kermack-McKendrick SIR, stored in float32 and int32 columns """
+    return kermack_mckendrick(scale, runtime, dtypes='compact')
+
+
+# all scenarios, in the order they are run
+SCENARIOS = {'exponential' : exponential,
+             'logistic' : logistic,
+             'lotka_volterra' : lotka_volterra,
+             'rosenzweig_macarthur' : rosenzweig_macarthur,
+             'rosenzweig_macarthur_grid' : rosenzweig_macarthur_grid,
+             'interfering' : interfering,
+             'interfering_pairs' : interfering_pairs,
+             'interfering_compact' : interfering_compact,
+             'hipp' : hipp,
+             'evolving_hipp' : evolving_hipp,
+             'kermack_mckendrick' : kermack_mckendrick,
+             'kermack_mckendrick_pairs' : kermack_mckendrick_pairs,
+             'kermack_mckendrick_compact' : kermack_mckendrick_compact}
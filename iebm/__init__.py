@@ -0,0 +1,65 @@
+""" Individual-based, event-driven ecological models.
+
+The public classes can be imported from the package directly,
+
+    from iebm import Population2D, StaticTrait, WallEvent, Simulation
+
+and are only imported the first time they are used, so importing iebm is
+fast, e.g. in spawned worker processes. Heavy optional dependencies are
+imported by the events that need them, rtree and scipy by the diffusion
+birth and rotate events, tqdm by progress bars.
+"""
+
+# public name -> module it is defined in
+_API = {
+    # populations
+    'Population2D' : 'populations.population2D',
+    'DensityGrid' : 'populations.density_grid',
+    # traits
+    'StaticTrait' : 'traits.static_trait',
+    'LinkedTrait' : 'traits.linked_trait',
+    'MutableTrait' : 'traits.mutable_trait',
+    'CategoricalTrait' : 'traits.categorical_trait',
+    # events
+    'BirthEvent' : 'events.birth',
+    'BirthDiffusionEvent' : 'events.birth',
+    'DeathEvent' : 'events.death',
+    'WallEvent' : 'events.wall',
+    'Interact2DEvent' : 'events.interact2d',
+    'Pause2DEvent' : 'events.pause',
+    'RotateEvent' : 'events.rotate',
+    'ConsumeEvent' : 'events.consume',
+    'InfectionSIREvent' : 'events.infection',
+    'CompartmentalInfectionEvent' : 'events.infection',
+    # simulations
+    'Simulation' : 'simulation',
+    'TiledSimulation' : 'tiles',
+    'Ensemble' : 'ensemble',
+    'ModelSpec' : 'spec',
+    'HeapScheduler' : 'schedulers',
+    'CalendarQueue' : 'schedulers',
+    # results and diagnostics
+    'EventLog' : 'eventlog',
+    'Profiler' : 'profiler',
+    'TrajectoryRecorder' : 'trajectory',
+    'TrajectoryReader' : 'trajectory',
+    'NPZSink' : 'sinks',
+    'ParquetSink' : 'sinks',
+    'ArrowSink' : 'sinks',
+}
+
+__all__ = list(_API)
+
+
+def __getattr__(name):
+    # import the module of a public name on first use, see PEP 562
+    if name in _API:
+        import importlib
+        value = getattr(importlib.import_module(f'.{_API[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,569 @@
+import numpy as np
+
+
+class EnsemblePopulation():
+    """ Stacked state of one population in all replicates of an Ensemble.
+    Every array has one row per replicate and one column per slot.
+    Slots of dead individuals are reused by offspring, and all arrays
+    grow together once a replicate runs out of slots.
+    """
+
+    # per-slot arrays, grown together
+    arrays = ['alive', 'x', 'y', 'vx', 'vy', 'birth_time', 'death_time',
+              'wall_time', 'interact_time', 'partner', 'pause_time', 'paused',
+              'pause_vx', 'pause_vy']
+
+    def __init__(self, name, replicates, init_size, xdim, ydim,
+                 birth_rate=None, death_rate=None, velocity=0, radius=1,
+                 implicit_capacity=None):
+        """ Constructor for a stacked population
+
+        Parameters
+        ----------
+
+        name : str
+            unique identifier
+
+        replicates : int
+            number of replicates
+
+        init_size : int
+            initial size in every replicate
+
+        xdim, ydim : float
+            size of the 2D environment
+
+        birth_rate, death_rate : float or None
+            per individual rates, no births or deaths if None. without a
+            death rate individuals only die by predation
+
+        velocity : float
+            speed of moving individuals, 0 for stationary ones. moving
+            individuals bounce off the walls in a random direction
+
+        radius : float
+            size of individuals, for walls and predation
+
+        implicit_capacity : int or None
+            limit the population size, like Population2D
+        """
+        self.name = name
+        self.xdim = xdim
+        self.ydim = ydim
+        self.birth_rate = birth_rate
+        self.death_rate = death_rate
+        self.velocity = velocity
+        self.radius = radius
+        self.implicit_capacity = implicit_capacity
+        # set by Ensemble.add_predation
+        self.prey = None
+        self.predators = []
+        self.handling = 0
+        self.conversion = 1
+
+        shape = (replicates, max(2 * init_size, 16))
+        self.alive = np.zeros(shape, dtype=bool)
+        self.x = np.zeros(shape)
+        self.y = np.zeros(shape)
+        self.vx = np.zeros(shape)
+        self.vy = np.zeros(shape)
+        self.pause_vx = np.zeros(shape)
+        self.pause_vy = np.zeros(shape)
+        self.paused = np.zeros(shape, dtype=bool)
+        self.partner = np.zeros(shape, dtype=np.int64)
+        for k in ('birth_time', 'death_time', 'wall_time', 'interact_time',
+                  'pause_time'):
+            setattr(self, k, np.full(shape, np.inf))
+        self.size = np.zeros(replicates, dtype=np.int64)
+        self.init_size = init_size
+
+    @property
+    def capacity(self):
+        return self.alive.shape[1]
+
+    def grow(self):
+        "function to double the number of slots of every replicate"
+        n = self.capacity
+        for k in self.arrays:
+            a = getattr(self, k)
+            fill = np.inf if a.dtype == np.float64 and k.endswith('_time') else 0
+            setattr(self, k, np.concatenate(
+                [a, np.full(a.shape, fill, dtype=a.dtype)], 1))
+        return n
+
+    def __repr__(self):
+        return self.name
+
+
+class Ensemble():
+    """ Batched engine running many independent replicates of the same
+    model in one process. The state of every population is stacked in
+    (replicates x individuals) arrays, and the replicates advance in
+    lockstep: every step each replicate handles its own next event, with
+    the event kernels (births, deaths, walls, predation) vectorized over
+    all replicates that handle the same kind of event.
+
+    This is a separate engine, not a batched Simulation. It only handles
+    populations with static rates and predation between pairs of
+    populations: the exponential, logistic, Lotka-Volterra and
+    Rosenzweig-MacArthur models of the notebooks. Its event logic
+    duplicates the Population2D events (random wall bounces, collision
+    times of straight-line movement, implicit capacities, predators that
+    pause to handle prey before reproducing), so changes to those events
+    have to be made here too. Results agree with Simulation in
+    distribution, not run by run. Models with other events, triggers or
+    evolving traits need Simulation.
+
+    Example
+    -------
+    ens = Ensemble(replicates=99, xdim=500, ydim=500)
+    ens.add_population('prey', init_size=100, birth_rate=0.001,
+                       implicit_capacity=2000)
+    ens.add_population('pred', init_size=100, death_rate=0.001, velocity=0.25)
+    ens.add_predation('pred', 'prey', handling=75)
+    ens.run(10000)
+    res = ens.get_results() # list of Simulation.get_results() like dicts
+    """
+
+    def __init__(self, replicates, xdim, ydim, continue_threshold=3,
+                 record_interval=None, seed=None):
+        """ Constructor for an ensemble of replicates
+
+        Parameters
+        ----------
+
+        replicates : int
+            number of independent replicates
+
+        xdim, ydim : float
+            size of the 2D environment
+
+        continue_threshold : int
+            a replicate stops once a population is at or below this size,
+            like Simulation
+
+        record_interval : float or None
+            record sizes at most once per interval of simulated time in
+            every replicate. after every event if None
+
+        seed : int or None
+            seed of the random numbers of the ensemble, fresh entropy if
+            None. the global numpy random state is not used
+        """
+        # own random numbers, the global numpy state is left alone
+        self.random = np.random.RandomState(seed)
+        self.replicates = replicates
+        self.xdim = xdim
+        self.ydim = ydim
+        self.continue_threshold = continue_threshold
+        self.record_interval = record_interval
+        self.population_dict = {}
+        self.time = np.zeros(replicates)
+        self.done = np.zeros(replicates, dtype=bool)
+        self.started = False
+        self.steps = 0
+        self.events = 0
+
+    def add_population(self, name, init_size, birth_rate=None, death_rate=None,
+                       velocity=0, radius=1, implicit_capacity=None):
+        """ function to add a population, see EnsemblePopulation for the
+        parameters
+
+        Returns
+        -------
+
+        population : EnsemblePopulation
+        """
+        pop = EnsemblePopulation(name, self.replicates, init_size, self.xdim,
+                                 self.ydim, birth_rate, death_rate, velocity,
+                                 radius, implicit_capacity)
+        self.population_dict[name] = pop
+        return pop
+
+    def add_predation(self, predator, prey, handling=0, conversion=1):
+        """ function to let a population eat another one on contact
+
+        Parameters
+        ----------
+
+        predator, prey : str
+            population names. a predator eats a single prey population
+
+        handling : float
+            time a predator stands still after eating, before it can
+            reproduce. reproduces right away if 0
+
+        conversion : float
+            chance a predator has an offspring after eating
+        """
+        pred = self.population_dict[predator]
+        if pred.prey is not None:
+            raise ValueError(f'{pred} already eats {pred.prey}')
+        pred.prey = self.population_dict[prey]
+        pred.handling = handling
+        pred.conversion = conversion
+        self.population_dict[prey].predators.append(pred)
+
+    def start(self):
+        "function to place the initial individuals and draw their events"
+        self.kinds = []
+        for p in self.population_dict:
+            pop = self.population_dict[p]
+            reps = np.repeat(np.arange(self.replicates), pop.init_size)
+            self.spawn(pop, reps, predict=False)
+            if pop.birth_rate:
+                self.kinds.append((pop, 'birth'))
+            if pop.death_rate:
+                self.kinds.append((pop, 'death'))
+            if pop.velocity > 0:
+                self.kinds.append((pop, 'wall'))
+            if pop.prey is not None:
+                self.kinds.append((pop, 'interact'))
+                if pop.handling > 0:
+                    self.kinds.append((pop, 'pause'))
+        # predictions once all populations are placed
+        for p in self.population_dict:
+            pop = self.population_dict[p]
+            if pop.prey is not None:
+                reps, slots = np.nonzero(pop.alive)
+                self.predict(pop, reps, slots)
+        self.next_record = np.zeros(self.replicates)
+        self.history = []
+        self.record(np.arange(self.replicates))
+        self.started = True
+
+    def spawn(self, pop, reps, predict=True):
+        """ function to add one new individual to each given replicate, at
+        a random position and with a random direction
+
+        Parameters
+        ----------
+
+        pop : EnsemblePopulation
+            population of the new individuals
+
+        reps : array of int
+            replicate of each new individual, can repeat
+
+        predict : bool
+            predict interactions of and with the new individuals
+
+        Returns
+        -------
+
+        slots : array of int
+            slot of each new individual
+        """
+        reps = np.asarray(reps, dtype=np.int64)
+        slots = np.empty(len(reps), dtype=np.int64)
+        # replicates can get several individuals, place them in rounds
+        order = np.argsort(reps, kind='stable')
+        first = np.r_[True, reps[order][1:] != reps[order][:-1]]
+        rank = np.arange(len(reps)) - np.maximum.accumulate(
+            np.where(first, np.arange(len(reps)), 0))
+        for k in range(rank.max() + 1 if len(reps) > 0 else 0):
+            sel = order[rank == k]
+            r = reps[sel]
+            while (pop.size[r] >= pop.capacity).any():
+                pop.grow()
+            s = np.argmin(pop.alive[r], 1)
+            pop.alive[r, s] = True
+            pop.size[r] += 1
+            slots[sel] = s
+
+        n = len(reps)
+        t = self.time[reps]
+        pop.x[reps, slots] = self.random.rand(n) * self.xdim
+        pop.y[reps, slots] = self.random.rand(n) * self.ydim
+        angle = self.random.rand(n) * 2 * np.pi
+        pop.vx[reps, slots] = np.cos(angle) * pop.velocity
+        pop.vy[reps, slots] = np.sin(angle) * pop.velocity
+        pop.paused[reps, slots] = False
+        pop.interact_time[reps, slots] = np.inf
+        pop.pause_time[reps, slots] = np.inf
+        if pop.birth_rate:
+            pop.birth_time[reps, slots] = self.random.exponential(
+                1 / pop.birth_rate, n) + t
+        if pop.death_rate:
+            pop.death_time[reps, slots] = self.random.exponential(
+                1 / pop.death_rate, n) + t
+        if pop.velocity > 0:
+            pop.wall_time[reps, slots] = self.wall_times(pop, reps, slots)
+        if predict:
+            if pop.prey is not None:
+                self.predict(pop, reps, slots)
+            for pred in pop.predators:
+                self.notify(pred, reps, slots)
+        return slots
+
+    def remove(self, pop, reps, slots):
+        "function to remove individuals, their slots are free again"
+        pop.alive[reps, slots] = False
+        pop.size[reps] -= 1
+        pop.vx[reps, slots] = 0
+        pop.vy[reps, slots] = 0
+        pop.paused[reps, slots] = False
+        for k in ('birth_time', 'death_time', 'wall_time', 'interact_time',
+                  'pause_time'):
+            getattr(pop, k)[reps, slots] = np.inf
+
+    def wall_times(self, pop, reps, slots):
+        """ function to get the times individuals next reach a wall, like
+        WallEvent
+
+        Returns
+        -------
+
+        times : array of float
+            absolute wall times, inf if not moving
+        """
+        x, y = pop.x[reps, slots], pop.y[reps, slots]
+        vx, vy = pop.vx[reps, slots], pop.vy[reps, slots]
+        r = pop.radius
+        with np.errstate(divide='ignore', invalid='ignore'):
+            times = np.stack([(r - x) / vx, (self.xdim - r - x) / vx,
+                              (r - y) / vy, (self.ydim - r - y) / vy], 1)
+        times[~(times > 0)] = np.inf
+        return times.min(1) + self.time[reps]
+
+    def collision_times(self, pred, px, py, pvx, pvy, prey, qx, qy, qvx, qvy):
+        """ function to get the times predators and prey first touch when
+        moving in straight lines, like Interact2DEvent. arrays broadcast
+
+        Returns
+        -------
+
+        times : array of float
+            relative times, inf if they never touch
+        """
+        dx, dy = qx - px, qy - py
+        dvx, dvy = qvx - pvx, qvy - pvy
+        a = dvx ** 2 + dvy ** 2
+        b = 2 * (dx * dvx + dy * dvy)
+        c = dx ** 2 + dy ** 2 - (pred.radius + prey.radius) ** 2
+        disc = b ** 2 - 4 * a * c
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # both roots forward, the first one is the contact
+            t1 = (-b + np.sqrt(disc)) / (2 * a)
+            t2 = (-b - np.sqrt(disc)) / (2 * a)
+        ok = (disc >= 0) & ~np.isclose(a, 0) & (t1 >= 0) & (t2 >= 0)
+        return np.where(ok, t2, np.inf)
+
+    def predict(self, pred, reps, slots):
+        """ function to set the next predation of predators with all prey of
+        their replicate, like Interact2DEvent.set_next """
+        if len(reps) == 0:
+            return
+        prey = pred.prey
+        times = self.collision_times(
+            pred, pred.x[reps, slots, None], pred.y[reps, slots, None],
+            pred.vx[reps, slots, None], pred.vy[reps, slots, None],
+            prey, prey.x[reps], prey.y[reps], prey.vx[reps], prey.vy[reps])
+        times[~prey.alive[reps]] = np.inf
+        partner = times.argmin(1)
+        best = times[np.arange(len(reps)), partner]
+        # paused predators do not hunt
+        best[pred.paused[reps, slots]] = np.inf
+        pred.interact_time[reps, slots] = best + self.time[reps]
+        pred.partner[reps, slots] = partner
+
+    def notify(self, pred, reps, slots):
+        """ function to give predators a new or turned prey, taken if sooner
+        than their next predation, like Interact2DEvent.set_other_next """
+        if len(reps) == 0:
+            return
+        prey = pred.prey
+        # one prey per replicate at a time, replicates can repeat
+        order = np.argsort(reps, kind='stable')
+        reps, slots = reps[order], slots[order]
+        first = np.r_[True, reps[1:] != reps[:-1]]
+        while len(reps) > 0:
+            r, s = reps[first], slots[first]
+            times = self.collision_times(
+                pred, pred.x[r], pred.y[r], pred.vx[r], pred.vy[r],
+                prey, prey.x[r, s, None], prey.y[r, s, None],
+                prey.vx[r, s, None], prey.vy[r, s, None]) + self.time[r, None]
+            times[~pred.alive[r] | pred.paused[r]] = np.inf
+            current = pred.interact_time[r]
+            sooner = times < current
+            pred.interact_time[r] = np.where(sooner, times, current)
+            pred.partner[r] = np.where(sooner, s[:, None], pred.partner[r])
+            reps, slots = reps[~first], slots[~first]
+            first = np.r_[True, reps[1:] != reps[:-1]] if len(reps) else first[:0]
+
+    def turn(self, pop, reps, slots):
+        """ function to give individuals a random direction and new wall
+        times, nudged off a wall they are on, like WallEvent.set_next """
+        n = len(reps)
+        angle = self.random.rand(n) * 2 * np.pi
+        r = pop.radius
+        for pos, dim in ((pop.x, self.xdim), (pop.y, self.ydim)):
+            p = pos[reps, slots]
+            p = np.where(p <= 1.1 * r, 2 * r, p)
+            p = np.where(p >= dim - 1.1 * r, dim - 2 * r, p)
+            pos[reps, slots] = p
+        pop.vx[reps, slots] = np.cos(angle) * pop.velocity
+        pop.vy[reps, slots] = np.sin(angle) * pop.velocity
+        pop.wall_time[reps, slots] = self.wall_times(pop, reps, slots)
+
+    def offspring(self, pop, reps, chance=1):
+        """ function to add an offspring to each given replicate, after the
+        conversion chance and the implicit capacity check, like
+        BirthEvent.count_births """
+        born = self.random.rand(len(reps)) <= chance
+        if pop.implicit_capacity:
+            born &= (self.random.rand(len(reps)) <=
+                     1 - pop.size[reps] / pop.implicit_capacity)
+        self.spawn(pop, reps[born])
+
+    def handle_birth(self, pop, reps, slots):
+        pop.birth_time[reps, slots] = self.random.exponential(
+            1 / pop.birth_rate, len(reps)) + self.time[reps]
+        self.offspring(pop, reps)
+
+    def handle_death(self, pop, reps, slots):
+        self.remove(pop, reps, slots)
+
+    def handle_wall(self, pop, reps, slots):
+        self.turn(pop, reps, slots)
+        if pop.prey is not None:
+            self.predict(pop, reps, slots)
+        for pred in pop.predators:
+            self.notify(pred, reps, slots)
+
+    def handle_interact(self, pred, reps, slots, eps=0.00001):
+        prey = pred.prey
+        partner = pred.partner[reps, slots]
+        dist = np.hypot(pred.x[reps, slots] - prey.x[reps, partner],
+                        pred.y[reps, slots] - prey.y[reps, partner])
+        # the prey may be gone or turned since the prediction
+        caught = prey.alive[reps, partner] & (
+            dist <= pred.radius + prey.radius + eps)
+        r, s = reps[caught], slots[caught]
+        self.remove(prey, r, partner[caught])
+        if pred.handling > 0:
+            # stand still while handling, hunting and walls are parked
+            pred.paused[r, s] = True
+            pred.pause_vx[r, s] = pred.vx[r, s]
+            pred.pause_vy[r, s] = pred.vy[r, s]
+            pred.vx[r, s] = 0
+            pred.vy[r, s] = 0
+            pred.wall_time[r, s] = np.inf
+            pred.interact_time[r, s] = np.inf
+            pred.pause_time[r, s] = self.time[r] + pred.handling
+        else:
+            self.offspring(pred, r, pred.conversion)
+            self.predict(pred, r, s)
+        self.predict(pred, reps[~caught], slots[~caught])
+
+    def handle_pause(self, pred, reps, slots):
+        pred.paused[reps, slots] = False
+        pred.pause_time[reps, slots] = np.inf
+        self.turn(pred, reps, slots)
+        self.predict(pred, reps, slots)
+        self.offspring(pred, reps, pred.conversion)
+
+    def step(self, runtime):
+        """ function to handle the next event of every running replicate
+
+        Parameters
+        ----------
+
+        runtime : float
+            replicates stop at this time
+        """
+        reps = np.flatnonzero(~self.done)
+        rows = np.arange(len(reps))
+        times = np.empty((len(self.kinds), len(reps)))
+        slots = np.empty((len(self.kinds), len(reps)), dtype=np.int64)
+        for k, (pop, name) in enumerate(self.kinds):
+            event_times = getattr(pop, f'{name}_time')[reps]
+            slots[k] = event_times.argmin(1)
+            times[k] = event_times[rows, slots[k]]
+        if len(self.kinds) > 0:
+            kind = times.argmin(0)
+            next_time = times[kind, rows]
+        else:
+            kind = np.zeros(len(reps), dtype=int)
+            next_time = np.full(len(reps), np.inf)
+
+        # replicates without events before the runtime are done
+        finished = next_time > runtime
+        next_time[finished] = runtime
+        lapse = next_time - self.time[reps]
+        for p in self.population_dict:
+            pop = self.population_dict[p]
+            if pop.velocity > 0:
+                pop.x[reps] += pop.vx[reps] * lapse[:, None]
+                pop.y[reps] += pop.vy[reps] * lapse[:, None]
+        self.time[reps] = next_time
+        self.done[reps[finished]] = True
+
+        for k, (pop, name) in enumerate(self.kinds):
+            sel = (kind == k) & ~finished
+            if sel.any():
+                getattr(self, f'handle_{name}')(pop, reps[sel], slots[k][sel])
+        self.events += int((~finished).sum())
+        self.steps += 1
+
+        # stop replicates with a population at or below the threshold
+        for p in self.population_dict:
+            self.done |= self.population_dict[p].size <= self.continue_threshold
+        self.record(reps)
+
+    def record(self, reps):
+        "helper function to store the time and sizes of replicates"
+        if self.record_interval is not None:
+            # stopped replicates always keep their last state
+            reps = reps[(self.time[reps] >= self.next_record[reps]) |
+                        self.done[reps]]
+            self.next_record[reps] = self.time[reps] + self.record_interval
+        if len(reps) > 0:
+            self.history.append((reps, self.time[reps],
+                                 [self.population_dict[p].size[reps]
+                                  for p in self.population_dict]))
+
+    def run(self, runtime, progress_bar=True):
+        """ Function to start (or continue) all replicates up to a runtime."""
+        if not self.started:
+            self.start()
+        # continued runs start the stopped replicates again
+        self.done = np.zeros(self.replicates, dtype=bool)
+        for p in self.population_dict:
+            self.done |= self.population_dict[p].size <= self.continue_threshold
+        self.done |= self.time >= runtime
+        if progress_bar:
+            from tqdm import tqdm
+            pbar = tqdm(total=self.replicates, desc='replicates done')
+            pbar.update(int(self.done.sum()))
+        while not self.done.all():
+            before = int(self.done.sum())
+            self.step(runtime)
+            if progress_bar:
+                pbar.update(int(self.done.sum()) - before)
+        if progress_bar:
+            pbar.close()
+
+    def get_results(self):
+        """ function to get the results of every replicate
+
+        Returns
+        -------
+
+        results : list of dict
+            one dict per replicate, with 'time' and 'size' like the
+            results of Simulation.get_results()
+        """
+        reps = np.concatenate([h[0] for h in self.history])
+        times = np.concatenate([h[1] for h in self.history])
+        sizes = [np.concatenate([h[2][i] for h in self.history])
+                 for i in range(len(self.population_dict))]
+        order = np.argsort(reps, kind='stable')
+        bounds = np.searchsorted(reps[order], np.arange(self.replicates + 1))
+        results = []
+        for r in range(self.replicates):
+            sel = order[bounds[r]:bounds[r + 1]]
+            results.append(dict(time=times[sel].tolist(),
+                                size=dict((p, sizes[i][sel].tolist())
+                                          for i, p in enumerate(self.population_dict))))
+        return results
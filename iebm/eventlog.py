@@ -0,0 +1,370 @@
+import os
+import json
+import pickle
+import numpy as np
+import datatable as dt
+
+
+# one record per handled event. rng is a fingerprint of the random number
+# generator state after the event, so replays can check the same random
+# numbers were drawn
+RECORD_DTYPE = np.dtype([('time', np.float64),
+                         ('population', np.uint16),
+                         ('event', np.uint16),
+                         ('actor', np.int64),
+                         ('partner', np.int64),
+                         ('rng', np.uint32)])
+
+
+def _rng_fingerprint(state=None):
+    "helper function to summarize the global numpy random state in 32 bits"
+    if state is None:
+        state = np.random.get_state()
+    keys, pos = state[1], state[2]
+    return (int(keys[0]) ^ ((pos * 2654435761) & 0xffffffff)) & 0xffffffff
+
+
+def _as_id(value):
+    "helper function to store an actor or partner id, -1 if missing"
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return -1
+    if np.isnan(value):
+        return -1
+    return int(value)
+
+
+def _is_plain(value):
+    """helper function to check if a value is plain data that can be saved
+    in a keyframe, and not a reference to a population, event or function"""
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        return True
+    if isinstance(value, np.ndarray):
+        return value.dtype != object or all(_is_plain(v) for v in value.flat)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_is_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(_is_plain(k) and _is_plain(v) for k, v in value.items())
+    return False
+
+
+def _plain_state(obj, skip=()):
+    "helper function to get the plain data attributes of an object"
+    return dict((k, v) for k, v in vars(obj).items()
+                if k not in skip and _is_plain(v))
+
+
+class EventLog():
+    """ Append-only log of handled events with periodic keyframes of the
+    full simulation state. A simulation built the same way (same
+    populations, traits, events and triggers) can seek() to the state at
+    any logged time, by restoring the last keyframe before it and handling
+    the events in between again, or verify() that handling the events again
+    gives the same log, e.g. after refactoring an event.
+
+    Keyframes hold the population dataframes, the plain data attributes of
+    populations, traits and events (numbers, strings, arrays, lists and
+    dicts of them), the event heap and the numpy random state. Attributes
+    that hold other objects are not saved, events with such state rebuild
+    it in Event.restored(), like the rtree indexes of BirthDiffusionEvent
+    and RotateEvent.
+
+    Event hashes are Python string hashes, replaying in another process
+    needs the same PYTHONHASHSEED.
+
+    Example
+    -------
+    sim = Simulation(build_populations(), event_log=EventLog('log'))
+    sim.run(10000)
+    sim.close()
+    # later, or in another session with the same PYTHONHASHSEED
+    sim = Simulation(build_populations())
+    EventLog.seek(sim, 'log', 5000)
+    """
+
+    def __init__(self, path, keyframe_every=10000, buffer_size=4096):
+        """ Constructor for an event log
+
+        Parameters
+        ----------
+
+        path : str
+            directory to write to, created if missing
+
+        keyframe_every : int
+            number of handled events between keyframes
+
+        buffer_size : int
+            number of records buffered before writing
+        """
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self.buffered = 0
+        self.count = 0
+        self.keyframes = []
+        self.pending = None
+        self.closed = False
+        os.makedirs(os.path.join(path, 'keyframes'), exist_ok=True)
+        self.file = open(os.path.join(path, 'events.bin'), 'wb')
+
+    def open(self, sim):
+        """ function called by the Simulation after it is set up, assigns
+        integer codes to populations and events and writes the first
+        keyframe"""
+        self.codes = {}
+        names = {}
+        for i, p in enumerate(sim.population_dict):
+            events = list(sim.population_dict[p].event_dict)
+            names[str(p)] = events
+            for j, e in enumerate(events):
+                self.codes[id(sim.population_dict[p].event_dict[e])] = (i, j)
+        self.meta = dict(populations=names, hash_check=hash('iebm'),
+                         keyframe_every=self.keyframe_every)
+        self.keyframe(sim)
+
+    def record(self, event, params):
+        "function to start the record of an event, before it is handled"
+        p, e = self.codes[id(event)]
+        if 'actor_id' in params:
+            actor = _as_id(params['actor_id'])
+        else:
+            actor = -1
+        if 'extra' in params:
+            partner = _as_id(params['extra'])
+        else:
+            partner = -1
+        self.pending = (params['current_time'], p, e, actor, partner)
+
+    def recorded(self, sim):
+        "function to finish the record of an event, after it is handled"
+        self.buffer[self.buffered] = self.pending + (_rng_fingerprint(),)
+        self.buffered += 1
+        self.count += 1
+        if self.buffered == len(self.buffer):
+            self._write()
+        if self.count % self.keyframe_every == 0:
+            self.keyframe(sim)
+
+    def _write(self):
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.buffered = 0
+
+    def keyframe(self, sim):
+        "function to save the full simulation state after the logged events"
+        directory = os.path.join(self.path, 'keyframes', f'{len(self.keyframes):06d}')
+        os.makedirs(directory, exist_ok=True)
+        for i, p in enumerate(sim.population_dict):
+            pop = sim.population_dict[p]
+            # saved as it is with the pending movement, reading pop.df would
+            # move the individuals and change the rounding of later moves
+            df = vars(pop)['_df'] if '_df' in vars(pop) else pop.df
+            df.to_jay(os.path.join(directory, f'{i}.jay'))
+        with open(os.path.join(directory, 'state.pkl'), 'wb') as fp:
+            pickle.dump(self.get_state(sim), fp)
+        self.keyframes.append(dict(events=self.count, time=sim.time))
+        self.flush()
+
+    def get_state(self, sim):
+        "function to get the simulation state, except the dataframes"
+        populations = []
+        for p in sim.population_dict:
+            pop = sim.population_dict[p]
+            populations.append(dict(
+                population=_plain_state(pop, skip=('_df', 'alive_rows')),
+                traits=dict((k, _plain_state(pop.trait_dict[k]))
+                            for k in pop.trait_dict),
+                events=dict((k, _plain_state(pop.event_dict[k]))
+                            for k in pop.event_dict)))
+        # heap records are plain data, with the codes of sim.event_registry
+        return dict(time=sim.time, prev_event_hash=sim.prev_event_hash,
+                    heap=[sim.compact(e) for e in sim.event_heap],
+                    heap_limit=sim.heap_limit,
+                    populations=populations,
+                    rng=np.random.get_state(), events=self.count)
+
+    def flush(self):
+        "function to write buffered records and the metadata"
+        self._write()
+        self.file.flush()
+        self.meta['keyframes'] = self.keyframes
+        self.meta['count'] = self.count
+        with open(os.path.join(self.path, 'meta.json'), 'w') as fp:
+            json.dump(self.meta, fp)
+
+    def close(self):
+        "function to flush and close the log"
+        if not self.closed:
+            self.flush()
+            self.file.close()
+            self.closed = True
+
+    @staticmethod
+    def read(path):
+        """ function to read the records of a log, memory mapped
+
+        Returns
+        -------
+
+        records : numpy structured array
+            fields time, population, event, actor, partner and rng
+        meta : dict
+            population and event names by code, and the keyframes
+        """
+        with open(os.path.join(path, 'meta.json')) as fp:
+            meta = json.load(fp)
+        file = os.path.join(path, 'events.bin')
+        if os.path.getsize(file) == 0:
+            records = np.zeros(0, dtype=RECORD_DTYPE)
+        else:
+            records = np.memmap(file, dtype=RECORD_DTYPE, mode='r')
+        return records[:meta['count']], meta
+
+    @staticmethod
+    def restore(sim, path, keyframe):
+        """ function to restore a keyframe into a simulation built the same
+        way as the logged one
+
+        Parameters
+        ----------
+
+        sim : Simulation
+            simulation to restore into
+
+        path : str
+            directory of the log
+
+        keyframe : int
+            keyframe number
+
+        Returns
+        -------
+
+        events : int
+            number of logged events before the keyframe
+        """
+        directory = os.path.join(path, 'keyframes', f'{keyframe:06d}')
+        with open(os.path.join(directory, 'state.pkl'), 'rb') as fp:
+            state = pickle.load(fp)
+        populations = list(sim.population_dict)
+        for i, p in enumerate(populations):
+            pop = sim.population_dict[p]
+            saved = state['populations'][i]
+            pop.df = dt.fread(os.path.join(directory, f'{i}.jay'))
+            vars(pop).update(saved['population'])
+            pop.alive_rows = None
+            for k in saved['traits']:
+                vars(pop.trait_dict[k]).update(saved['traits'][k])
+            for k in saved['events']:
+                vars(pop.event_dict[k]).update(saved['events'][k])
+        for p in populations:
+            for k in sim.population_dict[p].event_dict:
+                sim.population_dict[p].event_dict[k].restored()
+        sim.scheduler.rebuild(state['heap'])
+        # compactions happen at the same events as in the logged run
+        if 'heap_limit' in state:
+            sim.heap_limit = state['heap_limit']
+        sim.time = state['time']
+        sim.prev_event_hash = state['prev_event_hash']
+        np.random.set_state(state['rng'])
+        # histories start again from the keyframe
+        sim.time_history = [sim.time]
+        for p in sim.population_dict:
+            sim.population_history[p] = [sim.population_dict[p].size]
+        for k in sim.trait_history:
+            sim.trait_history[k] = []
+        return state['events']
+
+    @staticmethod
+    def _start(sim, path, time):
+        "helper function to restore the last keyframe at or before a time"
+        records, meta = EventLog.read(path)
+        if meta['hash_check'] != hash('iebm'):
+            raise RuntimeError('event log was written with another '
+                               'PYTHONHASHSEED, replay needs the same one')
+        times = [k['time'] for k in meta['keyframes']]
+        keyframe = max(int(np.searchsorted(times, time, side='right')) - 1, 0)
+        return records, EventLog.restore(sim, path, keyframe)
+
+    @staticmethod
+    def seek(sim, path, time):
+        """ function to reconstruct the simulation state at a time, after
+        all logged events up to and including that time
+
+        Parameters
+        ----------
+
+        sim : Simulation
+            simulation built the same way as the logged one, it is changed
+            in place
+
+        path : str
+            directory of the log
+
+        time : float
+            simulation time to seek to
+        """
+        EventLog._start(sim, path, time)
+        while sim.scheduler.peek() is not None and sim.scheduler.peek()[0] <= time:
+            sim.step()
+        return sim
+
+    @staticmethod
+    def verify(sim, path, start_time=0, end_time=np.inf):
+        """ function to handle logged events again and compare them with the
+        log, e.g. to check a refactor gives bit-exact results
+
+        Parameters
+        ----------
+
+        sim : Simulation
+            simulation built the same way as the logged one, it is changed
+            in place
+
+        path : str
+            directory of the log
+
+        start_time, end_time : float
+            range of logged times to check, starts at the last keyframe
+            before start_time
+
+        Returns
+        -------
+
+        mismatch : dict or None
+            first event that differs from the log, with the logged and the
+            replayed record, None if all events match
+        """
+        records, first = EventLog._start(sim, path, start_time)
+        replay = EventLog.__new__(EventLog)
+        replay.codes = dict((id(sim.population_dict[p].event_dict[e]), (i, j))
+                            for i, p in enumerate(sim.population_dict)
+                            for j, e in enumerate(sim.population_dict[p].event_dict))
+        replay.pending = None
+        i = first
+        while i < len(records) and records[i]['time'] <= end_time:
+            sim.event_log = _Collector(replay)
+            lapse, _ = sim.step()
+            sim.event_log = None
+            if lapse is None:
+                continue
+            got = np.array([replay.pending + (_rng_fingerprint(),)],
+                           dtype=RECORD_DTYPE)[0]
+            if got.tobytes() != records[i].tobytes():
+                return dict(index=i, logged=records[i], replayed=got)
+            i += 1
+        return None
+
+
+class _Collector():
+    "helper class to collect the record of a replayed event"
+
+    def __init__(self, log):
+        self.log = log
+
+    def record(self, event, params):
+        self.log.record(event, params)
+
+    def recorded(self, sim):
+        pass
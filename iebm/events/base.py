@@ -11,6 +11,25 @@ class Event(ABC):
     TO DO
     """
 
+    # whether a pending event time stays valid, shifted by the pause
+    # duration, after the individual is suspended and resumed. otherwise
+    # set_next() is called on resume
+    shift_on_resume = False
+
+    # whether both individuals of a contact predict it, with the same
+    # event hash so it is handled once, see Interact2DEvent.handle_pair()
+    pairs = False
+
+    # integer code in the event registry of the Simulation, set when the
+    # simulation is created
+    code = None
+
+    # optional time-dependent multiplier of exponential rates, see
+    # set_forcing()
+    forcing = None
+    forcing_max = 1
+    forcing_trait = None
+
     def __init__(self, population, name, is_primary, triggers=None):
         """ Constructor for all events.
 
@@ -40,11 +59,114 @@ class Event(ABC):
         """Calculate and set the next event time"""
         pass
 
+    def set_next_rows(self, actor_idxs, current_time):
+        """Calculate and set the next event times for several individuals,
+        given their row numbers. Subclasses can overwrite with a vectorized
+        version, the default calls set_next() for each individual"""
+        actor_ids = self.population.df[list(actor_idxs), 'id'].to_list()[0]
+        for actor_id in actor_ids:
+            self.set_next(dict(actor_id=actor_id, current_time=current_time))
+
+    def set_forcing(self, params):
+        """ function to read an optional forcing of the rate from the event
+        params, for seasonality or a changing environment. the rate of an
+        individual becomes rate * forcing(t), or rate * forcing(t, value)
+        with its value of the 'forcing_trait' column.
+
+        times are drawn at rate * forcing_max and thinned when the event is
+        handled (Lewis-Shedler), so the forcing can change at any time
+        without rescheduling anyone. forcing_max must bound the forcing.
+
+        Parameters
+        ----------
+
+        params : dict
+            can contain:
+            - 'forcing' : function of time, or of time and trait value
+            - 'forcing_max' : upper bound of the forcing, needed with a forcing
+            - 'forcing_trait' : name of the trait column passed to the forcing
+        """
+        if 'forcing' in params and params['forcing'] is not None:
+            if 'forcing_max' not in params:
+                raise ValueError(f'event {self} needs a forcing_max with a forcing')
+            self.forcing = params['forcing']
+            self.forcing_max = params['forcing_max']
+            if 'forcing_trait' in params:
+                self.forcing_trait = params['forcing_trait']
+
+    def thinned(self, actor_idx, current_time, clock=False):
+        """ function to decide if a drawn event time is rejected by the
+        thinning of the forcing, see set_forcing(). never without a forcing,
+        or when the event is called by a trigger of another event
+
+        Parameters
+        ----------
+
+        actor_idx : int
+            row number of the individual
+        current_time : float
+            time of the event
+        clock : bool
+            drawn by a population-level clock instead of the individual
+
+        Returns
+        -------
+
+        rejected : bool
+            True if nothing happens and the next time is drawn instead
+        """
+        if self.forcing is None or not self.is_primary:
+            return False
+        # only the time drawn for the individual is thinned, not triggers
+        if (not clock and
+                self.population.df[actor_idx, f'{self}_time'] != current_time):
+            return False
+        if self.forcing_trait is None:
+            rate = self.forcing(current_time)
+        else:
+            rate = self.forcing(current_time,
+                                self.population.df[actor_idx, self.forcing_trait])
+        return np.random.rand() * self.forcing_max >= rate
+
+    def suspended(self, actor_idx, current_time):
+        """Called once after an individual of the population is suspended.
+        Events that predict interactions with it can overwrite this, returns
+        a list of new events"""
+        return []
+
+    def resumed(self, actor_idx, current_time):
+        """Called once after an individual of the population is resumed,
+        returns a list of new events"""
+        return []
+
+    def restored(self):
+        """Called after the population state is restored, e.g. from an
+        event log keyframe, or changed outside of events, e.g. by a tile
+        handoff. Events that keep state besides plain attributes, like
+        spatial indexes, rebuild it here"""
+        pass
+
+    def remap_rows(self, row_map):
+        """Called after the population compacts its dataframe. row_map holds
+        the new row number of each old row, -1 for removed rows. Events that
+        cache row numbers must overwrite this"""
+        pass
+
     @abstractmethod
     def handle(self, params):
         """How the event is performed/handled by the population"""
         pass
 
+    def handle_batch(self, params_list):
+        """How several events of the same time are handled, given their
+        params in order, see Simulation.handle_batch(). Subclasses can
+        overwrite with a vectorized version, the default calls handle() for
+        each"""
+        new_events = []
+        for params in params_list:
+            new_events += self.handle(params)
+        return new_events
+
     def __repr__(self):
         """Returns event name for identification"""
         return self.name
\ No newline at end of file
@@ -1,14 +1,12 @@
 import numpy as np
 import datatable as dt
-# modules to find open space
-import rtree
-from scipy.spatial import Voronoi
-from scipy.spatial.distance import cdist
 
 from .base import Event
 
 
 class BirthEvent(Event):
+    # exponential waiting times, shifting a parked time is valid
+    shift_on_resume = True
 
     def __init__(self, population, params):
         
@@ -19,103 +17,346 @@ class BirthEvent(Event):
 
         super().__init__(population, params['name'],
                          params['is_primary'], triggers)
+        # optional time-dependent birth rates, by thinning
+        self.set_forcing(params)
 
-        if self.is_primary:
+        # a primary birth event can be scheduled by a single population-level
+        # clock running at the accepted birth rate, instead of individual
+        # birth times that are rejected near the implicit capacity
+        if 'rate_clock' in params:
+            self.rate_clock = params['rate_clock'] and self.is_primary
+        else:
+            self.rate_clock = False
+        # bumped every time the clock is resampled, older clock events are stale
+        self.clock_version = 0
+        self.clock_weights = None
+
+        if self.rate_clock:
+            self.population.clock_events.append(self)
+
+        elif self.is_primary:
             birth_rates = self.population.df.to_numpy(
                 column=self.population.df.colindex('birth_rate'))
-            birth_times = (np.random.exponential(1 / birth_rates) +
+            birth_times = (np.random.exponential(1 / (birth_rates * self.forcing_max)) +
                            params['current_time'])
             self.population.df[f'{self}_time'] = birth_times
 
     def set_next(self, params):
 
-        if self.is_primary:
+        if self.is_primary and not self.rate_clock:
             actor_id = params['actor_id']
             actor_idx = self.population._get_actor_idx(actor_id)
             if actor_idx is not None:
                 birth_rate = self.population.df[actor_idx, 'birth_rate']
-                birth_time = (np.random.exponential(1 / birth_rate) + params['current_time'])
+                birth_time = (np.random.exponential(1 / (birth_rate * self.forcing_max)) +
+                              params['current_time'])
                 self.population.df[actor_idx, f'{self}_time'] = birth_time
 
+    def set_next_rows(self, actor_idxs, current_time):
+
+        if self.is_primary and not self.rate_clock:
+            actor_idxs = list(actor_idxs)
+            birth_rates = self.population.df[actor_idxs, 'birth_rate'].to_numpy().reshape(-1)
+            self.population.df[actor_idxs, f'{self}_time'] = (
+                np.random.exponential(1 / (birth_rates * self.forcing_max)) + current_time)
+
+
+    def set_clock(self, current_time):
+        """ function to draw the next birth time of the population-level
+        clock. the clock runs at the sum of individual birth rates, each
+        scaled by the chance of at least one offspring passing the implicit
+        capacity and conversion efficiency checks. called again whenever the
+        population size changes, which makes older clock events stale
+
+        Parameters
+        ----------
+
+        current_time : float
+            time to start the clock from
+
+        Returns
+        -------
+
+        new_events : list
+            the next clock event, empty if the population cannot grow
+        """
+
+        self.clock_version += 1
+
+        df = self.population.df
+        birth_rates = df.to_numpy(column=df.colindex('birth_rate'))
+
+        # chance of a single offspring being rejected
+        if self.population.implicit_capacity:
+            fail = min(self.population.size / self.population.implicit_capacity, 1)
+        else:
+            fail = 0
+        if 'conversion_efficiency' in self.population.trait_dict:
+            ce = df.to_numpy(column=df.colindex('conversion_efficiency'))
+            fail = 1 - ce * (1 - fail)
+        fail = np.broadcast_to(fail, birth_rates.shape)
+
+        if 'number_offspring' in self.population.trait_dict:
+            num_off = df.to_numpy(column=df.colindex('number_offspring')).astype(int)
+        else:
+            num_off = np.ones(len(birth_rates), dtype=int)
+
+        # rate of birth events with at least one offspring
+        weights = birth_rates * (1 - fail ** num_off)
+        if self.population.dead_count > 0:
+            weights[~self.population.alive_mask()] = 0
+        total = weights.sum()
+        self.clock_weights = (weights, fail, num_off)
+
+        if not total > 0:
+            self.clock_weights = None
+            return []
+
+        # with a forcing the clock runs at its bound, births are thinned
+        clock_time = np.random.exponential(1 / (total * self.forcing_max)) + current_time
+        params = dict(current_time=clock_time,
+                      clock=self.clock_version)
+        event_hash = hash(f'{clock_time}_{self}_clock_{self.clock_version}')
+
+        return [(clock_time, event_hash, self, params)]
+
+    def remap_rows(self, row_map):
+        # clock weights are cached by row number
+        if self.clock_weights is not None:
+            keep = row_map >= 0
+            self.clock_weights = tuple(np.asarray(a)[keep]
+                                       for a in self.clock_weights)
+
+    def handle_clock(self, params, position_func=None):
+        """ function that performs a birth from the population-level clock.
+        a parent is picked proportional to its clock weight and at least one
+        offspring is born, so no births are rejected
+
+        Parameters
+        ----------
+
+        params : dict
+            clock event parameters with the 'clock' version
+        position_func : function or None
+            function to place an offspring next to the parent
+
+        Returns
+        -------
+
+        new_events : list
+            events of the offspring and the next clock event
+        """
+
+        new_events = []
+
+        # stale clock, resampled after a population size change
+        if params['clock'] != self.clock_version or self.clock_weights is None:
+            return new_events
+
+        version = self.clock_version
+        weights, fail, num_off = self.clock_weights
+
+        # pick parent proportional to their rate of successful births
+        actor_idx = int(np.random.choice(len(weights), p=weights / weights.sum()))
+        actor_id = self.population.df[actor_idx, 'id']
+        n, r = num_off[actor_idx], fail[actor_idx]
+
+        # rejected by the forcing, no birth this time
+        if self.thinned(actor_idx, params['current_time'], clock=True):
+            return self.set_clock(params['current_time'])
+
+        # position of the first born offspring in the litter follows a
+        # truncated geometric distribution, given at least one birth
+        if r > 0:
+            u = np.random.rand()
+            first = int(np.log(1 - u * (1 - r ** n)) / np.log(r))
+            first = min(first, n - 1)
+        else:
+            first = 0
+
+        # the remaining siblings go through the usual checks
+        num_births = 1 + self.count_births(actor_idx, n - 1 - first,
+                                           size=self.population.size + 1)
+
+        birth_params = dict(actor_id=actor_id,
+                            current_time=params['current_time'])
+        new_events += self.add_offspring(actor_id, actor_idx, num_births,
+                                         birth_params, position_func)
+
+        # restart clock, unless done after the population size changed
+        if self.clock_version == version:
+            new_events += self.set_clock(params['current_time'])
+
+        return new_events
 
     def handle(self, params, position_func=None):
+
+        if 'clock' in params:
+            return self.handle_clock(params, position_func)
         
         actor_id = int(params['actor_id'])
         new_events = []
         
         actor_idx = self.population._get_actor_idx(actor_id)
         
-        if actor_idx:
+        if actor_idx is not None and not self.thinned(actor_idx,
+                                                      params['current_time']):
             
             if 'number_offspring' in self.population.trait_dict:
-                num_off = self.population.df[actor_idx, 'number_offspring']
+                num_off = int(self.population.df[actor_idx, 'number_offspring'])
             else:
                 num_off = 1
-                
-            for _ in range(num_off):
-                
-                have_birth = True
 
-                if self.population.implicit_capacity:
-                    birth_prob = (1 - self.population.size / self.population.implicit_capacity)
-                    if np.random.rand() > birth_prob:
-                        have_birth = False
-        
-                if 'conversion_efficiency' in self.population.trait_dict:
-                    ce = self.population.df[actor_idx, 'conversion_efficiency']
-                    if np.random.rand() > ce:
-                        has_birth = False
-        
-                if have_birth:
+            # decide all surviving offspring at once
+            num_births = self.count_births(actor_idx, num_off)
 
-                    new_id = self.population.id_count
-                    
-                    new_traits = dict([(k, self.population.trait_dict[k].inherit_value(
-                        actor_id)) for k in self.population.trait_dict])
-              
-                    if position_func is None:
-                        x = np.random.rand() * self.population.xdim
-                        y = np.random.rand() * self.population.ydim
-                    
-                    else:
-                        new_radius = new_traits['radius']
-                        px, py, pr, odm = self.population.df[actor_idx, ['x', 'y', 'radius',
-                                                                         'offspring_dist_max']].to_numpy()[0]
-                        x, y = position_func(px, py, pr, odm, new_radius)
-                    
-                    if x is not None:
-                    
-                        new_df = self.population.create_individual(new_id, x, y)
-                        self.population.df.rbind(new_df, force=True)
-                        self.population.id_count += 1
-                        self.population.size += 1
-
-                        new_idx = self.population._get_actor_idx(new_id)
-                        for k in new_traits:
-                            val = new_traits[k]
-                            self.population.df[new_idx, str(k)] = val
-                        
-                        # update all new offspring's event times
-                        new_params = dict(actor_id = new_id, 
-                                          current_time = params['current_time'])
-
-                        for k in self.population.event_dict:
-                            if self.population.event_dict[k].is_primary:
-                                self.population.event_dict[k].set_next(new_params)
-
-                        new_events += [self.population.get_next_event(new_id)]
-
-                        if self.triggers:
-                            new_params = params.copy()
-                            new_params['actor_id'] = new_id
-                            new_events += self.triggers(new_params)             
+            if num_births > 0:
+                new_events += self.add_offspring(actor_id, actor_idx, num_births,
+                                                 params, position_func)
                 
         # update parent's next birth event, if there is one
-        if self.is_primary:
+        if self.is_primary and not self.rate_clock:
             self.set_next(params)
             new_events += [self.population.get_next_event(actor_id)]
         
-        return new_events  
+        return new_events
+
+    def count_births(self, actor_idx, num_off, size=None):
+        """ function to decide how many offspring of a litter are born, given
+        the implicit capacity of the population and the parent's conversion
+        efficiency
+
+        Parameters
+        ----------
+
+        actor_idx : int
+            row number of the parent
+        num_off : int
+            number of potential offspring
+        size : int or None
+            population size for the capacity check, current size if None
+
+        Returns
+        -------
+
+        num_births : int
+            number of surviving offspring
+        """
+
+        have_birth = np.ones(num_off, dtype=bool)
+
+        if 'conversion_efficiency' in self.population.trait_dict:
+            ce = self.population.df[actor_idx, 'conversion_efficiency']
+            have_birth &= np.random.rand(num_off) <= ce
+
+        if self.population.implicit_capacity:
+            # each offspring sees the population size after its accepted
+            # siblings, so the capacity check runs over pre-drawn numbers
+            rands = np.random.rand(num_off)
+            if size is None:
+                size = self.population.size
+            for i in np.flatnonzero(have_birth):
+                birth_prob = (1 - size / self.population.implicit_capacity)
+                if rands[i] > birth_prob:
+                    have_birth[i] = False
+                else:
+                    size += 1
+
+        return int(have_birth.sum())
+
+    def add_offspring(self, actor_id, actor_idx, num_births, params,
+                      position_func=None):
+        """ function to add a litter of offspring to the population with a
+        single bulk insert. trait values, event times and next events of
+        the litter are all set together
+
+        Parameters
+        ----------
+
+        actor_id : int
+            unique identifier of the parent
+        actor_idx : int
+            row number of the parent
+        num_births : int
+            number of offspring to add
+        params : dict
+            parameters of the birth event
+        position_func : function or None
+            function to place an offspring next to the parent. random
+            position in the environment if None
+
+        Returns
+        -------
+
+        new_events : list
+            next events of the offspring and events from the triggers
+        """
+
+        new_events = []
+
+        # inherit all trait values for the litter at once
+        new_traits = dict([(k, self.population.trait_dict[k].inherit_values(
+            actor_id, num_births)) for k in self.population.trait_dict])
+
+        if position_func is None:
+            xs = np.random.rand(num_births) * self.population.xdim
+            ys = np.random.rand(num_births) * self.population.ydim
+
+        else:
+            px, py, pr, odm = self.population.df[actor_idx, ['x', 'y', 'radius',
+                                                             'offspring_dist_max']].to_numpy()[0]
+            spots = [position_func(px, py, pr, odm, new_radius)
+                     for new_radius in new_traits['radius']]
+            # only keep offspring that found a spot
+            placed = np.array([x is not None for x, _ in spots])
+            xs = np.array([x for x, _ in spots])[placed]
+            ys = np.array([y for _, y in spots])[placed]
+            new_traits = dict([(k, new_traits[k][placed]) for k in new_traits])
+            num_births = int(placed.sum())
+
+        if num_births == 0:
+            return new_events
+
+        new_ids = np.arange(self.population.id_count,
+                            self.population.id_count + num_births)
+
+        # create the litter with trait values and add in one insert
+        new_df = self.population.create_individuals(new_ids, xs, ys,
+                                                    traits=new_traits)
+        self.population.df.rbind(new_df, force=True)
+        for k in new_traits:
+            self.population.trait_dict[k].add_values(new_traits[k])
+        self.population.id_count += num_births
+        self.population.size += num_births
+        # size changed, resample any population-level clocks
+        new_events += self.population.update_clocks(params['current_time'])
+
+        # new offspring are the last rows of the population
+        nrows = self.population.df.nrows
+        new_idxs = range(nrows - num_births, nrows)
+
+        # update all new offspring's event times, a single offspring is
+        # cheaper with scalar writes than with the vectorized version
+        primary_events = [e for e in self.population.event_dict.values()
+                          if e.is_primary]
+        if num_births == 1:
+            new_params = dict(actor_id = int(new_ids[0]),
+                              current_time = params['current_time'])
+            for e in primary_events:
+                e.set_next(new_params)
+            new_events += [self.population.get_next_event(new_params['actor_id'])]
+        else:
+            for e in primary_events:
+                e.set_next_rows(new_idxs, params['current_time'])
+            new_events += self.population.get_next_events(new_idxs)
+
+        if self.triggers:
+            for new_id in new_ids:
+                new_params = params.copy()
+                new_params['actor_id'] = int(new_id)
+                new_events += self.triggers(new_params)
+
+        return new_events
         
 
 class BirthDiffusionEvent(BirthEvent):
@@ -128,13 +369,29 @@ class BirthDiffusionEvent(BirthEvent):
             self.allow_overlap = params['allow_overlap']
         else:
             self.allow_overlap = True
+
+        # spots taken by the current litter, not yet in the rtree
+        self.litter = []
         
+        self.build_rtree()
+
+    def build_rtree(self):
+        "function to index the x-y coordinates of individuals by unique id"
+        # imported here, only models with diffusion births need rtree
+        import rtree
         self.index = rtree.index.Index()
         # add all x-y coordinates with unique ids
-        for i,x,y in self.population.df[:, ['id', 'x', 'y']].to_tuples():
+        rows = self.population.df[:, ['id', 'x', 'y']]
+        if self.population.dead_count > 0:
+            rows = rows[self.population.alive_mask().tolist(), :]
+        for i,x,y in rows.to_tuples():
             self.index.insert(i, (x,y))
+
+    def restored(self):
+        self.build_rtree()
         
     def handle(self, params):
+        self.litter = []
         new_events = super().handle(params, self.find_empty_space)
         return new_events
 
@@ -157,6 +414,9 @@ class BirthDiffusionEvent(BirthEvent):
 
     def find_empty_space(self, px, py, pr, odm, new_radius, 
                          eps=0.00001):
+        # modules to find open space, imported with the first birth
+        from scipy.spatial import Voronoi
+        from scipy.spatial.distance import cdist
         
         if self.allow_overlap:
             # pick random spot, allow overlap
@@ -180,6 +440,9 @@ class BirthDiffusionEvent(BirthEvent):
                           self.intersection_rtree((search_xmin, search_ymin,
                                                    search_xmax, search_ymax))]
             neigh_stats = self.population.df[neighs_idx, ['x','y', 'radius']].to_numpy()
+            # siblings placed before are neighbours too
+            if len(self.litter) > 0:
+                neigh_stats = np.vstack([neigh_stats, self.litter])
             neigh_stats_copy = neigh_stats.copy()
             
             hard_candidates = []
@@ -249,6 +512,7 @@ class BirthDiffusionEvent(BirthEvent):
                     if len(open_cands) > 0:
                         spot_idx = np.random.choice(open_cands, 1)[0]
                         off_x, off_y = candidates[spot_idx, 0:2]
+                        self.litter.append([off_x, off_y, new_radius])
         
         
         return off_x, off_y
\ No newline at end of file
@@ -0,0 +1,127 @@
+import numpy as np
+from datatable import f
+
+from .base import Event
+from ..populations.categories import ACTIVE
+
+
+class ConsumeEvent(Event):
+    """ Event of individuals eating from a DensityGrid resource, in the cell
+    they are in. Encounters happen at a rate of the individual's search
+    rate times the density of its cell, per unit area. The search rate is
+    the 'attack_rate' column if there is one, otherwise the area swept by
+    a moving individual, 2 * (radius + resource radius) * velocity, like
+    collisions with stationary prey.
+
+    Densities change between events (growth, other consumers) and
+    individuals move between cells, so encounter times are drawn by
+    thinning: at a rate bounded with the highest density any cell can
+    have, and accepted at the event with the chance of the actual density
+    over that bound (always if the density went above it). An accepted
+    encounter removes one unit from the cell and calls the triggers, e.g. a
+    handling pause or a birth.
+    """
+
+    # exponential waiting times, shifting a parked time is valid
+    shift_on_resume = True
+
+    def __init__(self, population, params):
+        """Construct Consume Event
+
+        Parameters
+        ----------
+
+        population : class Population
+            the Population class that performs the actions
+
+        params : dict
+            *must contain:
+            - 'resource' : DensityGrid to eat from
+            - 'current_time'
+            - 'is_primary' : True|False
+        """
+
+        if 'triggers' in params:
+            triggers = params['triggers']
+        else:
+            triggers = None
+
+        # initialize base event
+        super().__init__(population, params['name'],
+                         params['is_primary'], triggers)
+
+        self.resource = params['resource']
+
+        if self.is_primary:
+            self.population.df[f'{self}_bound'] = np.zeros(self.population.df.nrows)
+            self.set_next_rows(range(self.population.df.nrows),
+                               params['current_time'])
+
+    def search_rates(self, actor_idxs):
+        "function to get the search rates of individuals, area per time"
+        df = self.population.df
+        if 'attack_rate' in df.names:
+            rates = df[actor_idxs, 'attack_rate']
+        else:
+            rates = df[actor_idxs, 2 * (f.radius + self.resource.radius) * f.velocity]
+        status = df[actor_idxs, 'status'].to_numpy().reshape(-1)
+        rates = rates.to_numpy().reshape(-1).astype(np.float64)
+        # inactive individuals, e.g. handling, do not search
+        rates[status != ACTIVE] = 0
+        return rates
+
+    def set_next(self, params, actor_idx=None):
+
+        if self.is_primary:
+
+            if actor_idx is None:
+                actor_idx = self.population._get_actor_idx(params['actor_id'])
+
+            if actor_idx is not None:
+                self.set_next_rows([actor_idx], params['current_time'])
+
+    def set_next_rows(self, actor_idxs, current_time):
+        """ vectorized set_next() for several individuals given their row
+        numbers. the density bound is kept to thin the encounters later
+        """
+
+        if self.is_primary:
+            actor_idxs = list(actor_idxs)
+            if len(actor_idxs) == 0:
+                return
+            bound = self.resource.max_density()
+            rates = self.search_rates(actor_idxs) * bound / self.resource.cell_area
+            times = np.random.exponential(1 / np.where(rates > 0, rates, 1)) + current_time
+            times[~(rates > 0)] = np.nan
+            self.population.df[actor_idxs, f'{self}_time'] = times
+            self.population.df[actor_idxs, f'{self}_bound'] = self.population.fit(
+                np.full(len(actor_idxs), bound))
+
+    def handle(self, params):
+
+        events = []
+
+        actor_id = int(params['actor_id'])
+        actor_idx = self.population._get_actor_idx(actor_id)
+
+        if actor_idx is not None:
+
+            x, y, status, bound = self.population.df[
+                actor_idx, ['x', 'y', 'status', f'{self}_bound']].to_numpy()[0]
+
+            if status == ACTIVE:
+
+                cell = self.resource.cell_index(x, y)
+                density = self.resource.get_density()[cell]
+
+                # thinning, accept with the actual over the bounding density
+                if density > 0 and np.random.rand() * bound < density:
+                    self.resource.consume(cell)
+                    if self.triggers:
+                        events += self.triggers(params)
+
+                if self.is_primary:
+                    self.set_next(params)
+                    events += [self.population.get_next_event(actor_id)]
+
+        return events
@@ -13,6 +13,9 @@ class DeathEvent(Event):
     consumptions is a secondary event and not written in the dataframe.
     """
 
+    # exponential waiting times, shifting a parked time is valid
+    shift_on_resume = True
+
     def __init__(self, population, params):
         """Construct Death Event with given hard-coded name
 
@@ -26,6 +29,9 @@ class DeathEvent(Event):
             *must contain:
             - 'death_rate' key and value
             - 'current_time'
+            *can contain:
+            - 'forcing', 'forcing_max', 'forcing_trait' : time-dependent
+              death rates, see Event.set_forcing()
 
         """
         
@@ -37,6 +43,19 @@ class DeathEvent(Event):
         # initialize base event
         super().__init__(population, params['name'], 
                          params['is_primary'], triggers)
+        # optional time-dependent death rates, by thinning
+        self.set_forcing(params)
+
+        # mark dead rows instead of deleting them, and compact the
+        # population once the fraction of dead rows is large enough
+        if 'tombstone' in params:
+            self.tombstone = params['tombstone']
+        else:
+            self.tombstone = False
+        if 'compact_fraction' in params:
+            self.compact_fraction = params['compact_fraction']
+        else:
+            self.compact_fraction = 0.25
         
         # check if this is a primary event
         if self.is_primary:
@@ -44,7 +63,7 @@ class DeathEvent(Event):
             death_rates = self.population.df.to_numpy(
                 column=self.population.df.colindex('death_rate'))
             # calculate and set individual death times
-            self.population.df[f'{self}_time'] =  (np.random.exponential(1 / death_rates)
+            self.population.df[f'{self}_time'] =  (np.random.exponential(1 / (death_rates * self.forcing_max))
                                                    + params['current_time'])
 
 
@@ -66,15 +85,29 @@ class DeathEvent(Event):
                 # extract individual death rate
                 death_rate = self.population.df[actor_idx, 'death_rate']
                 # draw random death_time from death_rate
-                death_time = (np.random.exponential(1 / death_rate) +
+                death_time = (np.random.exponential(1 / (death_rate * self.forcing_max)) +
                               params['current_time'])
                 # assign next death time to individual
                 self.population.df[actor_idx, f'{self}_time'] = death_time
 
+    def set_next_rows(self, actor_idxs, current_time):
+        """ vectorized set_next() for several individuals given their row
+        numbers, e.g. a litter of new offspring
+        """
+
+        if self.is_primary:
+            actor_idxs = list(actor_idxs)
+            # extract individual death rates
+            death_rates = self.population.df[actor_idxs, 'death_rate'].to_numpy().reshape(-1)
+            # draw random death times and assign to individuals
+            self.population.df[actor_idxs, f'{self}_time'] = (
+                np.random.exponential(1 / (death_rates * self.forcing_max)) + current_time)
+
 
     def handle(self, params):
         """ function that performs the event action. DeathEvent remove an
-        individual row from the population dataframe and lowers the population
+        individual row from the population dataframe and lowers the population.
+        In tombstone mode, the row is flagged dead and removed later in bulk
 
         Parameters:
         -----------
@@ -95,17 +128,87 @@ class DeathEvent(Event):
         
         new_events = []
         
+        # rejected by the forcing, draw the next death time instead
+        if actor_idx is not None and self.thinned(actor_idx, params['current_time']):
+            self.set_next(params)
+            return [self.population.get_next_event(actor_id)]
+
         if actor_idx is not None:
 
             # call trigger first, before removing individual
             if self.triggers:
                 new_events += self.triggers(params)
+
+            # let traits with counters know about the removal
+            for k in self.population.trait_dict:
+                self.population.trait_dict[k].remove_value(actor_idx)
+            # dead individuals are not resumed
+            self.population.suspended.pop(actor_id, None)
                 
-            # remove row with id
-            del self.population.df[actor_idx, :]
+            if self.tombstone:
+                # flag row as dead, later rows keep their row numbers
+                self.population.tombstone(actor_idx)
+                if (self.population.dead_count > 
+                    self.compact_fraction * self.population.df.nrows):
+                    self.population.compact()
+            else:
+                # remove row with id
+                del self.population.df[actor_idx, :]
+                self.population.alive_rows = None
             # decrease population count
             self.population.size -= 1
+            # size changed, resample any population-level clocks
+            new_events += self.population.update_clocks(params['current_time'])
         
 
         
-        return new_events
\ No newline at end of file
+        return new_events
+
+    def handle_batch(self, params_list):
+        """ function that removes several individuals dying at the same
+        time at once, with a single delete and a single resample of the
+        population clocks. with triggers, or thinning by a forcing, every
+        death is handled on its own
+
+        Parameters:
+        -----------
+
+        params_list : list of dict
+            params of the death events, in order
+
+        Returns
+        -------
+
+        new_events : list
+            next clock events, no new events for the dead individuals
+        """
+        if self.triggers or self.forcing is not None:
+            return super().handle_batch(params_list)
+
+        actor_idxs = []
+        for params in params_list:
+            actor_id = int(params['actor_id'])
+            actor_idx = self.population._get_actor_idx(actor_id)
+            if actor_idx is not None and actor_idx not in actor_idxs:
+                actor_idxs.append(actor_idx)
+                # let traits with counters know about the removal
+                for k in self.population.trait_dict:
+                    self.population.trait_dict[k].remove_value(actor_idx)
+                # dead individuals are not resumed
+                self.population.suspended.pop(actor_id, None)
+
+        if len(actor_idxs) == 0:
+            return []
+
+        if self.tombstone:
+            for actor_idx in actor_idxs:
+                self.population.tombstone(actor_idx)
+            if (self.population.dead_count >
+                self.compact_fraction * self.population.df.nrows):
+                self.population.compact()
+        else:
+            del self.population.df[sorted(actor_idxs), :]
+            self.population.alive_rows = None
+        self.population.size -= len(actor_idxs)
+        # size changed once, resample any population-level clocks
+        return self.population.update_clocks(params_list[-1]['current_time'])
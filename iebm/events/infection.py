@@ -1,3 +1,4 @@
+import heapq
 import numpy as np
 from .base import Event
 
@@ -12,6 +13,14 @@ class InfectionSIREvent(Event):
         
         super().__init__(population, params['name'], 
                          params['is_primary'], triggers)
+
+        # integer codes of the infection states, from the categorical trait
+        # with the same name as this event
+        self.trait = self.population.trait_dict[str(self)]
+        states = self.trait.table
+        self.susceptible = states.code('susceptible')
+        self.infected = states.code('infected')
+        self.recovered = states.code('recovered')
         
     def set_next(self, params):
 
@@ -52,23 +61,328 @@ class InfectionSIREvent(Event):
             else:
                 other_status = None
             
-            if status == 'susceptible':
+            if status == self.susceptible:
                 
-                if other_status == 'infected':
-                    self.population.df[actor_idx, str(self)] = 'infected'
+                if other_status == self.infected:
+                    self.trait.set_code(actor_idx, self.infected)
                     new_events += self.set_next(params)
                     
-            if status == 'infected':
+            if status == self.infected:
                 
-                if other_status == 'susceptible':
-                    self.population.df[other_idx, str(self)] = 'infected'
+                if other_status == self.susceptible:
+                    self.trait.set_code(other_idx, self.infected)
                     other_params = params.copy()
                     other_params['actor_id'] = other_id
                     new_events += self.set_next(other_params)
                     
                 if 'recover' in params:
                     if params['recover']:
-                        self.population.df[actor_idx, str(self)] = 'recovered'
+                        self.trait.set_code(actor_idx, self.recovered)
                         del params['recover']
 
-        return new_events
\ No newline at end of file
+        return new_events
+
+class CompartmentalInfectionEvent(Event):
+    """ Infection event for compartmental models (SIR, SEIR, SIRS, SEIRS)
+    with one or more strains. The compartments are stored as codes in a
+    categorical trait with the same name as this event, use compartments()
+    to get the category names. Contacts are handled by handle(), like
+    InfectionSIREvent. Latent, recovery and waning periods are exponential,
+    with rates taken from the 'latent_rate', 'recovery_rate' and
+    'waning_rate' columns. Instead of one scheduled event per individual,
+    the period timers are kept in a heap of this event and only the
+    earliest one is in the simulation heap, scheduled like a
+    population-level clock.
+
+    Multiple strains share the susceptible and recovered compartments,
+    recovery from any strain gives immunity to all strains.
+
+    Example
+    -------
+    pop.add_traits([(CategoricalTrait, {'name': 'infection',
+                        'categories': CompartmentalInfectionEvent.compartments('SEIR'),
+                        'fractions': [0.99, 0, 0.01, 0]}), ...])
+    pop.add_events([(CompartmentalInfectionEvent, {'name': 'infection',
+                        'model': 'SEIR', 'is_primary': False,
+                        'current_time': 0}), ...])
+    """
+
+    # kinds of compartments
+    SUSCEPTIBLE, EXPOSED, INFECTED, RECOVERED = 0, 1, 2, 3
+
+    @staticmethod
+    def compartments(model='SIR', strains=1):
+        """ function to get the compartment names of a model, in the order
+        the categorical trait should use
+
+        Parameters
+        ----------
+
+        model : str
+            one of 'SIR', 'SEIR', 'SIRS' or 'SEIRS'
+
+        strains : int
+            number of strains, exposed and infected compartments get the
+            strain number appended if more than one
+
+        Returns
+        -------
+
+        names : list of str
+        """
+        model = model.upper()
+        if model not in ('SIR', 'SEIR', 'SIRS', 'SEIRS'):
+            raise ValueError(f'unknown compartmental model {model}')
+        names = ['susceptible']
+        for k in range(strains):
+            suffix = f'_{k}' if strains > 1 else ''
+            if 'E' in model:
+                names += [f'exposed{suffix}']
+            names += [f'infected{suffix}']
+        names += ['recovered']
+        return names
+
+    def __init__(self, population, params):
+
+        if 'triggers' in params:
+            triggers = params['triggers']
+        else:
+            triggers = None
+
+        super().__init__(population, params['name'],
+                         params['is_primary'], triggers)
+
+        if 'model' in params:
+            self.model = params['model'].upper()
+        else:
+            self.model = 'SIR'
+        if 'strains' in params:
+            self.strains = int(params['strains'])
+        else:
+            self.strains = 1
+        # chance a contact between susceptible and infected transmits
+        if 'transmission' in params:
+            self.transmission = params['transmission']
+        else:
+            self.transmission = 1
+        self.latent = 'E' in self.model
+        self.waning = self.model.endswith('RS')
+
+        # compartment codes from the categorical trait with the same name
+        self.trait = self.population.trait_dict[str(self)]
+        table = self.trait.table
+        names = self.compartments(self.model, self.strains)
+        self.susceptible = table.code('susceptible')
+        self.recovered = table.code('recovered')
+        self.exposed = []
+        self.infected = []
+        for k in range(self.strains):
+            suffix = f'_{k}' if self.strains > 1 else ''
+            if self.latent:
+                self.exposed += [table.code(f'exposed{suffix}')]
+            self.infected += [table.code(f'infected{suffix}')]
+        # kind and strain of every code, for lookups in handle()
+        self.kind = np.full(len(table), -1, dtype=int)
+        self.strain = np.full(len(table), -1, dtype=int)
+        self.kind[self.susceptible] = self.SUSCEPTIBLE
+        self.kind[self.recovered] = self.RECOVERED
+        for k in range(self.strains):
+            self.kind[self.infected[k]] = self.INFECTED
+            self.strain[self.infected[k]] = k
+            if self.latent:
+                self.kind[self.exposed[k]] = self.EXPOSED
+                self.strain[self.exposed[k]] = k
+        missing = [n for n in names if n not in table.codes]
+        if missing:
+            raise ValueError(f'categorical trait {self} is missing '
+                             f'compartments {missing}')
+
+        # heap of (time, actor_id, from code, to code) period timers
+        self.timers = []
+        # time and version of the timer event in the simulation heap
+        self.clock_time = None
+        self.clock_version = 0
+        self.population.clock_events.append(self)
+
+        # start timers of the initial exposed, infected and recovered
+        if 'current_time' in params:
+            codes = self.population.df[:, str(self)].to_numpy().reshape(-1)
+            rows = np.arange(len(codes))
+            if self.population.dead_count > 0:
+                alive = self.population.alive_mask()
+                codes, rows = codes[alive], rows[alive]
+            kinds = self.kind[codes]
+            for kind in (self.EXPOSED, self.INFECTED, self.RECOVERED):
+                idxs = rows[kinds == kind]
+                if len(idxs) > 0:
+                    self.start_timers(idxs, codes[kinds == kind],
+                                      params['current_time'])
+
+    def _next_code(self, code):
+        "code an individual moves to when its period timer ends"
+        kind = self.kind[code]
+        if kind == self.EXPOSED:
+            return self.infected[self.strain[code]]
+        if kind == self.INFECTED:
+            return self.recovered
+        return self.susceptible
+
+    def start_timers(self, actor_idxs, codes, current_time):
+        """ function to draw the period timers of several individuals at
+        once. exposed individuals wait for the latent period, infected for
+        the recovery period and recovered for the waning period (only with
+        SIRS/SEIRS models)
+
+        Parameters
+        ----------
+
+        actor_idxs : array of int
+            row numbers of individuals
+
+        codes : array of int
+            current compartment code of each individual
+
+        current_time : float
+            time the timers start
+        """
+        actor_idxs = np.asarray(actor_idxs, dtype=int)
+        codes = np.asarray(codes, dtype=int)
+        kinds = self.kind[codes]
+        rates = np.zeros(len(actor_idxs))
+        for kind, column in ((self.EXPOSED, 'latent_rate'),
+                             (self.INFECTED, 'recovery_rate'),
+                             (self.RECOVERED, 'waning_rate')):
+            sel = kinds == kind
+            if kind == self.RECOVERED and not self.waning:
+                continue
+            if sel.any():
+                rates[sel] = self.population.df[actor_idxs[sel].tolist(), column
+                                                ].to_numpy().reshape(-1)
+        # individuals without a period (susceptible, or recovered for life)
+        keep = rates > 0
+        if not keep.any():
+            return
+        actor_idxs, codes, rates = actor_idxs[keep], codes[keep], rates[keep]
+        times = np.random.exponential(1 / rates) + current_time
+        actor_ids = self.population.df[actor_idxs.tolist(), 'id'].to_numpy().reshape(-1)
+        for t, i, c in zip(times, actor_ids, codes):
+            heapq.heappush(self.timers, (t, int(i), int(c),
+                                         int(self._next_code(c))))
+
+    def set_clock(self, current_time):
+        """ function to make sure the earliest period timer is in the
+        simulation heap. nothing is returned if it is already scheduled
+
+        Parameters
+        ----------
+
+        current_time : float
+            not used, the timers carry their own times
+
+        Returns
+        -------
+
+        new_events : list
+            the next timer event, empty if already scheduled
+        """
+        if len(self.timers) == 0 or self.timers[0][0] == self.clock_time:
+            return []
+        self.clock_version += 1
+        self.clock_time = self.timers[0][0]
+        params = dict(current_time=self.clock_time, clock=self.clock_version)
+        event_hash = hash(f'{self.clock_time}_{self}_clock_{self.clock_version}')
+        return [(self.clock_time, event_hash, self, params)]
+
+    def set_next(self, params):
+        """ function to start the period timer of an individual, from its
+        current compartment """
+        new_events = []
+        actor_idx = self.population._get_actor_idx(params['actor_id'])
+        if actor_idx is not None:
+            code = self.population.df[actor_idx, str(self)]
+            self.start_timers([actor_idx], [code], params['current_time'])
+            new_events += self.set_clock(params['current_time'])
+        return new_events
+
+    def handle_timers(self, params):
+        """ function to end all period timers due at the clock time """
+        new_events = []
+        # stale, an earlier timer was scheduled after this one
+        if params['clock'] != self.clock_version:
+            return new_events
+        current_time = params['current_time']
+        self.clock_time = None
+        idxs, codes = [], []
+        while len(self.timers) > 0 and self.timers[0][0] <= current_time:
+            _, actor_id, from_code, to_code = heapq.heappop(self.timers)
+            actor_idx = self.population._get_actor_idx(actor_id)
+            # dead, or moved compartment some other way
+            if actor_idx is None:
+                continue
+            if self.population.df[actor_idx, str(self)] != from_code:
+                continue
+            self.trait.set_code(actor_idx, to_code)
+            idxs += [actor_idx]
+            codes += [to_code]
+            if self.triggers:
+                new_events += self.triggers(dict(actor_id=actor_id,
+                                                 current_time=current_time))
+        if idxs:
+            self.start_timers(idxs, codes, current_time)
+        new_events += self.set_clock(current_time)
+        return new_events
+
+    def infect(self, actor_idx, strain, current_time):
+        """ function to infect a susceptible individual with a strain, the
+        individual becomes exposed or infected and its timer starts """
+        if self.latent:
+            code = self.exposed[strain]
+        else:
+            code = self.infected[strain]
+        self.trait.set_code(actor_idx, code)
+        self.start_timers([actor_idx], [code], current_time)
+        return self.set_clock(current_time)
+
+    def handle(self, params):
+
+        if 'clock' in params:
+            return self.handle_timers(params)
+
+        new_events = []
+
+        # contact between two individuals
+        if 'extra' not in params:
+            return new_events
+        actor_idx = self.population._get_actor_idx(int(params['actor_id']))
+        other_idx = self.population._get_actor_idx(int(params['extra']))
+        if actor_idx is None or other_idx is None:
+            return new_events
+
+        status = self.population.df[actor_idx, str(self)]
+        other_status = self.population.df[other_idx, str(self)]
+        kind, other_kind = self.kind[status], self.kind[other_status]
+
+        if kind == self.SUSCEPTIBLE and other_kind == self.INFECTED:
+            target, strain = actor_idx, self.strain[other_status]
+        elif kind == self.INFECTED and other_kind == self.SUSCEPTIBLE:
+            target, strain = other_idx, self.strain[status]
+        else:
+            return new_events
+
+        if self.transmission >= 1 or np.random.uniform() < self.transmission:
+            new_events += self.infect(target, strain, params['current_time'])
+
+        return new_events
+
+    def counts(self):
+        """ function to get the current number of individuals in each
+        compartment, kept by the categorical trait without scanning the
+        population
+
+        Returns
+        -------
+
+        counts : dict
+            compartment name and number of individuals
+        """
+        return dict(zip(self.trait.table.names, self.trait.counts.tolist()))
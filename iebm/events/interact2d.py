@@ -4,6 +4,8 @@ import datatable as dt
 from datatable import f
 
 from .base import Event
+from .. import kernels
+from ..populations.categories import ACTIVE
 
 import warnings
 
@@ -26,15 +28,29 @@ class Interact2DEvent(Event):
 
         if 'other' in params:
             self.other = params['other']
-            t1, t2 = self.get_interact_times_all_main_all_other()
         else:
             self.other = None
-            t1, t2 = self.get_interact_times_all_same()
-        
-        interact_times = np.minimum(t1, t2) + params['current_time']    
-        _, p1_ids = np.where(~np.isnan(interact_times))
-        p1_ids = np.unique(p1_ids)
-        p2_ids = np.nanargmin(interact_times[:, p1_ids], axis=0)   
+        others = self.population if self.other is None else self.other
+
+        # contacts within the population scheduled once per pair, see
+        # handle_pair()
+        if 'pairs' in params:
+            self.pairs = params['pairs']
+        if self.pairs and self.other is not None:
+            raise ValueError('pairs only works for interactions within a population')
+
+        # soonest interaction of every individual, with the kernels
+        if self.pairs:
+            ids = self.population.df.to_numpy(column=self.population.df.colindex('id'))
+            interact_times, p2_ids = kernels.nearest_pairs(
+                *self.motion(self.population), ids,
+                current_time=params['current_time'])
+        else:
+            interact_times, p2_ids = kernels.nearest_interactions(
+                *self.motion(self.population), *self.motion(others),
+                current_time=params['current_time'])
+        p1_ids = np.flatnonzero(p2_ids >= 0)
+        p2_ids = p2_ids[p1_ids]
         
         if self.other is not None:
             other_ids = self.other.df[p2_ids, 'id']
@@ -44,11 +60,41 @@ class Interact2DEvent(Event):
         interact_df = dt.Frame({
             "id" : self.population.df[p1_ids, 'id'], 
             f"{self}_extra" : other_ids, 
-            f"{self}_time"  : interact_times[(p2_ids, p1_ids)] + params['current_time']})
+            f"{self}_time"  : interact_times[p1_ids] + params['current_time']})
         interact_df.key = 'id'
         self.population.df = self.population.df[:, :, dt.join(interact_df)]
         
         
+    def motion(self, population, actor_idx=None):
+        """ function to get the velocities, positions and interaction radii
+        of all individuals of a population, or of one row
+
+        Returns
+        -------
+
+        vx, vy, x, y, r : array of float, or float with actor_idx
+        """
+        df = population.df
+        if actor_idx is not None:
+            if 'vel_x' in df.names:
+                vx, vy = df[actor_idx, ['vel_x', 'vel_y']].to_list()
+                vx, vy = vx[0], vy[0]
+            else:
+                vx, vy = 0, 0
+            x, y, r = [v[0] for v in df[actor_idx, ['x', 'y', f'{self}_radius']].to_list()]
+            return vx, vy, x, y, r
+        if 'vel_x' in df.names:
+            vx = df.to_numpy(column=df.colindex('vel_x'))
+            vy = df.to_numpy(column=df.colindex('vel_y'))
+        else:
+            vx = np.zeros(df.shape[0])
+            vy = np.zeros(df.shape[0])
+        x = df.to_numpy(column=df.colindex('x'))
+        y = df.to_numpy(column=df.colindex('y'))
+        r = df.to_numpy(column=df.colindex(f'{self}_radius'))
+        # compact populations store float32, the times are found in float64
+        return tuple(v.astype(np.float64, copy=False) for v in (vx, vy, x, y, r))
+
     def get_interact_times_all_main_all_other(self):
         
         if 'vel_x' in self.population.df.names:
@@ -99,7 +145,10 @@ class Interact2DEvent(Event):
         return self.calculate_interact_times(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r)
     
 
-    def get_interact_times_all_main_single_other(self, other_idx):
+    def get_interact_times_all_main_single_other(self, other_idx, other=None):
+
+        if other is None:
+            other = self.other
         
         if 'vel_x' in self.population.df.names:
             p_vx = self.population.df.to_numpy(column=self.population.df.colindex('vel_x'))
@@ -111,15 +160,15 @@ class Interact2DEvent(Event):
         p_y = self.population.df.to_numpy(column=self.population.df.colindex('y'))
         p_r = self.population.df.to_numpy(column=self.population.df.colindex(f'{str(self)}_radius'))
 
-        if 'vel_x' in self.other.df.names:
-            n_vx = self.other.df[other_idx, 'vel_x']
-            n_vy = self.other.df[other_idx, 'vel_y']
+        if 'vel_x' in other.df.names:
+            n_vx = other.df[other_idx, 'vel_x']
+            n_vy = other.df[other_idx, 'vel_y']
         else:
             n_vx = 0
             n_vy = 0
-        n_x = self.other.df[other_idx, 'x']
-        n_y = self.other.df[other_idx, 'y']
-        n_r = self.other.df[other_idx, f'{str(self)}_radius']
+        n_x = other.df[other_idx, 'x']
+        n_y = other.df[other_idx, 'y']
+        n_r = other.df[other_idx, f'{str(self)}_radius']
 
         return self.calculate_interact_times(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r)
     
@@ -171,30 +220,10 @@ class Interact2DEvent(Event):
   
 
     def calculate_interact_times(self, p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r):
-    
-        a = n_vx**2 - 2*n_vx*p_vx + n_vy**2 - 2*n_vy*p_vy + p_vx**2 + p_vy**2
-        b = (2*n_vx*n_x - 2*n_vx*p_x + 2*n_vy*n_y - 2*n_vy*p_y - 2*n_x*p_vx 
-             - 2*n_y*p_vy + 2*p_vx*p_x + 2*p_vy*p_y)
-        c = (-n_r**2 - 2*n_r*p_r + n_x**2 - 2*n_x*p_x + n_y**2 - 2*n_y*p_y - 
-             p_r**2 + p_x**2 + p_y**2)
-
-        determinant = b**2 - 4 * a * c
-        determinant[determinant<0] = np.nan
-        
-        # remove warnings for own collision
-        if isinstance(a, (np.ndarray, np.generic)):
-            a[np.isclose(a, 0)] = np.nan
-        # sometimes sessile individuals interact
-        #elif a == 0:
-        #    a = np.nan
-
-        t1 = (-b + np.sqrt(determinant)) / (2 * a)
-        t2 = (-b - np.sqrt(determinant)) / (2 * a)
-        
-        t1[np.less(t1, 0, where=~np.isnan(t1))] = np.nan
-        t2[np.less(t2, 0, where=~np.isnan(t2))] = np.nan
-
-        return t1, t2
+        # see kernels.interact_times, in float64 also for compact populations
+        args = [v.astype(np.float64) if getattr(v, 'dtype', None) == np.float32 else v
+                for v in (p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r)]
+        return kernels.interact_times(*args)
     
 
     def set_next(self, params):
@@ -209,43 +238,62 @@ class Interact2DEvent(Event):
                 
                 status = self.population.df[actor_idx, 'status']
                 
-                if status == 'active':
+                if status == ACTIVE:
                 
                     # if extra exists, make sure to ignore same to not repeat interaction
                     if 'extra' in params:
                         other_id = params['extra']
-                        if ~isinstance(other_id, (int,float)):
+                        if self.pairs and other_id is not None:
+                            # the pair just met, not again while touching
+                            other_idx = None
+                        elif ~isinstance(other_id, (int,float)):
                             other_id = None
                             other_idx = None
                     else:
                         other_id = None
                         other_idx = None
 
-                    if self.other is not None:
-                        t1, t2 = self.get_interact_times_single_main_all_other(actor_idx)
-
-                        if other_id is not None:
-                            other_idx = self.other._get_actor_idx(other_id)
-
-                    else:
-                        t1, t2 = self.get_interact_times_single_same(actor_idx)
-
-                        if other_id is not None:
-                            other_idx = self.population._get_actor_idx(other_id)
-
-                    interact_times = np.minimum(t1, t2)
+                    others = self.population if self.other is None else self.other
+                    if other_id is not None:
+                        other_idx = others._get_actor_idx(other_id)
 
+                    skip = None
                     if other_idx is not None:
-                        interact_times[other_idx] = np.nan
+                        skip = np.zeros(others.df.nrows, dtype=bool)
+                        skip[other_idx] = True
+
+                    # ignore rows flagged dead
+                    if others.dead_count > 0:
+                        dead = ~others.alive_mask()
+                        skip = dead if skip is None else skip | dead
+
+                    # the same time for both individuals of a pair
+                    swap = None
+                    if self.pairs:
+                        swap = others.df.to_numpy(column=others.df.colindex('id')) < actor_id
+
+                    actor_motion = self.motion(self.population, actor_idx)
+                    min_time, min_actor = kernels.nearest_interaction(
+                        *actor_motion, *self.motion(others), skip=skip, swap=swap)
+
+                    # the contact just handled, found again because the pair
+                    # is still touching within the tolerance, e.g. rounded
+                    # float32 positions. the next contact is looked for past it
+                    if min_actor >= 0 and 'extra' in params and self.repeats_contact(
+                            params['extra'], others, min_actor, min_time, actor_motion):
+                        skip = np.zeros(others.df.nrows, dtype=bool) if skip is None else skip.copy()
+                        skip[min_actor] = True
+                        min_time, min_actor = kernels.nearest_interaction(
+                            *actor_motion, *self.motion(others), skip=skip, swap=swap)
                 
                 else:
-                    interact_times = [np.nan]
+                    min_actor = -1
 
-                min_time = None
-                min_actor = None
-                if np.nansum(interact_times) > 0:
-                    min_time = np.nanmin(interact_times) + params['current_time']
-                    min_actor = int(np.nanargmin(interact_times))
+                if min_actor < 0:
+                    min_time = None
+                    min_actor = None
+                else:
+                    min_time = min_time + params['current_time']
                     if self.other is not None:
                         min_actor = self.other.df[min_actor, 'id']
                     else:
@@ -257,6 +305,48 @@ class Interact2DEvent(Event):
         return []
 
             
+    def tolerance(self, eps=0.00001):
+        """ function to get the distance within which two individuals touch,
+        at least 64 steps of a position at the far walls, positions of
+        compact populations are rounded to float32"""
+        return max(eps, 64 * self.population.resolution)
+
+    def repeats_contact(self, extra, others, other_idx, time, actor_motion):
+        """ function to check if a predicted contact is the one just handled,
+        with the same partner and before the pair moved apart by more than
+        the tolerance. moving in straight lines, a pair that touched can
+        only meet again after one of them turned, which sets the next
+        interaction again anyway
+
+        Parameters
+        ----------
+
+        extra : float or None
+            id of the partner of the contact just handled
+
+        others : Population2D
+            population of the partners
+
+        other_idx : int
+            row of the predicted partner
+
+        time : float
+            time from now of the predicted contact
+
+        actor_motion : tuple
+            vx, vy, x, y, r of the actor, see motion()
+
+        Returns
+        -------
+
+        repeat : bool
+        """
+        if extra is None or extra != extra or others.df[other_idx, 'id'] != extra:
+            return False
+        vx, vy = self.motion(others, other_idx)[:2]
+        speed = np.hypot(actor_motion[0] - vx, actor_motion[1] - vy)
+        return time * speed <= self.tolerance()
+
     def set_other_next(self, params):
         
         new_events = []
@@ -271,6 +361,10 @@ class Interact2DEvent(Event):
                 t1, t2 = self.get_interact_times_all_main_single_other(other_idx)
                 interact_times = np.minimum(t1, t2) 
 
+                # only active rows can start a new interaction, this
+                # also ignores rows flagged dead
+                interact_times[~self.population.active_mask()] = np.nan
+
                 new_interactions = ~np.isnan(interact_times)
 
                 if new_interactions.any():
@@ -302,8 +396,131 @@ class Interact2DEvent(Event):
             return new_events
 
 
+    def refresh_partner(self, partner_idx, current_time):
+        """ function to predict interactions with an individual of the same
+        population again after its velocity changed, e.g. when it is
+        suspended or resumed. individuals that expected to meet it are set
+        again, the others only take the new interaction if it is sooner.
+        does nothing for interactions with another population
+
+        Parameters
+        ----------
+
+        partner_idx : int
+            row number of individual with changed velocity
+
+        current_time : float
+            time of the change
+
+        Returns
+        -------
+
+        new_events : list
+            next events of individuals with a changed interaction
+        """
+        new_events = []
+        if not self.is_primary or self.other is not None:
+            return new_events
+
+        df = self.population.df
+        partner_id = df[partner_idx, 'id']
+        active = self.population.active_mask()
+
+        def cancel(idxs):
+            # the scheduled interactions of rows set again are replaced. a
+            # pair still touching at the old time would be met twice
+            for i in df[list(idxs), 'id'].to_list()[0]:
+                pending = self.population.get_next_event(i)
+                if (len(pending) > 0 and pending[2] is self and
+                        pending[0] > current_time):
+                    self.population.cancel(pending, current_time)
+
+        # interactions predicted with the old velocity are stale
+        extras = df.to_numpy(column=df.colindex(f'{self}_extra'))
+        extras = np.ma.filled(np.ma.asarray(extras).astype(np.float64), np.nan)
+        stale = np.flatnonzero((extras == partner_id) & active)
+        cancel(stale.tolist())
+        for i in df[stale.tolist(), 'id'].to_list()[0]:
+            self.set_next(dict(actor_id=i, current_time=current_time))
+
+        # new interaction times with the partner
+        t1, t2 = self.get_interact_times_all_main_single_other(partner_idx,
+                                                                self.population)
+        interact_times = np.minimum(t1, t2) + current_time
+        interact_times[partner_idx] = np.nan
+        interact_times[~active] = np.nan
+        interact_times[stale] = np.nan
+        times = df.to_numpy(column=df.colindex(f'{self}_time'))
+        times = np.ma.filled(np.ma.asarray(times).astype(np.float64), np.nan)
+        sooner = ~np.isnan(interact_times) & (np.isnan(times) |
+                                              (interact_times < times))
+        update_idxs = np.flatnonzero(sooner)
+        if len(update_idxs) > 0:
+            cancel(update_idxs.tolist())
+            df[update_idxs.tolist(), f'{self}_time'] = interact_times[sooner]
+            df[update_idxs.tolist(), f'{self}_extra'] = partner_id
+
+        return self.population.get_next_events(
+            np.concatenate([stale, update_idxs]).tolist())
+
+    def suspended(self, actor_idx, current_time):
+        return self.refresh_partner(actor_idx, current_time)
+
+    def resumed(self, actor_idx, current_time):
+        return self.refresh_partner(actor_idx, current_time)
+
     def handle(self, params, eps=0.00001):
 
+        if self.pairs:
+            return self.handle_pair(params, eps)
+        return self.handle_contact(params, eps)
+
+    def handle_pair(self, params, eps=0.00001):
+        """ function to handle a contact once for both individuals, with
+        pairs. both individuals predict the contact at exactly the same
+        time and the events of both get the same hash, so the simulation
+        handles the first and drops the other as a repeat. the contact is
+        handled from the side of an active individual, and the triggers are
+        called once, so they have to act on both individuals like the SIR
+        infection or a stoppage of both. then the next events of both are
+        set, unless trigger_set_next. a contact neither individual predicts
+        anymore, e.g. met already or predicted again with another time, is
+        dropped
+        """
+        df = self.population.df
+        actor_id = int(params['actor_id'])
+        partner_id = int(params['extra'])
+        actor_idx = self.population._get_actor_idx(actor_id)
+        partner_idx = self.population._get_actor_idx(partner_id)
+
+        def predicts(idx, other_id):
+            return (idx is not None and
+                    df[idx, f'{self}_time'] == params['current_time'] and
+                    df[idx, f'{self}_extra'] == other_id)
+
+        if not (predicts(actor_idx, partner_id) or predicts(partner_idx, actor_id)):
+            return []
+
+        def active(idx):
+            return idx is not None and self.population.df[idx, 'status'] == ACTIVE
+
+        if not active(actor_idx) and active(partner_idx):
+            params = dict(params, actor_id=partner_id, extra=actor_id)
+            partner_id, partner_idx = actor_id, actor_idx
+
+        events = self.handle_contact(params, eps)
+
+        # in place of the dropped event of the partner
+        if (self.is_primary and not self.trigger_set_next and
+                partner_idx is not None and active(self.population._get_actor_idx(partner_id))):
+            self.set_next(dict(current_time=params['current_time'],
+                               actor_id=partner_id, extra=params['actor_id']))
+            events += [self.population.get_next_event(partner_id)]
+
+        return events
+
+    def handle_contact(self, params, eps=0.00001):
+
         events = []
 
         actor_id = int(params['actor_id'])
@@ -313,7 +530,7 @@ class Interact2DEvent(Event):
 
             status = self.population.df[actor_idx, 'status']
             
-            if status == 'active':
+            if status == ACTIVE:
             
                 other_id = int(params['extra'])
                 if self.other is not None:
@@ -330,8 +547,9 @@ class Interact2DEvent(Event):
                     else:
                         other_x, other_y, other_r = self.population.df[other_idx, ['x', 'y', f'{str(self)}_radius']].to_numpy()[0]
 
-                    dist = np.sqrt((actor_x-other_x)**2 + (actor_y-other_y)**2)
+                    dist = np.sqrt((float(actor_x)-other_x)**2 + (float(actor_y)-other_y)**2)
                     r = actor_r + other_r
+                    eps = self.tolerance(eps)
 
                     # make sure actually close, maybe previously event changed actor's direction
                     if dist <= r + eps:
@@ -2,6 +2,7 @@ import numpy as np
 import datatable as dt
 
 from .base import Event
+from ..populations.categories import ACTIVE, INACTIVE
 
 class Pause2DEvent(Event):
     
@@ -17,6 +18,12 @@ class Pause2DEvent(Event):
         params : dict
             *must contain:
             - 'current_time'
+            *optional:
+            - 'suspend' : True|False, park the event times in set_list with
+              Population2D.suspend() and restore them at the end of the
+              pause, instead of clearing them. events that stay valid are
+              shifted by the pause duration, the others are set again, so
+              the triggers do not need to set them. default False
 
         """
         
@@ -36,6 +43,11 @@ class Pause2DEvent(Event):
             self.ignore_list = []
         self.ignore_list += [f'{str(self)}_time']
         self.set_list = []
+
+        if 'suspend' in params:
+            self.suspend = params['suspend']
+        else:
+            self.suspend = False
         
         
     def set_next(self, params):
@@ -52,11 +64,15 @@ class Pause2DEvent(Event):
                                                   ['velocity', 'vel_x', 'vel_y', 
                                                    f'{str(self)}', 'status']].to_numpy()[0]
             
-            if status == 'active':
+            if status == ACTIVE:
             
                 self.population.df[actor_idx, ['velocity', 'vel_x', 'vel_y']] = 0 
-                self.population.df[actor_idx, self.set_list] = np.nan
-                self.population.df[actor_idx, 'status'] = 'inactive'
+                self.population.df[actor_idx, 'status'] = INACTIVE
+                if self.suspend:
+                    new_events += self.population.suspend(
+                        actor_id, params['current_time'], self.set_list)
+                else:
+                    self.population.df[actor_idx, self.set_list] = np.nan
 
                 end_time = params['current_time'] + pt 
                 new_params = dict(actor_id = actor_id, 
@@ -99,13 +115,18 @@ class Pause2DEvent(Event):
         
         if actor_idx is not None:
             
-            self.population.df[actor_idx, 'velocity'] = params['cv']
-            self.population.df[actor_idx, 'vel_x'] = params['cvx']
-            self.population.df[actor_idx, 'vel_y'] = params['cvy']
-            self.population.df[actor_idx, 'status'] = 'active'
+            fit = self.population.fit
+            self.population.df[actor_idx, 'velocity'] = fit(params['cv'])
+            self.population.df[actor_idx, 'vel_x'] = fit(params['cvx'])
+            self.population.df[actor_idx, 'vel_y'] = fit(params['cvy'])
+            self.population.df[actor_idx, 'status'] = ACTIVE
             del params['cv']
             del params['cvx']
             del params['cvy']
+
+            if self.suspend:
+                new_events += self.population.resume(actor_id,
+                                                     params['current_time'])
             
             if self.triggers:
                 new_events += self.triggers(params)
@@ -1,6 +1,4 @@
 import numpy as np
-import rtree
-from scipy.spatial.distance import cdist
 
 from .base import Event
 
@@ -14,6 +12,9 @@ class RotateEvent(Event):
     maybe store moving locations in an IVF flat from FAISS
     """
 
+    # exponential waiting times, shifting a parked time is valid
+    shift_on_resume = True
+
     def __init__(self, population, params):
         
         if 'triggers' in params:
@@ -24,17 +25,16 @@ class RotateEvent(Event):
         # initialize base event
         super().__init__(population, params['name'], 
                          params['is_primary'], triggers)
+        # optional time-dependent rotate rates, by thinning
+        self.set_forcing(params)
         
         self.attract_pop = params['attract_population']
-        
-        self.attract_index = rtree.index.Index()
-        for i,x,y in self.attract_pop.df[:, ['id', 'x', 'y']].to_tuples():
-            self.attract_index.insert(i, (x,y))
+        self.build_index()
         
         if self.is_primary:
             rotate_rates = self.population.df.to_numpy(
                 column=self.population.df.colindex(f'{self}_rate'))
-            rotate_times = (np.random.exponential(1 / rotate_rates) +
+            rotate_times = (np.random.exponential(1 / (rotate_rates * self.forcing_max)) +
                            params['current_time'])
             self.population.df[f'{self}_time'] = rotate_times
         
@@ -45,16 +45,25 @@ class RotateEvent(Event):
             actor_idx = self.population._get_actor_idx(actor_id)
             if actor_idx is not None:
                 rotate_rate = self.population.df[actor_idx, f'{self}_rate']
-                rotate_time = (np.random.exponential(1 / rotate_rate) + params['current_time'])
+                rotate_time = (np.random.exponential(1 / (rotate_rate * self.forcing_max)) +
+                               params['current_time'])
                 self.population.df[actor_idx, f'{self}_time'] = rotate_time
+
+    def set_next_rows(self, actor_idxs, current_time):
+        if self.is_primary:
+            actor_idxs = list(actor_idxs)
+            rotate_rates = self.population.df[actor_idxs, f'{self}_rate'].to_numpy().reshape(-1)
+            self.population.df[actor_idxs, f'{self}_time'] = (
+                np.random.exponential(1 / (rotate_rates * self.forcing_max)) + current_time)
         
     def handle(self, params):
+        from scipy.spatial.distance import cdist
         new_events = []
         
         actor_id = params['actor_id']
         actor_idx = self.population._get_actor_idx(actor_id)
         
-        if actor_idx:
+        if actor_idx and not self.thinned(actor_idx, params['current_time']):
             
             actor_x, actor_y, actor_z = self.population.df[actor_idx, ['x', 'y', 
                                                                        f'{self}_radius']].to_numpy()[0]
@@ -74,7 +83,7 @@ class RotateEvent(Event):
                 min_x, min_y = neigh_points[min_arg]
                 new_ang = np.arctan2(*(min_y - actor_y, min_x - actor_x))
                 
-                self.population.df[actor_idx, 'angle'] = new_ang
+                self.population.df[actor_idx, 'angle'] = self.population.fit(new_ang)
                 
                 if self.triggers:
                     new_events += self.triggers(params) 
@@ -86,6 +95,20 @@ class RotateEvent(Event):
 
         return new_events
 
+    def build_index(self):
+        "function to index the x-y coordinates of the attracting individuals"
+        # imported here, only models with rotate events need rtree
+        import rtree
+        self.attract_index = rtree.index.Index()
+        rows = self.attract_pop.df[:, ['id', 'x', 'y']]
+        if self.attract_pop.dead_count > 0:
+            rows = rows[self.attract_pop.alive_mask().tolist(), :]
+        for i,x,y in rows.to_tuples():
+            self.attract_index.insert(i, (x,y))
+
+    def restored(self):
+        self.build_index()
+
     def add_attracted(self, params):
         attracted_id = int(params['actor_id'])
         attracted_idx = self.attract_pop._get_actor_idx(attracted_id)
@@ -3,14 +3,24 @@ import datatable as dt
 from datatable import f, math
 
 from .base import Event
+from ..populations.categories import ACTIVE
+
+
+# wall names, in the order of the wall times
+WALLS = ['x0', 'x1', 'y0', 'y1']
 
 
 class WallEvent(Event):
     """ Event to handle the wall collision of moving individuals. Moving
-    individuals probably should have environmental boundaries
+    individuals probably should have environmental boundaries. Walls in
+    population.open_walls are crossed instead, the individual leaves the
+    population (see Population2D.emigrate), e.g. at borders between tiles
 
     """
 
+    # a suspended individual stands still, the walls do not move
+    shift_on_resume = True
+
     def __init__(self, population, params):
         """Construct Wall Event with given hard-coded name
 
@@ -47,11 +57,12 @@ class WallEvent(Event):
                 self.population.df['vel_y'] = self.population.df[:, math.sin(f.angle) * f.velocity]
                 
             # create wall dataframe based on each individual radius, position, angle, and speed
+            k0, k1, k2, k3 = self.wall_offsets()
             wall_df = dt.Frame(
-                wall_x0_time=self.population.df[:, ((f.radius - f.x) / f.vel_x)],
-                wall_x1_time=self.population.df[:, ((self.population.xdim - f.radius - f.x) / f.vel_x)],
-                wall_y0_time=self.population.df[:, (f.radius - f.y) / f.vel_y],
-                wall_y1_time=self.population.df[:, ((self.population.ydim - f.radius - f.y) / f.vel_y)])
+                wall_x0_time=self.population.df[:, ((f.radius * k0 - f.x) / f.vel_x)],
+                wall_x1_time=self.population.df[:, ((self.population.xdim - f.radius * k1 - f.x) / f.vel_x)],
+                wall_y0_time=self.population.df[:, (f.radius * k2 - f.y) / f.vel_y],
+                wall_y1_time=self.population.df[:, ((self.population.ydim - f.radius * k3 - f.y) / f.vel_y)])
             # make sure times are forward
             wall_df[f.wall_x0_time<0, f.wall_x0_time] = np.nan
             wall_df[f.wall_x1_time<0, f.wall_x1_time] = np.nan
@@ -61,6 +72,20 @@ class WallEvent(Event):
             self.population.df[:, f'{self}_time'] = (wall_df.to_numpy().min(1) +
                                                      params['current_time'])
 
+    def wall_offsets(self):
+        """ function to get the radius factor of every wall, in the order of
+        WALLS. individuals bounce one radius before a closed wall (1) and
+        cross an open wall (0) with their centre"""
+        return [0 if w in self.population.open_walls else 1 for w in WALLS]
+
+    def hit_wall(self, actor_idx):
+        "function to get the name of the wall an individual is at"
+        x, y, r = self.population.df[actor_idx, ['x', 'y', 'radius']].to_numpy()[0]
+        k0, k1, k2, k3 = self.wall_offsets()
+        dist = [x - r * k0, self.population.xdim - r * k1 - x,
+                y - r * k2, self.population.ydim - r * k3 - y]
+        return WALLS[int(np.argmin(np.abs(dist)))]
+
     def set_next(self, params, actor_idx=None):
         
         if actor_idx is None:
@@ -69,7 +94,8 @@ class WallEvent(Event):
 
         if actor_idx is not None:
 
-            x, y, r = self.population.df[actor_idx, ['x', 'y', 'radius']].to_numpy()[0]
+            x, y, r = self.population.df[actor_idx, ['x', 'y', 'radius']].to_numpy()[0].astype(np.float64)
+            fit = self.population.fit
             
             # change angle
             # maybe check if close to wall before changing angle
@@ -80,7 +106,7 @@ class WallEvent(Event):
                                   np.min(np.abs(actor_y - [0, self.ydim]))])
                 if wall == 0:
                     # hit vertical wall, add pi to reverse angle
-                    self.population.df[actor_idx, 'angle'] = (
+                    self.population.df[actor_idx, 'angle'] = fit(
                         np.pi - self.population.df[actor_idx, 'angle'])
                 else:
                     # hit horizontal wall, reverse angle
@@ -88,46 +114,94 @@ class WallEvent(Event):
                         -self.population.df[actor_idx, 'angle'])
             else:
                 # default random angle change
-                self.population.df[actor_idx, 'angle'] = (
+                self.population.df[actor_idx, 'angle'] = fit(
                     np.random.rand() * 2 * np.pi)
 
-            # check if actor on wall (need to move a bit)
-            if x <= r + 0.1*r:
-                self.population.df[actor_idx, 'x'] = r * 2
-            if x >= self.population.xdim - (r + 0.1*r):
-                self.population.df[actor_idx, 'x'] = (
+            # check if actor on wall (need to move a bit), open walls
+            # are crossed instead
+            k0, k1, k2, k3 = self.wall_offsets()
+            if k0 and x <= r + 0.1*r:
+                self.population.df[actor_idx, 'x'] = fit(r * 2)
+            if k1 and x >= self.population.xdim - (r + 0.1*r):
+                self.population.df[actor_idx, 'x'] = fit(
                     self.population.xdim - r * 2)
-            if y <= r + 0.1*r:
-                self.population.df[actor_idx, 'y'] = r * 2
-            if y >= self.population.ydim - (r + 0.1*r):
-                self.population.df[actor_idx, 'y'] = (
+            if k2 and y <= r + 0.1*r:
+                self.population.df[actor_idx, 'y'] = fit(r * 2)
+            if k3 and y >= self.population.ydim - (r + 0.1*r):
+                self.population.df[actor_idx, 'y'] = fit(
                     self.population.ydim - r * 2)
 
             # update velocity components and new wall event times
             self.population.df[actor_idx, 'vel_x'] = self.population.df[
-                actor_idx, math.cos(f.angle) * f.velocity]
+                actor_idx, self.population.fit_expr(math.cos(f.angle) * f.velocity)]
             self.population.df[actor_idx, 'vel_y'] = self.population.df[
-                actor_idx, math.sin(f.angle) * f.velocity]
-
-            # update new wall times
-            wall_x0 = self.population.df[
-                actor_idx, (f.radius - f.x) / f.vel_x][0,0]
-            wall_x1 = self.population.df[
-                actor_idx, ((self.population.xdim - f.radius - f.x)
-                            / f.vel_x)][0,0]
-            wall_y0 = self.population.df[
-                actor_idx, (f.radius - f.y) / f.vel_y][0,0]
-            wall_y1 = self.population.df[
-                actor_idx, ((self.population.ydim - f.radius - f.y)
-                            / f.vel_y)][0,0]
-            wall_times = np.array([wall_x0, wall_x1, wall_y0, wall_y1], 
-                                  dtype=np.float)
+                actor_idx, self.population.fit_expr(math.sin(f.angle) * f.velocity)]
+
+            # update new wall times, from one read of the row
+            x, y, r, vx, vy = self.population.df[
+                actor_idx, ['x', 'y', 'radius', 'vel_x', 'vel_y']].to_numpy()[0].astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                wall_times = np.array([(r * k0 - x) / vx,
+                                       (self.population.xdim - r * k1 - x) / vx,
+                                       (r * k2 - y) / vy,
+                                       (self.population.ydim - r * k3 - y) / vy],
+                                      dtype=np.float64)
 
             wall_times[wall_times<=0] = np.nan
             wall_time = np.nanmin(wall_times) + params['current_time']
  
             self.population.df[actor_idx, f'{self}_time'] = wall_time
 
+    def set_next_rows(self, actor_idxs, current_time):
+        """ function to set the wall times of several individuals without
+        turning them, e.g. individuals handed over from a neighbouring tile.
+        individuals without a heading yet, e.g. the offspring of a litter,
+        get a random one. individuals overlapping a closed wall are moved
+        inside, and turned away from it
+        """
+
+        if self.is_primary:
+            actor_idxs = list(actor_idxs)
+            df = self.population.df
+            rows = df[actor_idxs, ['x', 'y', 'radius', 'vel_x', 'vel_y', 'angle',
+                                   'velocity']].to_numpy()
+            x, y, r, vx, vy, angle, velocity = np.ma.filled(
+                np.ma.asarray(rows).astype(np.float64), np.nan).T
+            # newborns have no heading yet
+            new = np.isnan(angle)
+            if new.any():
+                angle[new] = np.random.rand(int(new.sum())) * 2 * np.pi
+                vx[new] = np.cos(angle[new]) * velocity[new]
+                vy[new] = np.sin(angle[new]) * velocity[new]
+            k0, k1, k2, k3 = self.wall_offsets()
+            x = np.clip(x, r * k0, self.population.xdim - r * k1)
+            y = np.clip(y, r * k2, self.population.ydim - r * k3)
+            # individuals on a closed wall and heading out are reflected
+            out_x = ((k0 > 0) & (x <= r) & (vx < 0)) | (
+                (k1 > 0) & (x >= self.population.xdim - r) & (vx > 0))
+            out_y = ((k2 > 0) & (y <= r) & (vy < 0)) | (
+                (k3 > 0) & (y >= self.population.ydim - r) & (vy > 0))
+            angle[out_x] = np.pi - angle[out_x]
+            vx[out_x] = -vx[out_x]
+            angle[out_y] = -angle[out_y]
+            vy[out_y] = -vy[out_y]
+            fit = self.population.fit
+            df[actor_idxs, 'x'] = fit(x)
+            df[actor_idxs, 'y'] = fit(y)
+            df[actor_idxs, 'angle'] = fit(angle)
+            df[actor_idxs, 'vel_x'] = fit(vx)
+            df[actor_idxs, 'vel_y'] = fit(vy)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                wall_times = np.stack([(r * k0 - x) / vx,
+                                       (self.population.xdim - r * k1 - x) / vx,
+                                       (r * k2 - y) / vy,
+                                       (self.population.ydim - r * k3 - y) / vy], 1)
+            # most immediate forward wall, none for standing individuals
+            wall_times[~(wall_times > 0)] = np.inf
+            wall_time = wall_times.min(1) + current_time
+            wall_time[np.isinf(wall_time)] = np.nan
+            df[actor_idxs, f'{self}_time'] = wall_time
+
     def handle(self, params):
         
         new_events = []
@@ -139,7 +213,13 @@ class WallEvent(Event):
             
             status = self.population.df[actor_idx, 'status']
             
-            if status == 'active':
+            if status == ACTIVE:
+
+                # crossing an open wall, the individual leaves the population
+                if (len(self.population.open_walls) > 0 and
+                        self.hit_wall(actor_idx) in self.population.open_walls):
+                    return self.population.emigrate(actor_id,
+                                                    params['current_time'])
         
                 self.set_next(params, actor_idx)
 
@@ -0,0 +1,411 @@
+""" Kernels of the collision math of Interact2DEvent. With numba installed
+the loops are compiled, and the interaction time of every pair is computed
+and reduced to the soonest one per individual in a single pass, without the
+temporary arrays of the NumPy version. Without numba the NumPy version is
+used. Both give exactly the same times, see check_backends(). The 'python'
+backend runs the same loops uncompiled, slow, but it checks them without
+numba installed.
+
+    from iebm import kernels
+    kernels.BACKEND             # 'numba' or 'numpy'
+    kernels.use_backend('numpy')
+"""
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    # compiled kernels are not available, NumPy is used
+    numba = None
+
+
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+
+def use_backend(name):
+    """ function to choose the kernels, e.g. to compare them
+
+    Parameters
+    ----------
+
+    name : str
+        'numba', 'numpy' or 'python'
+    """
+    global BACKEND
+    if name not in ('numba', 'numpy', 'python'):
+        raise ValueError(f"backend must be 'numba', 'numpy' or 'python', not {name!r}")
+    if name == 'numba' and numba is None:
+        raise ImportError('the numba backend needs numba, pip install numba')
+    BACKEND = name
+
+
+def interact_times(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r):
+    """ function to get the two times at which individuals p and n touch,
+    moving in straight lines. NaN for pairs that never touch or touched
+    in the past, and for pairs without relative movement. broadcasts, e.g.
+    p as rows and n as a column give a matrix of all pairs
+
+    Returns
+    -------
+
+    t1, t2 : array of float
+        times from now, t2 is the first contact for approaching pairs
+    """
+    # products instead of **2, a power of a numpy scalar can differ from
+    # x*x in the last bit, and the loops of _pair_time() use x*x
+    a = (n_vx*n_vx - 2*n_vx*p_vx + n_vy*n_vy - 2*n_vy*p_vy + p_vx*p_vx
+         + p_vy*p_vy)
+    b = (2*n_vx*n_x - 2*n_vx*p_x + 2*n_vy*n_y - 2*n_vy*p_y - 2*n_x*p_vx
+         - 2*n_y*p_vy + 2*p_vx*p_x + 2*p_vy*p_y)
+    c = (-(n_r*n_r) - 2*n_r*p_r + n_x*n_x - 2*n_x*p_x + n_y*n_y - 2*n_y*p_y
+         - p_r*p_r + p_x*p_x + p_y*p_y)
+
+    determinant = b*b - 4 * a * c
+    determinant[determinant<0] = np.nan
+
+    # remove warnings for own collision
+    if isinstance(a, (np.ndarray, np.generic)):
+        a[np.isclose(a, 0)] = np.nan
+    # sometimes sessile individuals interact
+    #elif a == 0:
+    #    a = np.nan
+
+    t1 = (-b + np.sqrt(determinant)) / (2 * a)
+    t2 = (-b - np.sqrt(determinant)) / (2 * a)
+
+    t1[np.less(t1, 0, where=~np.isnan(t1))] = np.nan
+    t2[np.less(t2, 0, where=~np.isnan(t2))] = np.nan
+
+    return t1, t2
+
+
+def _pair_time(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r):
+    """helper function with the math of interact_times() for one pair,
+    term by term in the same order so the rounding is the same. returns
+    the sooner of the two times, NaN if either is NaN like np.minimum"""
+    a = (n_vx*n_vx - 2*n_vx*p_vx + n_vy*n_vy - 2*n_vy*p_vy + p_vx*p_vx
+         + p_vy*p_vy)
+    b = (2*n_vx*n_x - 2*n_vx*p_x + 2*n_vy*n_y - 2*n_vy*p_y - 2*n_x*p_vx
+         - 2*n_y*p_vy + 2*p_vx*p_x + 2*p_vy*p_y)
+    c = (-(n_r*n_r) - 2*n_r*p_r + n_x*n_x - 2*n_x*p_x + n_y*n_y - 2*n_y*p_y
+         - p_r*p_r + p_x*p_x + p_y*p_y)
+    determinant = b*b - 4 * a * c
+    # np.isclose(a, 0), and no real roots
+    if not determinant >= 0 or abs(a) <= 1e-08:
+        return np.nan
+    root = math.sqrt(determinant)
+    t1 = (-b + root) / (2 * a)
+    t2 = (-b - root) / (2 * a)
+    if t1 < 0 or t2 < 0:
+        return np.nan
+    return min(t1, t2)
+
+
+def _nearest_one(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r, skip,
+                 swap):
+    "helper function, loop of nearest_interaction()"
+    best = np.inf
+    best_idx = -1
+    positive = False
+    for j in range(len(n_x)):
+        if skip[j]:
+            continue
+        if swap[j]:
+            t = _pair_time(n_vx[j], n_vy[j], n_x[j], n_y[j], n_r[j],
+                           p_vx, p_vy, p_x, p_y, p_r)
+        else:
+            t = _pair_time(p_vx, p_vy, p_x, p_y, p_r,
+                           n_vx[j], n_vy[j], n_x[j], n_y[j], n_r[j])
+        if t == t:
+            if t > 0:
+                positive = True
+            if t < best:
+                best = t
+                best_idx = j
+    if not positive:
+        return np.nan, -1
+    return best, best_idx
+
+
+def _nearest_all(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r,
+                 current_time):
+    "helper function, loop of nearest_interactions()"
+    times = np.full(len(p_x), np.nan)
+    idxs = np.full(len(p_x), -1)
+    for i in range(len(p_x)):
+        best = np.inf
+        for j in range(len(n_x)):
+            t = _pair_time(p_vx[i], p_vy[i], p_x[i], p_y[i], p_r[i],
+                           n_vx[j], n_vy[j], n_x[j], n_y[j], n_r[j])
+            t = t + current_time
+            if t < best:
+                best = t
+                idxs[i] = j
+        if idxs[i] >= 0:
+            times[i] = best
+    return times, idxs
+
+
+def _nearest_pairs(vx, vy, x, y, r, ids, current_time):
+    "helper function, loop of nearest_pairs()"
+    times = np.full(len(x), np.inf)
+    idxs = np.full(len(x), -1)
+    for i in range(len(x)):
+        for j in range(i + 1, len(x)):
+            # the individual with the smaller id is p
+            if ids[i] < ids[j]:
+                t = _pair_time(vx[i], vy[i], x[i], y[i], r[i],
+                               vx[j], vy[j], x[j], y[j], r[j])
+            else:
+                t = _pair_time(vx[j], vy[j], x[j], y[j], r[j],
+                               vx[i], vy[i], x[i], y[i], r[i])
+            t = t + current_time
+            if t < times[i]:
+                times[i] = t
+                idxs[i] = j
+            if t < times[j]:
+                times[j] = t
+                idxs[j] = i
+    for i in range(len(x)):
+        if idxs[i] < 0:
+            times[i] = np.nan
+    return times, idxs
+
+
+# loops of the backends, the 'python' ones are not compiled
+LOOPS = {'python' : dict(one=_nearest_one, all=_nearest_all,
+                         pairs=_nearest_pairs)}
+if numba is not None:
+    _pair_time = numba.njit(cache=True)(_pair_time)
+    LOOPS['numba'] = dict(one=numba.njit(cache=True)(_nearest_one),
+                          all=numba.njit(cache=True)(_nearest_all),
+                          pairs=numba.njit(cache=True)(_nearest_pairs))
+
+
+def _column(values, size):
+    "helper function to get a contiguous float column, scalars repeated"
+    return np.ascontiguousarray(np.broadcast_to(
+        np.asarray(values, dtype=np.float64).reshape(-1), size))
+
+
+def nearest_interaction(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r,
+                        skip=None, swap=None):
+    """ function to get the soonest interaction of one individual p with
+    all individuals n
+
+    Parameters
+    ----------
+
+    p_vx, p_vy, p_x, p_y, p_r : float
+        velocity, position and radius of the individual
+
+    n_vx, n_vy, n_x, n_y, n_r : array of float or float
+        velocities, positions and radii of the others
+
+    skip : array of bool or None
+        others to ignore, e.g. dead rows
+
+    swap : array of bool or None
+        others that take the place of p in the math, see nearest_pairs()
+
+    Returns
+    -------
+
+    time : float
+        time from now of the soonest interaction, NaN if there is none
+        after now
+
+    idx : int
+        row of the other individual, -1 if there is none
+    """
+    n = len(n_x)
+    if BACKEND != 'numpy':
+        if skip is None:
+            skip = np.zeros(n, dtype=np.bool_)
+        if swap is None:
+            swap = np.zeros(n, dtype=np.bool_)
+        return LOOPS[BACKEND]['one'](float(p_vx), float(p_vy), float(p_x), float(p_y),
+                            float(p_r), _column(n_vx, n), _column(n_vy, n),
+                            _column(n_x, n), _column(n_y, n), _column(n_r, n),
+                            np.ascontiguousarray(skip, dtype=np.bool_),
+                            np.ascontiguousarray(swap, dtype=np.bool_))
+
+    p = [p_vx, p_vy, p_x, p_y, p_r]
+    others = [n_vx, n_vy, n_x, n_y, n_r]
+    if swap is not None:
+        p, others = ([np.where(swap, b, a) for a, b in zip(p, others)],
+                     [np.where(swap, a, b) for a, b in zip(p, others)])
+    t1, t2 = interact_times(*p, *others)
+    times = np.minimum(t1, t2)
+    if skip is not None:
+        times[skip] = np.nan
+    if np.nansum(times) > 0:
+        return np.nanmin(times), int(np.nanargmin(times))
+    return np.nan, -1
+
+
+def nearest_interactions(p_vx, p_vy, p_x, p_y, p_r, n_vx, n_vy, n_x, n_y, n_r,
+                         current_time=0.):
+    """ function to get the soonest interaction of every individual p with
+    any individual n, without the matrix of all pairs with the numba
+    backend. the same population can be given as p and n, an individual
+    never interacts with itself
+
+    Parameters
+    ----------
+
+    p_vx, p_vy, p_x, p_y, p_r : array of float
+        velocities, positions and radii of the individuals
+
+    n_vx, n_vy, n_x, n_y, n_r : array of float
+        velocities, positions and radii of the others
+
+    current_time : float
+        added to the times before they are compared
+
+    Returns
+    -------
+
+    times : array of float
+        time of the soonest interaction of every individual, NaN if there
+        is none
+
+    idxs : array of int
+        row of the other individual, -1 if there is none
+    """
+    m, n = len(p_x), len(n_x)
+    if BACKEND != 'numpy':
+        return LOOPS[BACKEND]['all'](_column(p_vx, m), _column(p_vy, m), _column(p_x, m),
+                            _column(p_y, m), _column(p_r, m), _column(n_vx, n),
+                            _column(n_vy, n), _column(n_x, n), _column(n_y, n),
+                            _column(n_r, n), float(current_time))
+
+    t1, t2 = interact_times(p_vx, p_vy, p_x, p_y, p_r,
+                            np.reshape(n_vx, (-1, 1)), np.reshape(n_vy, (-1, 1)),
+                            np.reshape(n_x, (-1, 1)), np.reshape(n_y, (-1, 1)),
+                            np.reshape(n_r, (-1, 1)))
+    times = np.minimum(t1, t2) + current_time
+    idxs = np.full(m, -1)
+    found = ~np.isnan(times).all(0)
+    idxs[found] = np.nanargmin(times[:, found], axis=0)
+    nearest = np.full(m, np.nan)
+    nearest[found] = times[idxs[found], found]
+    return nearest, idxs
+
+
+def nearest_pairs(vx, vy, x, y, r, ids, current_time=0.):
+    """ function to get the soonest interaction of every individual of a
+    population with another one, computing every pair once. the individual
+    with the smaller id takes the place of p in the math, so both get
+    exactly the same time for their contact, also from
+    nearest_interaction() with swap
+
+    Parameters
+    ----------
+
+    vx, vy, x, y, r : array of float
+        velocities, positions and radii of the individuals
+
+    ids : array of int
+        unique ids of the individuals
+
+    current_time : float
+        added to the times before they are compared
+
+    Returns
+    -------
+
+    times : array of float
+        time of the soonest interaction of every individual, NaN if there
+        is none
+
+    idxs : array of int
+        row of the other individual, -1 if there is none
+    """
+    m = len(x)
+    if BACKEND != 'numpy':
+        return LOOPS[BACKEND]['pairs'](_column(vx, m), _column(vy, m), _column(x, m),
+                              _column(y, m), _column(r, m),
+                              np.ascontiguousarray(ids, dtype=np.int64),
+                              float(current_time))
+
+    values = [_column(v, m) for v in (vx, vy, x, y, r)]
+    ids = np.asarray(ids)
+    rows, cols = np.triu_indices(m, 1)
+    swap = ids[rows] > ids[cols]
+    first, second = np.where(swap, cols, rows), np.where(swap, rows, cols)
+    t1, t2 = interact_times(*[v[first] for v in values],
+                            *[v[second] for v in values])
+    # matrix of all pairs, filled from both sides
+    times = np.full((m, m), np.nan)
+    times[rows, cols] = np.minimum(t1, t2) + current_time
+    times[cols, rows] = times[rows, cols]
+    idxs = np.full(m, -1)
+    found = ~np.isnan(times).all(0)
+    idxs[found] = np.nanargmin(times[:, found], axis=0)
+    nearest = np.full(m, np.nan)
+    nearest[found] = times[idxs[found], found]
+    return nearest, idxs
+
+
+def check_backends(size=500, seed=0, backend=None):
+    """ function to check the loop kernels give exactly the same times and
+    rows as the NumPy kernels, on random individuals with some standing
+    still and some overlapping
+
+    Parameters
+    ----------
+
+    size : int
+        number of individuals of each of two populations
+
+    seed : int
+        seed of the random individuals
+
+    backend : str or None
+        loops to check, 'numba' or 'python'. None for numba if it is
+        installed, else the uncompiled loops
+
+    Returns
+    -------
+
+    same : bool
+        True if every time and row is the same
+    """
+    if backend is None:
+        backend = 'numba' if numba is not None else 'python'
+    rng = np.random.RandomState(seed)
+    def population():
+        angle = rng.rand(size) * 2 * np.pi
+        speed = rng.rand(size) * (rng.rand(size) > 0.2)
+        return [np.cos(angle) * speed, np.sin(angle) * speed,
+                rng.rand(size) * 100, rng.rand(size) * 100,
+                rng.rand(size) * 2]
+    p, n = population(), population()
+    skip = rng.rand(size) < 0.1
+    ids = rng.permutation(size)
+
+    previous = BACKEND
+    results = {}
+    try:
+        for name in ('numpy', backend):
+            use_backend(name)
+            all_times, all_idxs = nearest_interactions(*p, *n, current_time=3.)
+            same_times, same_idxs = nearest_interactions(*p, *p)
+            ones = [nearest_interaction(*[v[i] for v in p], *n, skip=skip)
+                    for i in range(size)]
+            pair_times, pair_idxs = nearest_pairs(*p, ids, current_time=3.)
+            swapped = [nearest_interaction(*[v[i] for v in p], *p,
+                                           swap=ids < ids[i])
+                       for i in range(size)]
+            results[name] = (all_times, all_idxs, same_times, same_idxs,
+                             np.array([t for t, _ in ones]),
+                             np.array([i for _, i in ones]),
+                             pair_times, pair_idxs,
+                             np.array([t for t, _ in swapped]),
+                             np.array([i for _, i in swapped]))
+    finally:
+        use_backend(previous)
+    return all(np.array_equal(a, b, equal_nan=True)
+               for a, b in zip(results['numpy'], results[backend]))
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class Categories():
+    """ Table of categories for a population column. The column only stores
+    small integer codes (int8), comparing codes is much faster than comparing
+    strings and uses less memory per individual.
+
+    Example
+    -------
+    states = Categories(['susceptible', 'infected', 'recovered'])
+    states.code('infected') # 1
+    states.decode([0, 2]) # ['susceptible', 'recovered']
+    """
+
+    dtype = np.int8
+
+    def __init__(self, names):
+        """ Constructor for a category table
+
+        Parameters
+        ----------
+
+        names : list of str
+            category names, the position in the list is the code
+        """
+        self.names = np.array(names, dtype=object)
+        self.codes = dict((n, i) for i, n in enumerate(names))
+
+    def code(self, name):
+        """ function to get the integer code of a category name
+
+        Parameters
+        ----------
+
+        name : str or int
+            category name, codes are returned as is
+        """
+        if isinstance(name, str):
+            return self.codes[name]
+        return int(name)
+
+    def encode(self, names):
+        """ function to get an int8 array of codes from category names """
+        return np.array([self.code(n) for n in names], dtype=self.dtype)
+
+    def decode(self, codes):
+        """ function to get an array of category names from codes """
+        return self.names[np.asarray(codes, dtype=int)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f'Categories({list(self.names)})'
+
+
+# status of individuals in a Population2D
+STATUS = Categories(['active', 'inactive', 'dead'])
+ACTIVE = STATUS.code('active')
+INACTIVE = STATUS.code('inactive')
+DEAD = STATUS.code('dead')
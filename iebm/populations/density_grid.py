@@ -0,0 +1,226 @@
+import numpy as np
+import datatable as dt
+
+from .base import Population
+from .categories import STATUS
+
+
+class DensityGrid(Population):
+    """ Resource population kept as densities on a grid of cells instead of
+    individuals, e.g. thousands of sessile prey. Every cell grows
+    logistically on its own, integrated exactly for all cells at once, and
+    only when the densities are read, so the grid costs nothing between
+    events. Individuals of other populations consume from the cell they are
+    in with a ConsumeEvent.
+
+    With dispersal 'cell' every cell grows towards its share of the
+    capacity from its own density, empty cells stay empty. With 'global'
+    the total grows logistically and the growth is spread evenly over the
+    cells, like Population2D offspring placed at random in the environment.
+
+    The grid has no individuals and no events of its own, its size is the
+    total density rounded down.
+
+    Example
+    -------
+    prey = DensityGrid(name='prey', init_size=100, xdim=500, ydim=500,
+                       cells=(50, 50), growth_rate=0.001,
+                       implicit_capacity=2000)
+    pred = Population2D(name='pred', ...)
+    pred.add_events([(ConsumeEvent, {'name' : 'predation', 'is_primary' : True,
+                                     'resource' : prey, 'current_time' : 0}),
+                     ...])
+    """
+
+    def __init__(self, name, init_size, xdim, ydim, cells=(10, 10),
+                 growth_rate=0, implicit_capacity=None, radius=0,
+                 dispersal='cell', uniform=False):
+        """ Constructor for a density grid
+
+        Parameters
+        ----------
+
+        name : str
+            unique identifier
+
+        init_size : float
+            initial total density
+
+        xdim, ydim : float
+            size of the 2D environment
+
+        cells : tuple of int
+            number of cells along x and y
+
+        growth_rate : float
+            logistic growth rate of every cell, like a birth rate
+
+        implicit_capacity : float or None
+            total capacity, split evenly between the cells. needed with a
+            growth rate, the capacity bounds the encounter rates
+
+        radius : float
+            radius of a resource unit, added to the consumer radius for
+            encounters
+
+        dispersal : str
+            'cell' for logistic growth of every cell on its own, 'global'
+            for logistic growth of the total, spread evenly over the cells
+
+        uniform : bool
+            spread the initial density evenly, otherwise init_size units
+            are dropped in random cells, like randomly placed individuals
+        """
+        if growth_rate > 0 and implicit_capacity is None:
+            raise ValueError('a growing DensityGrid needs an implicit_capacity')
+        if dispersal not in ('cell', 'global'):
+            raise ValueError(f"dispersal must be 'cell' or 'global', not {dispersal!r}")
+
+        self.name = name
+        self.implicit_capacity = implicit_capacity
+        self.xdim = xdim
+        self.ydim = ydim
+        self.cells = tuple(cells)
+        self.cell_width = xdim / cells[0]
+        self.cell_height = ydim / cells[1]
+        self.cell_area = self.cell_width * self.cell_height
+        self.growth_rate = growth_rate
+        self.radius = radius
+        self.dispersal = dispersal
+        ncells = cells[0] * cells[1]
+        if implicit_capacity is not None:
+            self.cell_capacity = implicit_capacity / ncells
+        else:
+            self.cell_capacity = None
+
+        # densities of the cells, flat with x changing slowest
+        if uniform:
+            self.density = np.full(ncells, init_size / ncells, dtype=np.float64)
+        else:
+            self.density = np.bincount(np.random.randint(ncells, size=int(init_size)),
+                                       minlength=ncells).astype(np.float64)
+        # time the densities still need to be grown by
+        self.pending = 0.
+
+        # empty individual-level parts, so the grid fits in a Simulation
+        self.df = dt.Frame(id=np.zeros(0, dtype=np.int64),
+                           x=np.zeros(0), y=np.zeros(0),
+                           status=np.zeros(0, dtype=STATUS.dtype))
+        self.categories = {'status' : STATUS}
+        self.trait_dict = {}
+        self.event_dict = {}
+        self.event_list = []
+        self.clock_events = []
+        self.suspended = {}
+        self.cancelled = {}
+        self.open_walls = set()
+        self.emigrants = []
+        self.dead_count = 0
+        self.alive_rows = None
+        self.id_count = 0
+
+    @property
+    def size(self):
+        return int(self.get_density().sum())
+
+    def get_density(self):
+        """ function to get the current densities of all cells, grows them
+        by the pending time first
+
+        Returns
+        -------
+
+        density : array of float
+            one value per cell, see cell_index()
+        """
+        if self.pending > 0:
+            if self.growth_rate > 0:
+                decay = np.exp(-self.growth_rate * self.pending)
+                if self.dispersal == 'global':
+                    before = self.density.sum()
+                    after = self._logistic(before, self.implicit_capacity, decay)
+                    self.density += (after - before) / len(self.density)
+                else:
+                    self.density = self._logistic(self.density, self.cell_capacity,
+                                                  decay)
+            self.pending = 0.
+        return self.density
+
+    @staticmethod
+    def _logistic(n, k, decay):
+        "helper function to grow densities n with capacity k, exactly"
+        n = np.asarray(n, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, k * n / (n + (k - n) * decay), 0.)
+
+    def cell_index(self, x, y):
+        """ function to get the cell of positions
+
+        Parameters
+        ----------
+
+        x, y : float or array of float
+            positions in the environment
+
+        Returns
+        -------
+
+        cell : int or array of int
+            index into the densities
+        """
+        i = np.clip((np.asarray(x) // self.cell_width).astype(int), 0, self.cells[0] - 1)
+        j = np.clip((np.asarray(y) // self.cell_height).astype(int), 0, self.cells[1] - 1)
+        return i * self.cells[1] + j
+
+    def max_density(self):
+        """ function to get an upper bound of any cell density from now on,
+        for the thinning of ConsumeEvent. cells only grow towards their
+        share of the capacity"""
+        density = self.get_density()
+        bound = density.max() if len(density) > 0 else 0
+        if self.growth_rate > 0:
+            if self.dispersal == 'global':
+                # growth spread evenly adds less than a share of the capacity,
+                # unless consumers keep the total low for a long time
+                bound += self.cell_capacity
+            else:
+                bound = max(bound, self.cell_capacity)
+        return bound
+
+    def consume(self, cell, amount=1):
+        """ function to remove density from a cell, not below zero
+
+        Returns
+        -------
+
+        consumed : float
+            amount actually removed
+        """
+        density = self.get_density()
+        consumed = min(amount, density[cell])
+        density[cell] -= consumed
+        return consumed
+
+    def update(self, lapse):
+        """called when the simulation jumps to the next event. the cells are
+        grown later, once the densities are read"""
+        self.pending += lapse
+
+    def update_clocks(self, current_time):
+        return []
+
+    def get_next_event(self, actor_id):
+        return []
+
+    def get_next_events(self, actor_idxs):
+        return []
+
+    def alive_mask(self):
+        return np.zeros(0, dtype=bool)
+
+    def to_grid(self):
+        "function to get the current densities as a (cells x, cells y) array"
+        return self.get_density().reshape(self.cells)
+
+    def __repr__(self):
+        return self.name
@@ -3,6 +3,14 @@ import datatable as dt
 from datatable import f
 
 from .base import Population
+from .categories import STATUS, ACTIVE, DEAD
+
+
+# column types of the storage profiles, see Population2D.conform(). event
+# time columns stay float64 in every profile: the float32 spacing at time
+# 3000 is 2.4e-4, collisions would be predicted that far off
+DTYPES = {'default' : dict(float=dt.stype.float64, int=dt.stype.int64),
+          'compact' : dict(float=dt.stype.float32, int=dt.stype.int32)}
 
 
 class Population2D(Population):
@@ -14,7 +22,8 @@ class Population2D(Population):
     TO DO:
     """
 
-    def __init__(self, name, init_size, xdim, ydim, implicit_capacity=None):
+    def __init__(self, name, init_size, xdim, ydim, implicit_capacity=None,
+                 dtypes='default'):
         """ Constructor for individual-level population.
 
         Parameters
@@ -31,23 +40,60 @@ class Population2D(Population):
         implicit_capacity : default None, integer
             limit the population size to some implicit capacity to create
             logistic growth. No limit if None (default)
+        dtypes : str
+            storage profile of the columns. 'default' stores floats as
+            float64 and ids as int64, 'compact' stores positions,
+            velocities and traits as float32 and ids and partner ids as
+            int32, about half the memory per individual. categories are
+            int8 codes in both, event times float64
         """
 
+        if dtypes not in DTYPES:
+            raise ValueError(f"dtypes must be one of {list(DTYPES)}, not {dtypes!r}")
+
         # set parameters
         super().__init__(name, init_size, implicit_capacity)
         # set 2D limits
         self.xdim = xdim
         self.ydim = ydim
+        self.dtypes = dtypes
+        # smallest step of a position at the far walls, contacts are
+        # checked with at least this tolerance
+        if dtypes == 'compact':
+            self.resolution = float(np.spacing(np.float32(max(xdim, ydim))))
+        else:
+            self.resolution = float(np.spacing(float(max(xdim, ydim))))
+        # time individuals still need to be moved by, see advance()
+        self.pending = 0.
+        # Profiler of the simulation, set by Simulation, times advance()
+        self.profiler = None
 
         # create base dataframe (only id, x, y)
         self.df = self.create_population(np.arange(init_size))
         # track unique id for offspring
         self.id_count = init_size
+        # number of rows flagged dead, waiting for compaction
+        self.dead_count = 0
+        # cached mask of rows that are not dead
+        self.alive_rows = None
+        
+        # category tables of integer coded columns
+        self.categories = {'status' : STATUS}
         
         # create empty trait and event dictionarties
         self.trait_dict = {}
         self.event_dict = {}
         self.event_list = []
+        # events scheduled by a population-level clock
+        self.clock_events = []
+        # parked event times of suspended individuals, by id
+        self.suspended = {}
+        # hashes of scheduled events that should be skipped, with their time
+        self.cancelled = {}
+        # walls crossed instead of bounced off, e.g. borders between tiles
+        self.open_walls = set()
+        # (time, row) of individuals that left through an open wall
+        self.emigrants = []
 
 
     def create_population(self, ids):
@@ -71,8 +117,8 @@ class Population2D(Population):
         df = dt.Frame(id=ids,
                       x=np.random.rand(size) * self.xdim,
                       y=np.random.rand(size) * self.ydim, 
-                      status = ['active'] * size)
-        return df
+                      status = np.full(size, ACTIVE, dtype=STATUS.dtype))
+        return self.conform(df)
 
     def create_individual(self, new_id, x, y, status='active'):
         """ helper function to create a single individuals dataframe with a
@@ -87,8 +133,8 @@ class Population2D(Population):
             x postion to be set
         y : float
             y position to be set
-        status : str
-            whether individual is active or inactive
+        status : str or int
+            whether individual is active or inactive, name or code
 
         Returns
         -------
@@ -97,8 +143,116 @@ class Population2D(Population):
             single individual dataframe with id, x, and y columns
         """
 
-        df = dt.Frame(id=[new_id], x=[x], y=[y], status=[status])
+        df = dt.Frame(id=[new_id], x=[x], y=[y], 
+                      status=np.array([STATUS.code(status)], dtype=STATUS.dtype))
+        return self.conform(df)
+
+    def create_individuals(self, new_ids, xs, ys, status='active', traits=None):
+        """ helper function to create a dataframe of several new individuals
+        at once, used for bulk inserts of offspring
+
+        Parameters
+        ----------
+
+        new_ids : array of int
+            unique identifiers for the new individuals
+        xs : array of float
+            x postions to be set
+        ys : array of float
+            y positions to be set
+        status : str or int
+            whether individuals are active or inactive, name or code
+        traits : dict or None
+            trait names as keys and arrays of trait values as values
+
+        Returns
+        -------
+
+        df : datatable dataframe
+            new individuals dataframe with id, x, y, status and trait columns
+        """
+
+        cols = dict(id=np.asarray(new_ids, dtype=np.int64),
+                    x=np.asarray(xs, dtype=np.float64),
+                    y=np.asarray(ys, dtype=np.float64),
+                    status=np.full(len(new_ids), STATUS.code(status),
+                                   dtype=STATUS.dtype))
+        if traits is not None:
+            for k in traits:
+                cols[str(k)] = traits[k]
+        # single constructor call is much faster than adding columns
+        df = dt.Frame(cols)
+        return self.conform(df)
+
+    def conform(self, df=None):
+        """ function to store the columns with the types of the storage
+        profile, see DTYPES. new columns of traits and events, and new rows
+        before they are added, would otherwise turn the columns back into
+        float64 and int64
+
+        Parameters
+        ----------
+
+        df : datatable dataframe or None
+            new rows, or None for the population dataframe
+
+        Returns
+        -------
+
+        df : datatable dataframe
+            with the column types of the profile
+        """
+        own = df is None
+        if own:
+            df = self.df
+        if self.dtypes == 'default':
+            return df
+        types = DTYPES[self.dtypes]
+        cast_int = dt.int32 if types['int'] == dt.stype.int32 else dt.int64
+        # ids that do not fit in int32 stay int64
+        if getattr(self, 'id_count', 0) >= np.iinfo(np.int32).max:
+            cast_int = dt.int64
+        cols = []
+        for c, stype in zip(df.names, df.stypes):
+            if stype in (dt.stype.float64, dt.stype.float32) and not c.endswith('_time'):
+                cols.append(dt.float32(f[c]))
+            elif c == 'id' or c.endswith('_extra') or stype == dt.stype.int64:
+                cols.append(cast_int(f[c]))
+            else:
+                cols.append(f[c])
+        df = df[:, cols]
+        df.materialize()
+        if own:
+            self.df = df
         return df
+
+    def fit(self, values):
+        """ function to round values to the precision of the float columns
+        before they are written. in a compact population a value that is
+        not a float32 would turn the whole column into float64
+
+        Parameters
+        ----------
+
+        values : float, array of float or None
+
+        Returns
+        -------
+
+        values : float, array of float or None
+            as they are in a default population
+        """
+        if self.dtypes == 'default' or values is None:
+            return values
+        if np.ndim(values) == 0:
+            return float(np.float32(values))
+        return np.asarray(values, dtype=np.float32)
+
+    def fit_expr(self, expr):
+        "function to get a datatable expression with the float column type"
+        if self.dtypes == 'default':
+            return expr
+        return dt.float32(expr)
     
     def add_traits(self, trait_list):
         """function to add new traits to the population
@@ -117,6 +271,7 @@ class Population2D(Population):
             t = k(self, params)
             # store trait in dictionary
             self.trait_dict[f'{t}'] = t
+        self.conform()
             
     def add_events(self, event_list):
         """function to add new events to the population
@@ -138,10 +293,25 @@ class Population2D(Population):
             
         # store primary events column
         self.event_list = [c for c in self.df.names if '_time' in c]
+        self.conform()
                     
+    @property
+    def df(self):
+        """dataframe of the individuals, moved to the current time first.
+        a population is only moved when an event, snapshot or history
+        sample uses it, see advance()"""
+        if self.pending != 0:
+            self.advance()
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+
     def update(self, lapse):
         """called to update individuals when the simulation jumps to the next
-        event. currently, updates position of moving indviduals
+        event. the lapse is only added to the pending time, individuals are
+        moved once the dataframe is used
 
         Parameters
         ----------
@@ -149,11 +319,327 @@ class Population2D(Population):
         lapse : float
             differece between previous event time and current event time
         """
+        self.pending += lapse
+
+    def advance(self):
+        """function to move the individuals by the pending time, in one go
+        for all events since the population was last used"""
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        lapse = self.pending
+        self.pending = 0.
+        df = self._df
         # if a population has a velocity component, means they move and need updating
-        if 'vel_x' in self.df.names:
+        if 'vel_x' in df.names:
             # move
-            self.df[:, 'x'] = self.df[:, f.x + f.vel_x * lapse]
-            self.df[:, 'y'] = self.df[:, f.y + f.vel_y * lapse]
+            df[:, 'x'] = df[:, self.fit_expr(f.x + f.vel_x * lapse)]
+            df[:, 'y'] = df[:, self.fit_expr(f.y + f.vel_y * lapse)]
+            # datatable keeps the new columns lazy, one more layer every
+            # move, and every read would go through all of them
+            df.materialize()
+        if profiler is not None:
+            profiler.move_time += profiler.clock() - start
+
+    def update_clocks(self, current_time):
+        """ function to resample all population-level event clocks, called
+        after the population size changes
+
+        Parameters
+        ----------
+
+        current_time : float
+            time of the size change
+
+        Returns
+        -------
+
+        new_events : list
+            next clock events
+        """
+        new_events = []
+        for e in self.clock_events:
+            new_events += e.set_clock(current_time)
+        return new_events
+
+    def suspend(self, actor_id, current_time, columns):
+        """ function to park the pending event times of an individual, e.g.
+        while it pauses. the event already scheduled in the heap is cancelled
+        and events are told once, so interactions with the individual can
+        be predicted again. an individual already suspended is left as it is
+
+        Parameters
+        ----------
+
+        actor_id : int
+            unique identifier of individual
+
+        current_time : float
+            time the individual is suspended
+
+        columns : list of str
+            event time columns to park
+
+        Returns
+        -------
+
+        new_events : list
+            events from the notified events
+        """
+        new_events = []
+        actor_idx = self._get_actor_idx(actor_id)
+        if actor_idx is None or len(columns) == 0 or actor_id in self.suspended:
+            return new_events
+
+        # the scheduled event becomes stale if its time is parked, unless
+        # it is the event being handled right now
+        pending = self.get_next_event(actor_id)
+        times = self.df[actor_idx, columns].to_list()
+        parked = dict((c, t[0]) for c, t in zip(columns, times))
+        if (len(pending) > 0 and pending[0] > current_time and
+                f'{pending[2]}_time' in parked):
+            self.cancel(pending, current_time)
+
+        self.suspended[actor_id] = (current_time, parked)
+        self.df[actor_idx, columns] = None
+
+        for k in self.event_dict:
+            new_events += self.event_dict[k].suspended(actor_idx, current_time)
+        return new_events
+
+    def cancel(self, event, current_time):
+        """ function to skip an event already in the simulation heap, e.g.
+        after the event time it was scheduled from changed without the
+        individual turning
+
+        Parameters
+        ----------
+
+        event : tuple
+            (time, hash, event, params) as scheduled, see get_next_event()
+
+        current_time : float
+            time of the change
+        """
+        # records are popped in time order, a cancelled hash from the past
+        # was never scheduled and would be kept for good
+        self.cancelled = dict((h, t) for h, t in self.cancelled.items()
+                              if t >= current_time)
+        self.cancelled[event[1]] = event[0]
+
+    def resume(self, actor_id, current_time):
+        """ function to restore the parked event times of an individual.
+        times of events with shift_on_resume are shifted by the time spent
+        suspended, the other events are set again from the current time
+
+        Parameters
+        ----------
+
+        actor_id : int
+            unique identifier of individual
+
+        current_time : float
+            time the individual resumes
+
+        Returns
+        -------
+
+        new_events : list
+            next event of the individual and events from the notified events
+        """
+        new_events = []
+        if actor_id not in self.suspended:
+            return new_events
+        start_time, parked = self.suspended.pop(actor_id)
+        actor_idx = self._get_actor_idx(actor_id)
+        if actor_idx is None:
+            return new_events
+
+        shift = current_time - start_time
+        recompute = []
+        for c in parked:
+            event = self.event_dict[c.rsplit('_', maxsplit=1)[0]]
+            if event.shift_on_resume:
+                if parked[c] is not None:
+                    self.df[actor_idx, c] = parked[c] + shift
+            else:
+                recompute.append(event)
+        for event in recompute:
+            event.set_next(dict(actor_id=actor_id, current_time=current_time))
+
+        for k in self.event_dict:
+            new_events += self.event_dict[k].resumed(actor_idx, current_time)
+        new_events += [self.get_next_event(actor_id)]
+        return new_events
+
+    def emigrate(self, actor_id, current_time):
+        """ function to remove an individual that leaves the environment
+        through an open wall. its row is kept in self.emigrants, so it can
+        be added to another population with immigrate()
+
+        Parameters
+        ----------
+
+        actor_id : int
+            unique identifier of individual
+
+        current_time : float
+            time the individual leaves
+
+        Returns
+        -------
+
+        new_events : list
+            events of the population-level clocks
+        """
+        actor_idx = self._get_actor_idx(actor_id)
+        if actor_idx is None:
+            return []
+        self.emigrants.append((current_time, self.df[actor_idx, :]))
+        for k in self.trait_dict:
+            self.trait_dict[k].remove_value(actor_idx)
+        self.suspended.pop(actor_id, None)
+        del self.df[actor_idx, :]
+        self.alive_rows = None
+        self.size -= 1
+        return self.update_clocks(current_time)
+
+    def immigrate(self, rows, current_time):
+        """ function to add individuals that arrive from elsewhere, e.g. rows
+        that left another population with emigrate(). arrivals get new
+        unique ids, keep their position, direction and traits, and their
+        primary events and clocks are set again from the current time
+
+        Parameters
+        ----------
+
+        rows : datatable dataframe
+            rows of the arriving individuals, with the population columns
+
+        current_time : float
+            time the individuals arrive
+
+        Returns
+        -------
+
+        actor_idxs : list of int
+            row numbers of the arrivals
+
+        new_events : list
+            next events of the arrivals and of the population-level clocks
+        """
+        n = rows.nrows
+        if n == 0:
+            return [], []
+        rows = rows[:, self.df.names]
+        rows[:, 'id'] = dt.Frame(np.arange(self.id_count, self.id_count + n))
+        rows = self.conform(rows)
+        # pending times and partners belong to where they came from
+        rows[:, [c for c in self.df.names
+                 if c.endswith('_time') or c.endswith('_extra')]] = None
+        self.df.rbind(rows, force=True)
+        for k in self.trait_dict:
+            if k in rows.names:
+                self.trait_dict[k].add_values(
+                    rows[:, k].to_numpy().reshape(-1))
+        self.id_count += n
+        self.size += n
+
+        actor_idxs = list(range(self.df.nrows - n, self.df.nrows))
+        for k in self.event_dict:
+            e = self.event_dict[k]
+            if e.is_primary or e in self.clock_events:
+                e.set_next_rows(actor_idxs, current_time)
+        new_events = self.get_next_events(actor_idxs)
+        new_events += self.update_clocks(current_time)
+        return actor_idxs, new_events
+
+    def tombstone(self, actor_idx):
+        """ function to flag an individual row as dead instead of deleting it.
+        dead rows have no events and are ignored by the vectorized kernels
+        until the population is compacted
+
+        Parameters
+        ----------
+
+        actor_idx : int
+            row number of the dead individual
+        """
+        alive = self.alive_mask()
+        self.df[actor_idx, 'status'] = DEAD
+        if len(self.event_list) > 0:
+            self.df[actor_idx, self.event_list] = None
+        # dead rows stay in place until compaction
+        if 'vel_x' in self.df.names:
+            self.df[actor_idx, ['vel_x', 'vel_y']] = 0
+        self.dead_count += 1
+        alive[actor_idx] = False
+        self.alive_rows = alive
+
+    def compact(self):
+        """ function to delete all dead rows in bulk. events that cache row
+        numbers are given the mapping from old to new row numbers
+        """
+        alive = self.alive_mask()
+        row_map = np.full(len(alive), -1)
+        row_map[alive] = np.arange(alive.sum())
+        del self.df[f.status == DEAD, :]
+        # deleting leaves a view of the old frame, which makes every later
+        # access slow, so copy the remaining rows once
+        self.df.materialize()
+        self.dead_count = 0
+        self.alive_rows = None
+        for k in self.event_dict:
+            self.event_dict[k].remap_rows(row_map)
+
+    def alive_mask(self):
+        """ function to get a boolean array of rows that are not dead
+
+        Returns
+        -------
+
+        alive : numpy array of bool
+            True for every row that is still part of the population
+        """
+        nrows = self.df.nrows
+        if self.alive_rows is not None:
+            # new rows are appended at the end and alive
+            if len(self.alive_rows) < nrows:
+                self.alive_rows = np.concatenate(
+                    [self.alive_rows, np.ones(nrows - len(self.alive_rows), dtype=bool)])
+            if len(self.alive_rows) == nrows:
+                return self.alive_rows
+        if self.dead_count == 0:
+            self.alive_rows = np.ones(nrows, dtype=bool)
+        else:
+            self.alive_rows = self.status_mask() != DEAD
+        return self.alive_rows
+
+    def status_mask(self, status=None):
+        """ function to get the status codes of all rows, or a boolean mask
+        of rows with a given status. vectorized kernels use it to select
+        e.g. active individuals only
+
+        Parameters
+        ----------
+
+        status : str, int or None
+            status name or code to compare with. if None, return the codes
+
+        Returns
+        -------
+
+        mask : numpy array
+            int8 status codes, or bool array if a status is given
+        """
+        codes = self.df.to_numpy(column=self.df.colindex('status'))
+        if status is None:
+            return codes
+        return codes == STATUS.code(status)
+
+    def active_mask(self):
+        """ function to get a boolean array of active rows """
+        return self.status_mask(ACTIVE)
 
     def get_next_event(self, actor_id):
         """ function to get the next event for a given individual. this next
@@ -178,14 +664,16 @@ class Population2D(Population):
         # get actor row number from population dataset
         actor_idx = self._get_actor_idx(actor_id)
 
-        if actor_idx is not None:
+        if actor_idx is not None and len(self.event_list) > 0:
 
             # get individuals event times
             row = self.df[actor_idx, self.event_list]
-            # find name of column of most immediate event
-            event_time_name = self.event_list[np.nanargmin(row)]
-            # get event name for reference
-            event_name = event_time_name.rsplit('_', maxsplit=1)[0]
+            # find name of column of most immediate event, none if all
+            # times are parked, e.g. while suspended
+            try:
+                event_time_name = self.event_list[np.nanargmin(row)]
+            except ValueError:
+                return []
             # calculate minumum event time
             event_time = np.nanmin(row)
             # create a dictionary of extra event parameters
@@ -199,21 +687,85 @@ class Population2D(Population):
                 extra = self.df[actor_idx, event_extra]
                 # add info to dictionary
                 params['extra'] = extra
-            # create event hash, makes comparison in heap easier
-            event_hash = hash(f'{event_time}_{event_name}_' + 
-                              '_'.join(str(params[k]) for k in params))
             # return next new event for this individual
-            return (event_time, event_hash, self.event_dict[event_name], params)
+            return self._make_event(event_time_name, event_time, params)
 
         else:
             # otherwise, return no new events
             return []
+
+    def get_next_events(self, actor_idxs):
+        """ function to get the next events for several individuals at once,
+        given their row numbers. saves an id lookup per individual, e.g. after
+        a bulk insert of offspring
+
+        Parameters
+        ----------
+
+        actor_idxs : list of int
+            row numbers of individuals in the population dataframe
+
+        Returns
+        -------
+
+        events : list of tuples
+            each follows the format (time, hash, event, params). individuals
+            without any scheduled event are skipped
+        """
+
+        actor_idxs = list(actor_idxs)
+        if len(actor_idxs) == 0 or len(self.event_list) == 0:
+            return []
+
+        # matrix of event times, one row per individual
+        times = self.df[actor_idxs, self.event_list].to_numpy()
+        times = np.ma.filled(times.astype(np.float64), np.nan)
+        missing = np.isnan(times)
+        has_event = ~missing.all(1)
+        # find column of most immediate event for each individual
+        cols = np.where(missing, np.inf, times).argmin(1)
+        ids = self.df[actor_idxs, 'id'].to_list()[0]
+        # get extra parameters of the event columns that have them
+        extras = {}
+        for c in set(cols[has_event]):
+            event_extra = self.event_list[c].replace('_time', '_extra')
+            if event_extra in self.df.names:
+                extras[c] = self.df[actor_idxs, event_extra].to_list()[0]
+
+        events = []
+        for i in np.flatnonzero(has_event):
+            c = cols[i]
+            params = dict(current_time=times[i, c],
+                          actor_id=ids[i])
+            if c in extras:
+                params['extra'] = extras[c][i]
+            events.append(self._make_event(self.event_list[c], times[i, c],
+                                           params))
+        return events
+
+    def _make_event(self, event_time_name, event_time, params):
+        # get event name for reference
+        event_name = event_time_name.rsplit('_', maxsplit=1)[0]
+        event = self.event_dict[event_name]
+        # create event hash, makes comparison in heap easier
+        if event.pairs and params.get('extra') is not None:
+            # the same for both individuals of a contact
+            pair = sorted([int(params['actor_id']), int(params['extra'])])
+            event_hash = hash(f'{event_time}_{event_name}_{pair[0]}_{pair[1]}')
+        else:
+            event_hash = hash(f'{event_time}_{event_name}_' + 
+                              '_'.join(str(params[k]) for k in params))
+        return (event_time, event_hash, event, params)
         
     def _get_actor_idx(self, actor_id):
         actor_idx, = np.where(self.df.to_numpy(
             column=self.df.colindex('id')) == actor_id)
         if len(actor_idx) > 0:
-            return int(actor_idx[0])
+            actor_idx = int(actor_idx[0])
+            # dead rows are not part of the population anymore
+            if self.dead_count > 0 and self.df[actor_idx, 'status'] == DEAD:
+                return None
+            return actor_idx
         else:
             return None
 
@@ -0,0 +1,143 @@
+import json
+import time
+
+
+class Profiler():
+    """ Opt-in instrumentation of a Simulation run. Records how often each
+    event is handled, how long handling takes and how many new events it
+    produces, the heap size over time, skipped and rejected events, and the
+    time spent moving populations and storing history. Enable it with
+    Simulation(..., profile=True), the results are in sim.profiler.
+
+    Populations are moved lazily, when an event handler or the history
+    first uses them after the clock advanced, see Population2D.advance().
+    That time is move_time, and it is not part of the handle time of the
+    event or the history time it happened in. update_time is only the
+    clock advance itself, and gathering batches.
+
+    Example
+    -------
+    sim = Simulation({'prey' : prey, 'pred' : pred}, profile=True)
+    sim.run(5000)
+    sim.profiler.to_json('profile.json')
+    """
+
+    def __init__(self, heap_every=100):
+        """ Constructor for a profiler
+
+        Parameters
+        ----------
+
+        heap_every : int
+            number of handled events between heap size samples
+        """
+        self.heap_every = heap_every
+        # per event, keyed by population and event name
+        self.handle_count = {}
+        self.handle_time = {}
+        self.new_events = {}
+        # (simulation time, heap size) samples
+        self.heap_time = []
+        self.heap_size = []
+        # events skipped as repeated or cancelled, new events not scheduled
+        self.stale = 0
+        self.cancelled = 0
+        self.rejected = 0
+        # heap compactions and the stale entries they removed
+        self.compactions = 0
+        self.purged = 0
+        # wall time of bookkeeping
+        self.update_time = 0.
+        self.move_time = 0.
+        self.history_time = 0.
+        self.run_time = 0.
+        self.events = 0
+
+    @staticmethod
+    def clock():
+        "wall clock used for all timings"
+        return time.perf_counter()
+
+    def record_event(self, event, elapsed, produced, count=1):
+        """ function to record a handled event
+
+        Parameters
+        ----------
+
+        event : Event
+            the handled event
+
+        elapsed : float
+            wall time of handle() without moving populations, in seconds
+
+        produced : int
+            number of new events returned by handle()
+
+        count : int
+            number of events handled together, see Simulation.handle_batch()
+        """
+        key = f'{event.population}.{event}'
+        if key in self.handle_count:
+            self.handle_count[key] += count
+            self.handle_time[key] += elapsed
+            self.new_events[key] += produced
+        else:
+            self.handle_count[key] = count
+            self.handle_time[key] = elapsed
+            self.new_events[key] = produced
+        self.events += count
+
+    def record_heap(self, sim_time, heap_size):
+        "function to sample the heap size, every heap_every events"
+        if self.events % self.heap_every == 0:
+            self.heap_time.append(sim_time)
+            self.heap_size.append(heap_size)
+
+    def to_dict(self):
+        """ function to export the recorded values
+
+        Returns
+        -------
+
+        profile : dict
+            'events' holds count, total and mean wall time, and new events
+            of every event, sorted by total time
+        """
+        events = {}
+        for k in sorted(self.handle_time, key=self.handle_time.get,
+                        reverse=True):
+            events[k] = dict(count=self.handle_count[k],
+                             time=self.handle_time[k],
+                             mean_time=self.handle_time[k] / self.handle_count[k],
+                             new_events=self.new_events[k])
+        handle_time = sum(self.handle_time.values())
+        return dict(events=events,
+                    handled=self.events,
+                    stale=self.stale,
+                    cancelled=self.cancelled,
+                    rejected=self.rejected,
+                    compactions=self.compactions,
+                    purged=self.purged,
+                    heap=dict(time=self.heap_time, size=self.heap_size),
+                    handle_time=handle_time,
+                    update_time=self.update_time,
+                    move_time=self.move_time,
+                    history_time=self.history_time,
+                    run_time=self.run_time,
+                    other_time=(self.run_time - handle_time - self.update_time -
+                                self.move_time - self.history_time))
+
+    def to_json(self, path=None):
+        """ function to export the recorded values as JSON
+
+        Parameters
+        ----------
+
+        path : str or None
+            file to write to, if None the JSON string is returned
+        """
+        profile = self.to_dict()
+        if path is None:
+            return json.dumps(profile)
+        with open(path, 'w') as fp:
+            json.dump(profile, fp)
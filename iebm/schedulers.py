@@ -0,0 +1,224 @@
+import heapq
+import math
+from abc import ABC, abstractmethod
+from bisect import insort
+
+
+class Scheduler(ABC):
+    """ Base class of event schedulers. A scheduler keeps the compact event
+    records (time, hash, code, actor, partner, payload) of a Simulation and
+    hands them out in order, smallest record first. Records with the same
+    time are ordered by the rest of the tuple, so every scheduler handles
+    events in the same order.
+
+    Example
+    -------
+    sim = Simulation(pop_dict, scheduler=CalendarQueue())
+    sim.run(10000)
+    """
+
+    @abstractmethod
+    def push(self, record):
+        "function to add a record"
+        pass
+
+    @abstractmethod
+    def pop(self):
+        "function to remove and return the smallest record"
+        pass
+
+    @abstractmethod
+    def peek(self):
+        "function to get the smallest record without removing it, or None"
+        pass
+
+    @abstractmethod
+    def records(self):
+        "function to get all records, in no particular order"
+        pass
+
+    @abstractmethod
+    def rebuild(self, records):
+        "function to replace all records, e.g. after a restore or a purge"
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        "function to get the number of records"
+        pass
+
+
+class HeapScheduler(Scheduler):
+    """ Binary heap of records with heapq, O(log n) push and pop. The
+    default scheduler, best up to a few ten thousand pending events. The
+    heap is a plain list, sim.event_heap, so records can also be pushed
+    with heapq directly.
+    """
+
+    def __init__(self):
+        self.heap = []
+
+    def push(self, record):
+        heapq.heappush(self.heap, record)
+
+    def pop(self):
+        return heapq.heappop(self.heap)
+
+    def peek(self):
+        return self.heap[0] if len(self.heap) > 0 else None
+
+    def records(self):
+        return self.heap
+
+    def rebuild(self, records):
+        self.heap = list(records)
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class CalendarQueue(Scheduler):
+    """ Calendar queue of records (Brown 1988), amortized O(1) push and pop
+    when event times are spread like exponential waiting times. Time is cut
+    into buckets of equal width, a 'year' of buckets wraps around, and every
+    bucket holds its records sorted. Popping goes through the buckets of the
+    current year in turn. The number of buckets doubles or halves with the
+    number of records, and the width is set again from the spacing of the
+    next events.
+
+    Its speed stays about the same as the queue grows, the heap slows down.
+    In pure Python the heap is still faster below about 10^6 pending
+    events, see benchmarks.runner.compare_schedulers.
+    Records with an infinite time, e.g. from a zero rate, are kept in a
+    separate heap after all others.
+    """
+
+    def __init__(self, buckets=16, width=1.):
+        """ Constructor for a calendar queue
+
+        Parameters
+        ----------
+
+        buckets : int
+            initial and smallest number of buckets
+
+        width : float
+            initial width of a bucket in simulation time, adapted with the
+            first resize
+        """
+        self.min_buckets = buckets
+        # number of records in the buckets
+        self.near = 0
+        # records with a time that does not fit in a bucket
+        self.far = []
+        self._setup(buckets, width, 0.)
+
+    def _setup(self, nbuckets, width, start):
+        "helper function to make empty buckets, the current one at start"
+        self.nbuckets = nbuckets
+        self.width = width
+        self.buckets = [[] for _ in range(nbuckets)]
+        # absolute number of the current bucket, time // width
+        self.current = int(start // width)
+        self.last_time = start
+
+    def push(self, record):
+        t = record[0]
+        if t == math.inf:
+            heapq.heappush(self.far, record)
+            return
+        k = int(t // self.width)
+        if k < self.current:
+            # earlier than the current bucket, e.g. after a peek moved it
+            # forward or in a new simulation
+            self.current = k
+        if t < self.last_time:
+            self.last_time = t
+        insort(self.buckets[k % self.nbuckets], record)
+        self.near += 1
+        if self.near > 2 * self.nbuckets:
+            self._resize(2 * self.nbuckets)
+
+    def _find(self):
+        """helper function to get the bucket with the smallest record, and
+        move the current bucket there. None if only far records are left"""
+        if self.near == 0:
+            return None
+        buckets, n, width = self.buckets, self.nbuckets, self.width
+        for k in range(self.current, self.current + n):
+            bucket = buckets[k % n]
+            if bucket and bucket[0][0] // width <= k:
+                self.current = k
+                return bucket
+        # nothing this year, jump to the smallest record directly
+        bucket = min((b for b in self.buckets if len(b) > 0),
+                     key=lambda b: b[0])
+        self.current = int(bucket[0][0] // self.width)
+        return bucket
+
+    def pop(self):
+        # same as _find(), inlined for speed
+        if self.near == 0:
+            return heapq.heappop(self.far)
+        buckets, n, width = self.buckets, self.nbuckets, self.width
+        k = self.current
+        bucket = buckets[k % n]
+        if not (bucket and bucket[0][0] // width <= k):
+            bucket = self._find()
+        record = bucket.pop(0)
+        self.near -= 1
+        self.last_time = record[0]
+        if (self.nbuckets > self.min_buckets and
+                self.near < self.nbuckets // 2):
+            self._resize(self.nbuckets // 2)
+        return record
+
+    def peek(self):
+        bucket = self._find()
+        if bucket is None:
+            return self.far[0] if len(self.far) > 0 else None
+        return bucket[0]
+
+    def records(self):
+        return [r for b in self.buckets for r in b] + self.far
+
+    def _width(self, records):
+        """helper function to get a bucket width from the spacing of the
+        next records, a few events per bucket"""
+        times = [r[0] for r in heapq.nsmallest(min(len(records), 25), records)]
+        gaps = [b - a for a, b in zip(times[:-1], times[1:])]
+        gaps = [g for g in gaps if g > 0]
+        if len(gaps) == 0:
+            return self.width
+        mean = sum(gaps) / len(gaps)
+        # leave out large gaps, like Brown
+        small = [g for g in gaps if g <= 2 * mean]
+        return 3 * sum(small) / len(small)
+
+    def _resize(self, nbuckets):
+        "helper function to spread the records over a new number of buckets"
+        records = [r for b in self.buckets for r in b]
+        self._fill(records, nbuckets, self.last_time)
+
+    def _fill(self, records, nbuckets, start):
+        "helper function to put records into new buckets"
+        width = self._width(records)
+        self._setup(nbuckets, width, start)
+        for r in sorted(records):
+            self.buckets[int(r[0] // width) % nbuckets].append(r)
+
+    def rebuild(self, records):
+        records = list(records)
+        self.far = [r for r in records if r[0] == math.inf]
+        heapq.heapify(self.far)
+        records = [r for r in records if r[0] != math.inf]
+        self.near = len(records)
+        nbuckets = self.min_buckets
+        while nbuckets < len(records) / 2:
+            nbuckets *= 2
+        start = min(r[0] for r in records) if len(records) > 0 else 0.
+        self._fill(records, nbuckets, start)
+
+    def __len__(self):
+        return self.near + len(self.far)
@@ -1,10 +1,11 @@
+import numbers
 import numpy as np
-import heapq
-from tqdm import tqdm
+
+from .profiler import Profiler
+from .schedulers import HeapScheduler
 
 #import warnings
 #warnings.filterwarnings("error")
-#import traceback
 
 class Simulation():
     """ Base individual-level model. Creates a simulation with a given
@@ -16,7 +17,9 @@ class Simulation():
     Example
     -------
     """
-    def __init__(self, population_dict, continue_threshold=3):
+    def __init__(self, population_dict, continue_threshold=3, profile=False,
+                 sink=None, keep_history=None, recorder=None, event_log=None,
+                 heap_stale_fraction=0.5, scheduler=None, batch_window=None):
         """ Constructor for individual-level model.
 
         Parameters:
@@ -29,27 +32,103 @@ class Simulation():
         min_thresh : int
             Consider a population below this threshold to be extinct.
             Will stop the simulation run.
+
+        profile : bool or Profiler
+            Record event handling times and bookkeeping of runs in
+            self.profiler. Off by default.
+
+        sink : ResultSink or None
+            Write sizes and tracked trait values to disk in chunks during
+            runs, see iebm.sinks. Call close() once done.
+
+        keep_history : bool or None
+            Keep sizes and tracked trait values in memory for get_results().
+            By default only without a sink, so memory stays constant.
+
+        recorder : TrajectoryRecorder or None
+            Record positions and traits of every individual at fixed time
+            intervals, see iebm.trajectory. Call close() once done.
+
+        event_log : EventLog or None
+            Log every handled event with periodic keyframes of the state,
+            to seek or verify later, see iebm.eventlog. Call close() once
+            done.
+
+        heap_stale_fraction : float or None
+            Rebuild the event heap without stale entries (cancelled,
+            repeated, outdated clocks, individuals no longer there) once
+            they can be more than this fraction of it, see compact_heap().
+            None to never compact.
+
+        scheduler : Scheduler or None
+            Keeps the pending events in order, a HeapScheduler by default.
+            A CalendarQueue is faster with very many pending events, see
+            iebm.schedulers.
+
+        batch_window : float or None
+            Handle the events with the same time (0), or up to this much
+            later, as one batch: populations are moved and history stored
+            once per batch, see handle_batch(). None to handle every event
+            on its own. Not with an event_log.
         """
 
+        if batch_window is not None and event_log is not None:
+            raise ValueError('an event_log needs every event handled on its '
+                             'own, batch_window must be None')
+
         # set seed and initial parameters
         np.random.seed()
         self.time = 0
         self.continue_threshold = continue_threshold
+        # hash of the last handled event, to skip repeats
+        self.prev_event_hash = None
+        # number of handled events, with a batch_window a history entry can
+        # stand for several
+        self.handled = 0
+        # optional instrumentation of runs
+        if isinstance(profile, Profiler):
+            self.profiler = profile
+        elif profile:
+            self.profiler = Profiler()
+        else:
+            self.profiler = None
         # initialize event heap
-        self.event_heap = []
-        heapq.heapify(self.event_heap)
+        if scheduler is None:
+            scheduler = HeapScheduler()
+        self.scheduler = scheduler
+        # heap size at which stale entries are purged, and purge counts
+        self.heap_stale_fraction = heap_stale_fraction
+        self.heap_limit = None
+        self.heap_compactions = 0
+        self.heap_purged = 0
+        self.batch_window = batch_window
 
         # store population dict
         self.population_dict = population_dict
+        # populations are moved when they are used, and time it themselves
+        for p in population_dict:
+            population_dict[p].profiler = self.profiler
+        # integer codes of all events. the heap holds compact records
+        # (time, hash, code, actor, partner, payload) instead of event
+        # objects and params dicts, dispatched through this registry
+        self.event_registry = []
+        for p in population_dict:
+            for k in population_dict[p].event_dict:
+                self.register(population_dict[p].event_dict[k])
         # iterate all population and add individual events to heap
         for p in population_dict:
             # get individual unique id
             col_id = population_dict[p].df.colindex('id')
             # iterate over all individuals
             for i in population_dict[p].df.to_numpy(column=col_id):
-                # add individual event to event heap
-                heapq.heappush(self.event_heap,
-                               population_dict[p].get_next_event(i))
+                # add individual event to event heap, if there is one
+                new_event = population_dict[p].get_next_event(i)
+                if len(new_event) > 0:
+                    self.schedule(new_event)
+            # add population-level clock events to heap
+            for new_event in population_dict[p].update_clocks(self.time):
+                self.schedule(new_event)
+        self.set_heap_limit()
 
         # store tracked traits
         self.trait_tracks = {}
@@ -65,13 +144,39 @@ class Simulation():
         self.population_history = dict([(p, [population_dict[p].size])
                                         for p in population_dict])
         self.time_history = [self.time]
+
+        # optional streaming of results to disk
+        self.sink = sink
+        if keep_history is None:
+            keep_history = sink is None
+        self.keep_history = keep_history
+        if self.sink is not None:
+            self.sink.open(list(population_dict))
+            self.sink.write(self.time,
+                            [population_dict[p].size for p in population_dict],
+                            dict((k, self.trait_tracks[k].track_values())
+                                 for k in self.trait_tracks))
+
+        # optional snapshots of individuals
+        self.recorder = recorder
+        if self.recorder is not None:
+            self.recorder.open(population_dict)
+            self.recorder.record_until(population_dict, self.time, self.time)
+
+        # optional log of handled events, opened once everything is set up
+        self.event_log = event_log
+        if self.event_log is not None:
+            self.event_log.open(self)
         
 
     def run(self, runtime, progress_bar=True):
         """ Function to start (or continue) a model simulation."""
         
-        prev_event_hash = None
+        profiler = self.profiler
+        if profiler is not None:
+            run_start = profiler.clock()
         if progress_bar:
+            from tqdm import tqdm
             pbar = tqdm(total=round(runtime, 4), 
                         bar_format=("{l_bar}{bar}| {n:.4f}/{total_fmt} " + 
                                     "[{elapsed}<{remaining}, {rate_fmt}{postfix}]"))
@@ -79,75 +184,451 @@ class Simulation():
         # continue running up until the runtime
         while self.time < runtime:
 
-            # get next event from heap
-            #try:
-            next_event = heapq.heappop(self.event_heap)
-            #except Exception as e:
-            #    print(e)
-            
-            event_time, event_hash, event, event_params = next_event
-            
-            if event_hash == prev_event_hash:
-                continue
-            
-            lapse = event_time - self.time
-            
-            if progress_bar:
-                pbar.update(lapse)
-                
-            # go through each population and update
-            for p in self.population_dict:
-                self.population_dict[p].update(lapse)
-    
-            # update current time to event time
-            self.time = event_time
-            
-            # handle event and return new events
-            new_events = event.handle(event_params)
+            lapse, continue_run = self.step()
 
-            for new_event in new_events:
-                # confirm there is an event tuple
-                if len(new_event) > 0:
-                    # make sure all times in the future
-                    if new_event[0] > self.time:
-                        # add event to event heap
-                        try:
-                            heapq.heappush(self.event_heap, new_event)  
-                        except:
-                            print(f'NEW EVENT : {new_event}')
-                            traceback.print_exc()
-                            continue
-            
-            # store event_hash to make sure not repeating
-            prev_event_hash = event_hash
-            
-            # store results, check if simulation should end
-            continue_run = self.update_history()
+            if progress_bar and lapse is not None:
+                pbar.update(lapse)
                 
             if not continue_run:
                 break
             
         if progress_bar:
             pbar.close()
+        # make the results so far readable
+        if self.sink is not None:
+            self.sink.flush()
+        if self.recorder is not None:
+            self.recorder.flush()
+        if self.event_log is not None:
+            self.event_log.flush()
+        if profiler is not None:
+            profiler.run_time += profiler.clock() - run_start
+
+    def step(self):
+        """ Function to pop and handle the next event from the heap. with a
+        batch_window, the events up to that much later are handled with it,
+        see handle_batch()
+
+        Returns
+        -------
+
+        lapse : float or None
+            time since the previous event, None if the popped event was
+            skipped (repeated or cancelled)
+
+        continue_run : bool
+            False once a population is below the continue_threshold
+        """
+        profiler = self.profiler
+
+        # get next event from heap
+        next_event = self.scheduler.pop()
+        popped = self._unpack(next_event)
+        if popped is None:
+            return None, True
+        event_time, event_hash, event, event_params = popped
+        
+        lapse = event_time - self.time
+
+        # snapshots between the previous and this event
+        if self.recorder is not None and event_time >= self.recorder.next_time:
+            self.recorder.record_until(self.population_dict, self.time,
+                                       event_time)
+            
+        # go through each population and update
+        if profiler is not None:
+            start = profiler.clock()
+        for p in self.population_dict:
+            self.population_dict[p].update(lapse)
+
+        # update current time to event time
+        self.time = event_time
+        if event_params is None:
+            event_params = self.event_params(next_event)
+
+        if self.batch_window is not None:
+            # events of the same time, or within the window, handled together
+            batch = [(event_hash, event, event_params)] + self._pop_batch(
+                event_time + self.batch_window, event_hash)
+            if profiler is not None:
+                profiler.update_time += profiler.clock() - start
+            new_events = self.handle_batch(batch)
+            event_hash = batch[-1][0]
+            self.handled += len(batch)
+        else:
+            self.handled += 1
+            # log event before handling, handlers can change the parameters
+            if self.event_log is not None:
+                self.event_log.record(event, event_params)
+        
+            # handle event and return new events
+            if profiler is not None:
+                handle_start = profiler.clock()
+                profiler.update_time += handle_start - start
+                move_start = profiler.move_time
+                new_events = event.handle(event_params)
+                # moving the populations is counted on its own
+                profiler.record_event(event, profiler.clock() - handle_start -
+                                      (profiler.move_time - move_start),
+                                      len(new_events))
+            else:
+                new_events = event.handle(event_params)
+
+        for new_event in new_events:
+            # confirm there is an event tuple
+            if len(new_event) > 0:
+                # make sure all times in the future
+                if new_event[0] > self.time:
+                    # add event to event heap, a malformed event raises
+                    self.schedule(new_event)
+                elif profiler is not None:
+                    profiler.rejected += 1
+
+        # purge stale entries once the heap grew enough
+        if self.heap_limit is not None and len(self.scheduler) > self.heap_limit:
+            self.compact_heap()
+        
+        # store event_hash to make sure not repeating
+        self.prev_event_hash = event_hash
+        
+        # store results, check if simulation should end
+        if profiler is not None:
+            start = profiler.clock()
+            move_start = profiler.move_time
+            continue_run = self.update_history()
+            profiler.history_time += (profiler.clock() - start -
+                                      (profiler.move_time - move_start))
+            profiler.record_heap(self.time, len(self.scheduler))
+        else:
+            continue_run = self.update_history()
+
+        if self.event_log is not None:
+            self.event_log.recorded(self)
+
+        return lapse, continue_run
+
+    def _unpack(self, next_event, prev_hash=None):
+        """Helper function to get (time, hash, event, params) of a popped
+        record, params are None for compact records. None if the event is
+        skipped, repeated or cancelled"""
+        profiler = self.profiler
+        if len(next_event) == 4:
+            # pushed to the heap directly, e.g. from a notebook
+            event_time, event_hash, event, event_params = next_event
+        else:
+            event_time, event_hash, code = next_event[:3]
+            event = self.event_registry[code]
+            event_params = None
+        
+        if prev_hash is None:
+            prev_hash = self.prev_event_hash
+        if event_hash == prev_hash:
+            if profiler is not None:
+                profiler.stale += 1
+            return None
+
+        # skip events cancelled after they were scheduled
+        if event_hash in event.population.cancelled:
+            del event.population.cancelled[event_hash]
+            if profiler is not None:
+                profiler.cancelled += 1
+            return None
+        return event_time, event_hash, event, event_params
+
+    def _pop_batch(self, until, prev_hash):
+        """Helper function to pop the events up to a time, after the first
+        event of a batch. returns a list of (hash, event, params)"""
+        batch = []
+        while True:
+            record = self.scheduler.peek()
+            if record is None or record[0] > until:
+                return batch
+            record = self.scheduler.pop()
+            popped = self._unpack(record, prev_hash)
+            if popped is not None:
+                event_time, event_hash, event, event_params = popped
+                if event_params is None:
+                    event_params = self.event_params(record)
+                batch.append((event_hash, event, event_params))
+                prev_hash = event_hash
+
+    def handle_batch(self, batch):
+        """ Function to handle a batch of events once the populations are
+        moved to the time of the first one. events are handled in order of
+        the heap, and a run of the same event is given to its handle_batch()
+        as a list, so events can handle several individuals at once.
+        events later in the window keep their own time in the params
+
+        Parameters
+        ----------
+
+        batch : list of tuples
+            (hash, event, params) of the popped events
+
+        Returns
+        -------
+
+        new_events : list
+            new events of all handlers
+        """
+        profiler = self.profiler
+        new_events = []
+        i = 0
+        while i < len(batch):
+            event = batch[i][1]
+            j = i + 1
+            while j < len(batch) and batch[j][1] is event:
+                j += 1
+            params_list = [b[2] for b in batch[i:j]]
+            if profiler is not None:
+                handle_start = profiler.clock()
+                move_start = profiler.move_time
+            if len(params_list) == 1:
+                events = event.handle(params_list[0])
+            else:
+                events = event.handle_batch(params_list)
+            if profiler is not None:
+                profiler.record_event(event, profiler.clock() - handle_start -
+                                      (profiler.move_time - move_start),
+                                      len(events), count=len(params_list))
+            new_events += events
+            i = j
+        return new_events
+
+    @property
+    def event_heap(self):
+        """pending event records of the scheduler, in no particular order.
+        with the default HeapScheduler this is the heap list itself"""
+        return self.scheduler.records()
+
+    @event_heap.setter
+    def event_heap(self, records):
+        self.scheduler.rebuild(records)
+
+    def register(self, event):
+        """ Function to give an event an integer code for the compact
+        records of the heap, events of the populations are registered when
+        the simulation is created
+
+        Returns
+        -------
+
+        code : int
+            index of the event in self.event_registry
+        """
+        event.code = len(self.event_registry)
+        self.event_registry.append(event)
+        return event.code
+
+    def schedule(self, new_event):
+        """ Function to add an event to the heap as a compact record, see
+        compact()
+
+        Parameters
+        ----------
+
+        new_event : tuple
+            (time, hash, event, params) as returned by the events, or an
+            already compact record
+        """
+        self.scheduler.push(self.compact(new_event))
+
+    def compact(self, new_event):
+        """ Function to turn an event into a compact record (time, hash,
+        code, actor, partner, payload). the actor id and the partner id
+        ('extra') are stored as numbers, other params are kept in the
+        payload tuple, or None
+
+        Parameters
+        ----------
+
+        new_event : tuple
+            (time, hash, event, params) as returned by the events, compact
+            records are returned as they are
+
+        Returns
+        -------
+
+        record : tuple
+            plain data, the event is referred to by its registry code
+        """
+        if len(new_event) == 6:
+            return new_event
+        event_time, event_hash, event, params = new_event
+        code = event.code
+        if (code is None or code >= len(self.event_registry) or
+                self.event_registry[code] is not event):
+            code = self.register(event)
+        actor, partner, payload = -1, np.nan, []
+        for k in params:
+            v = params[k]
+            if k == 'current_time' and v == event_time:
+                continue
+            if k == 'actor_id' and isinstance(v, numbers.Integral) and v >= 0:
+                actor = int(v)
+            elif (k == 'extra' and isinstance(v, numbers.Real) and
+                  not np.isnan(v)):
+                partner = float(v)
+            else:
+                payload.append((k, v))
+        return (event_time, event_hash, code, actor, partner,
+                tuple(payload) if payload else None)
+
+    @staticmethod
+    def event_params(record):
+        """ Function to get the params dict of a compact record, handed to
+        the event handler. a new dict every time, handlers can change it """
+        event_time, _, _, actor, partner, payload = record
+        params = dict(current_time=event_time)
+        if actor >= 0:
+            params['actor_id'] = actor
+        if partner == partner:
+            params['extra'] = partner
+        if payload is not None:
+            params.update(payload)
+        return params
+
+    def set_heap_limit(self):
+        """Helper function to set the heap size of the next compaction, for
+        stale entries above heap_stale_fraction if all current are live.
+        small heaps are not compacted"""
+        if self.heap_stale_fraction:
+            self.heap_limit = max(len(self.scheduler) /
+                                  (1 - self.heap_stale_fraction), 1024)
+        else:
+            self.heap_limit = None
+
+    def stale_records(self):
+        """ Function to find the heap entries that would be skipped or
+        handled without any effect: cancelled events, repeats of the same
+        event, clock events of an outdated clock version, and events of
+        individuals that died or left. entries superseded by a newer event of
+        the same individual are still handled, and are live
+
+        Returns
+        -------
+
+        stale : list of bool
+            one per entry of self.event_heap
+        """
+        alive = {}
+        for p in self.population_dict:
+            pop = self.population_dict[p]
+            ids = pop.df.to_numpy(column=pop.df.colindex('id'))
+            if pop.dead_count > 0:
+                ids = ids[pop.alive_mask()]
+            alive[id(pop)] = set(ids.tolist())
+
+        stale = []
+        seen = set()
+        for record in self.event_heap:
+            if len(record) == 4:
+                # pushed to the heap directly
+                record = self.compact(record)
+            event_hash, code, actor, payload = (record[1], record[2],
+                                                record[3], record[5])
+            event = self.event_registry[code]
+            if event_hash in event.population.cancelled or event_hash in seen:
+                stale.append(True)
+            elif actor >= 0 and actor not in alive[id(event.population)]:
+                stale.append(True)
+            elif (payload is not None and hasattr(event, 'clock_version') and
+                  dict(payload).get('clock', event.clock_version) != event.clock_version):
+                stale.append(True)
+            else:
+                stale.append(False)
+            seen.add(event_hash)
+        return stale
+
+    def compact_heap(self):
+        """ Function to rebuild the event heap from its live entries with
+        heapify, in O(n), see stale_records(). called automatically once the
+        heap passes heap_limit. cancelled and repeated entries are skipped
+        anyway, handled events stay exactly the same. entries of individuals
+        no longer there are handled without effect, but still move the
+        populations up to their time, so later event times can differ in
+        the last digits
+
+        Returns
+        -------
+
+        purged : int
+            number of removed entries
+        """
+        records = list(self.event_heap)
+        stale = self.stale_records()
+        live = []
+        for record, s in zip(records, stale):
+            if not s:
+                live.append(record)
+            elif len(record) > 4:
+                # cancelled hashes are not needed once the entry is gone
+                self.event_registry[record[2]].population.cancelled.pop(record[1], None)
+        purged = len(records) - len(live)
+        self.scheduler.rebuild(live)
+        self.heap_compactions += 1
+        self.heap_purged += purged
+        if self.profiler is not None:
+            self.profiler.compactions += 1
+            self.profiler.purged += purged
+        self.set_heap_limit()
+        return purged
+
+    def heap_stats(self):
+        """ Function to count live and stale entries of the event heap,
+        see stale_records()
+
+        Returns
+        -------
+
+        stats : dict
+            'size', 'live' and 'stale' entries now, number of
+            'compactions' and entries 'purged' by them so far
+        """
+        stale = sum(self.stale_records())
+        return dict(size=len(self.scheduler),
+                    live=len(self.scheduler) - stale,
+                    stale=stale,
+                    compactions=self.heap_compactions,
+                    purged=self.heap_purged)
 
     def update_history(self):
         """Helper function to store population sizes and determine if a
         simulation should stop when a population is extinct"""
         continue_run = True
         
+        sizes = []
         for p in self.population_dict:
             s = self.population_dict[p].size
             if s <= self.continue_threshold:
                 continue_run = False
-            self.population_history[p].append(s)
-            
-        for (p,t) in self.trait_tracks:
-            self.trait_history[(p,t)].append(self.trait_tracks[(p,t)].track_values())
-            
-        self.time_history.append(self.time)
+            sizes.append(s)
+
+        tracks = dict(((p,t), self.trait_tracks[(p,t)].track_values())
+                      for (p,t) in self.trait_tracks)
+
+        if self.keep_history:
+            for p, s in zip(self.population_dict, sizes):
+                self.population_history[p].append(s)
+            for (p,t) in tracks:
+                self.trait_history[(p,t)].append(tracks[(p,t)])
+            self.time_history.append(self.time)
+
+        if self.sink is not None:
+            self.sink.write(self.time, sizes, tracks)
         
         return continue_run
 
+    def close(self):
+        """Function to close the result sink, trajectory recorder and event
+        log, writes any buffered results"""
+        if self.sink is not None:
+            self.sink.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.event_log is not None:
+            self.event_log.close()
+
     def get_results(self):
         res = {}
         res['time'] = self.time_history
@@ -157,5 +638,7 @@ class Simulation():
         res['trait'] = {}
         for (p,t) in self.trait_tracks:
             res['trait'][(str(p), str(t))] = self.trait_history[(p,t)]
+        if self.profiler is not None:
+            res['profile'] = self.profiler.to_dict()
         return res
         
\ No newline at end of file
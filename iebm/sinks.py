@@ -0,0 +1,287 @@
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+import datatable as dt
+
+
+class ResultSink(ABC):
+    """ Base class of result sinks. A sink receives the population sizes and
+    tracked trait values after every event, buffers them in columns, and
+    writes a chunk to disk every chunk_size rows. Memory stays bounded no
+    matter how long a simulation runs. Subclasses write the chunks in a
+    file format.
+
+    Results are two tables:
+    - sizes : 'time' and one column per population with its size
+    - traits : 'time', 'population', 'trait', 'value' and 'count', one row
+      per tracked value. categorical values are in a 'label' column
+      instead, with 'value' as NaN
+
+    Example
+    -------
+    sim = Simulation(pop_dict, sink=NPZSink('results'))
+    sim.run(10000)
+    sim.sink.close()
+    sizes, traits = NPZSink.read('results')
+    """
+
+    def __init__(self, path, chunk_size=10000, compression=True):
+        """ Constructor for a result sink
+
+        Parameters
+        ----------
+
+        path : str
+            directory to write the chunks to, created if missing
+
+        chunk_size : int
+            number of buffered rows (of either table) before writing a chunk
+
+        compression : bool or str
+            compress written chunks, formats with several codecs also take
+            the codec name
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.populations = []
+        self.chunks = 0
+        self.closed = False
+        os.makedirs(path, exist_ok=True)
+        self._clear()
+
+    def _clear(self):
+        "helper function to empty the buffers"
+        self.buffer = dict(time=[], sizes=[])
+        self.trait_buffer = dict(time=[], population=[], trait=[],
+                                 value=[], label=[], count=[])
+        self.trait_rows = 0
+
+    def open(self, populations):
+        """ function called by the Simulation with the population names,
+        in the order of the sizes passed to write()"""
+        self.populations = [str(p) for p in populations]
+
+    def write(self, time, sizes, traits):
+        """ function to add one row of results
+
+        Parameters
+        ----------
+
+        time : float
+            simulation time
+
+        sizes : list of int
+            population sizes, in the order given to open()
+
+        traits : dict
+            (population, trait) keys with (values, counts) of tracked traits
+        """
+        self.buffer['time'].append(time)
+        self.buffer['sizes'].append(sizes)
+        for (p, t), (values, counts) in traits.items():
+            n = len(counts)
+            if n == 0:
+                continue
+            values = np.asarray(values)
+            tb = self.trait_buffer
+            tb['time'].append(np.full(n, time))
+            tb['population'].append(np.full(n, str(p), dtype=object))
+            tb['trait'].append(np.full(n, str(t), dtype=object))
+            if values.dtype.kind in 'biuf':
+                tb['value'].append(values.astype(np.float64))
+                tb['label'].append(np.full(n, '', dtype=object))
+            else:
+                tb['value'].append(np.full(n, np.nan))
+                tb['label'].append(values.astype(object))
+            tb['count'].append(np.asarray(counts, dtype=np.int64))
+            self.trait_rows += n
+        if (len(self.buffer['time']) >= self.chunk_size or
+                self.trait_rows >= self.chunk_size):
+            self.flush()
+
+    def flush(self):
+        "function to write the buffered rows as a chunk"
+        if len(self.buffer['time']) == 0 and self.trait_rows == 0:
+            return
+        sizes = dict(time=np.asarray(self.buffer['time'], dtype=np.float64))
+        size_array = np.asarray(self.buffer['sizes'], dtype=np.int64)
+        for i, p in enumerate(self.populations):
+            sizes[p] = size_array[:, i]
+        tb = self.trait_buffer
+        if self.trait_rows > 0:
+            traits = dict((k, np.concatenate(tb[k])) for k in tb)
+            for k in ('population', 'trait', 'label'):
+                traits[k] = traits[k].astype(str)
+        else:
+            traits = None
+        self._write_chunk(sizes, traits)
+        self.chunks += 1
+        self._clear()
+
+    @abstractmethod
+    def _write_chunk(self, sizes, traits):
+        """function to overwrite with the format writer. sizes and traits
+        are dicts of numpy columns, traits is None if no rows"""
+        pass
+
+    def close(self):
+        "function to write the remaining rows and close any open files"
+        if not self.closed:
+            self.flush()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class NPZSink(ResultSink):
+    """ Sink writing every chunk to numbered .npz files, numpy only. Read the
+    results back with NPZSink.read(path)
+    """
+
+    def _write_chunk(self, sizes, traits):
+        save = np.savez_compressed if self.compression else np.savez
+        save(os.path.join(self.path, f'sizes_{self.chunks:06d}.npz'), **sizes)
+        if traits is not None:
+            save(os.path.join(self.path, f'traits_{self.chunks:06d}.npz'),
+                 **traits)
+
+    @staticmethod
+    def read(path):
+        """ function to read written results
+
+        Parameters
+        ----------
+
+        path : str
+            directory the sink wrote to
+
+        Returns
+        -------
+
+        sizes, traits : datatable Frames
+            traits is None if no traits were tracked
+        """
+        files = sorted(os.listdir(path))
+        tables = []
+        for prefix in ('sizes_', 'traits_'):
+            columns = {}
+            for name in files:
+                if name.startswith(prefix) and name.endswith('.npz'):
+                    with np.load(os.path.join(path, name)) as chunk:
+                        for k in chunk.files:
+                            columns.setdefault(k, []).append(chunk[k])
+            if columns:
+                tables.append(dt.Frame(dict((k, np.concatenate(v))
+                                            for k, v in columns.items())))
+            else:
+                tables.append(None)
+        return tables[0], tables[1]
+
+
+class ParquetSink(ResultSink):
+    """ Sink appending every chunk as a row group to sizes.parquet and
+    traits.parquet, requires pyarrow. compression is a codec name
+    ('snappy', 'zstd', 'gzip', ...), True for snappy. Read the results back
+    with ParquetSink.read(path)
+    """
+
+    def __init__(self, path, chunk_size=10000, compression=True):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('ParquetSink requires pyarrow, '
+                              'install it or use NPZSink')
+        self.pa = pyarrow
+        self.writers = {}
+        super().__init__(path, chunk_size, compression)
+
+    def _codec(self):
+        if self.compression is True:
+            return 'snappy'
+        if not self.compression:
+            return 'none'
+        return self.compression
+
+    def _append(self, name, columns):
+        table = self.pa.table(columns)
+        if name not in self.writers:
+            self.writers[name] = self.pa.parquet.ParquetWriter(
+                os.path.join(self.path, f'{name}.parquet'), table.schema,
+                compression=self._codec())
+        self.writers[name].write_table(table)
+
+    def _write_chunk(self, sizes, traits):
+        self._append('sizes', sizes)
+        if traits is not None:
+            self._append('traits', traits)
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            for k in self.writers:
+                self.writers[k].close()
+
+    @staticmethod
+    def read(path):
+        """ function to read written results, same as NPZSink.read() """
+        import pyarrow.parquet as pq
+        tables = []
+        for name in ('sizes', 'traits'):
+            file = os.path.join(path, f'{name}.parquet')
+            tables.append(_arrow_to_frame(pq.read_table(file))
+                          if os.path.exists(file) else None)
+        return tables[0], tables[1]
+
+
+class ArrowSink(ParquetSink):
+    """ Sink appending every chunk as a record batch to sizes.arrow and
+    traits.arrow (Arrow IPC files), requires pyarrow. compression is
+    'lz4' or 'zstd', True for lz4. The files can be memory mapped, read the
+    results back with ArrowSink.read(path)
+    """
+
+    def _codec(self):
+        if self.compression is True:
+            return 'lz4'
+        if not self.compression:
+            return None
+        return self.compression
+
+    def _append(self, name, columns):
+        import pyarrow.ipc
+        batch = self.pa.record_batch(list(columns.values()),
+                                     names=list(columns))
+        if name not in self.writers:
+            options = pyarrow.ipc.IpcWriteOptions(compression=self._codec())
+            self.writers[name] = pyarrow.ipc.new_file(
+                os.path.join(self.path, f'{name}.arrow'), batch.schema,
+                options=options)
+        self.writers[name].write_batch(batch)
+
+    @staticmethod
+    def read(path):
+        """ function to read written results, same as NPZSink.read() """
+        import pyarrow
+        import pyarrow.ipc
+        tables = []
+        for name in ('sizes', 'traits'):
+            file = os.path.join(path, f'{name}.arrow')
+            if os.path.exists(file):
+                with pyarrow.memory_map(file) as source:
+                    table = pyarrow.ipc.open_file(source).read_all()
+                tables.append(_arrow_to_frame(table))
+            else:
+                tables.append(None)
+        return tables[0], tables[1]
+
+
+def _arrow_to_frame(table):
+    "helper function to convert an arrow table to a datatable Frame"
+    return dt.Frame(dict((k, table.column(k).to_numpy())
+                         for k in table.column_names))
@@ -0,0 +1,387 @@
+import re
+import copy
+import json
+import numpy as np
+import datatable as dt
+
+from .simulation import Simulation
+from .populations.population2D import Population2D
+from .populations.density_grid import DensityGrid
+from .traits.static_trait import StaticTrait
+from .traits.linked_trait import LinkedTrait
+from .traits.mutable_trait import MutableTrait
+from .traits.categorical_trait import CategoricalTrait
+from .events.birth import BirthEvent, BirthDiffusionEvent
+from .events.death import DeathEvent
+from .events.wall import WallEvent
+from .events.interact2d import Interact2DEvent
+from .events.pause import Pause2DEvent
+from .events.rotate import RotateEvent
+from .events.infection import InfectionSIREvent, CompartmentalInfectionEvent
+from .events.consume import ConsumeEvent
+
+
+# classes a spec can refer to by name
+TRAITS = dict((k.__name__, k) for k in
+              [StaticTrait, LinkedTrait, MutableTrait, CategoricalTrait])
+EVENTS = dict((k.__name__, k) for k in
+              [BirthEvent, BirthDiffusionEvent, DeathEvent, WallEvent,
+               Interact2DEvent, Pause2DEvent, RotateEvent, InfectionSIREvent,
+               CompartmentalInfectionEvent, ConsumeEvent])
+
+# event and trait parameters that refer to another population by name
+POPULATION_PARAMS = ['other', 'attract_population', 'resource']
+# trait and event parameters that are functions, expressions of these
+# arguments. a forcing of time t, and of the 'forcing_trait' value x
+FUNCTION_PARAMS = {'link_func' : ('x',), 'forcing' : ('t', 'x')}
+
+# trigger steps: 'pop.event.method', 'pop.event.method(extra)' to call it
+# for the partner of the event, or 'pop.next_event' to schedule the next
+# event of the individual
+STEP = re.compile(r'^(\w+)\.(\w+)(?:\.(\w+))?(?:\((extra)?\))?$')
+
+
+class Expression():
+    """ Picklable function of x, written as a Python expression with numpy
+    as np and the spec constants in scope, e.g. 'a / (2 * (1 + x))'.
+    Replaces the lambdas of link_func and other trait functions. other
+    argument names can be given, e.g. ('t',) for a forcing of time.
+    """
+
+    def __init__(self, expr, constants=None, args=('x',)):
+        self.expr = expr
+        self.constants = dict(constants) if constants is not None else {}
+        self.args = tuple(args)
+        self.code = None
+
+    def __call__(self, *values):
+        if self.code is None:
+            self.code = compile(self.expr, '<spec>', 'eval')
+        return eval(self.code, {'np' : np, '__builtins__' : {}},
+                    dict(self.constants, **dict(zip(self.args, values))))
+
+    def __getstate__(self):
+        # code objects do not pickle, compiled again when first called
+        state = self.__dict__.copy()
+        state['code'] = None
+        return state
+
+    def __repr__(self):
+        return f'Expression({self.expr!r})'
+
+
+class TriggerChain():
+    """ Trigger built from a spec, calls its steps in order with the params
+    of the triggering event and returns all their new events.
+    """
+
+    def __init__(self, steps):
+        """ Constructor for a trigger chain
+
+        Parameters
+        ----------
+
+        steps : list of tuple
+            (function, partner, next_event) for each step. partner calls
+            the function with the 'extra' id as the actor, next_event calls
+            it with the actor id and schedules the returned event
+        """
+        self.steps = steps
+
+    def __call__(self, params):
+        new_events = []
+        for func, partner, next_event in self.steps:
+            if next_event:
+                new_events += [func(params['actor_id'])]
+                continue
+            if partner:
+                step_params = params.copy()
+                step_params['actor_id'] = step_params['extra']
+            else:
+                step_params = params
+            events = func(step_params)
+            if isinstance(events, list):
+                new_events += events
+        return new_events
+
+
+class ModelSpec():
+    """ Declarative description of a model: populations with their traits
+    and events, and the trigger chains between events, as plain data
+    (dicts, lists, strings and numbers). A spec pickles, so it can be sent
+    to spawned or remote workers, written to JSON or YAML, and kept to
+    build fresh simulations in sweeps. Parsing and checks run once, when
+    the spec is created, building only instantiates the objects.
+
+    Spec format
+    -----------
+    constants : dict
+        names and numbers, usable in {'expr' : ...} values and functions
+    populations : dict
+        population name with a dict of Population2D arguments (init_size,
+        xdim, ydim, implicit_capacity, dtypes) and
+        - traits : list of [class name, params]
+        - events : list of [class name, params]
+        params are passed to the classes with 'current_time' 0 added.
+        values can be {'expr' : '...'} to compute them from the constants,
+        'other', 'attract_population' and 'resource' name a population, and
+        link_func is an expression of x, a forcing an expression of time t
+        (and x, the forcing_trait value). Pause2DEvent can take 'set_list' :
+        '*' to park all other primary events, or a list of event names.
+        with 'type' : 'DensityGrid' the other keys are DensityGrid arguments
+    triggers : dict
+        'pop.event' with a list of steps run after that event, each
+        'pop.event.method', 'pop.event.method(extra)' to call it for the
+        partner (e.g. the eaten prey), or 'pop.next_event'
+    start : list of dict, optional
+        {'call' : 'pop.event.method', 'where' : {trait : category}} steps
+        run for matching individuals once the simulation is created, e.g.
+        the recoveries of the initially infected
+    simulation : dict, optional
+        Simulation arguments, e.g. continue_threshold
+
+    Example
+    -------
+    spec = ModelSpec({
+        'constants' : {'r' : 0.1, 'd' : 0.1, 'vel' : 0.2},
+        'populations' : {
+            'prey' : {'init_size' : 200, 'xdim' : 50, 'ydim' : 50,
+                      'traits' : [['StaticTrait', {'name' : 'birth_rate',
+                                                   'value' : {'expr' : 'r'}}],
+                                  ...],
+                      'events' : [['BirthEvent', {'name' : 'birth',
+                                                  'is_primary' : True}], ...]},
+            'pred' : {...}},
+        'triggers' : {'prey.birth' : ['pred.predation.set_other_next'],
+                      'pred.predation' : ['prey.death.handle(extra)',
+                                          'pred.birth.handle']}})
+    sim = spec.build()
+    sim.run(10)
+    """
+
+    def __init__(self, spec):
+        """ Constructor for a model spec
+
+        Parameters
+        ----------
+
+        spec : dict
+            see the class docstring, deep copied
+        """
+        self.spec = copy.deepcopy(spec)
+        self.constants = dict(self.spec.get('constants', {}))
+        self.populations = self.spec['populations']
+        if len(self.populations) == 0:
+            raise ValueError('spec needs at least one population')
+        events = {}
+        for p in self.populations:
+            pop = self.populations[p]
+            for key in ('init_size', 'xdim', 'ydim'):
+                if key not in pop:
+                    raise ValueError(f'population {p} needs {key}')
+            for k, params in pop.get('traits', []):
+                if k not in TRAITS:
+                    raise ValueError(f'unknown trait class {k} in {p}')
+            names = []
+            for k, params in pop.get('events', []):
+                if k not in EVENTS:
+                    raise ValueError(f'unknown event class {k} in {p}')
+                names.append(params['name'])
+            events[p] = names
+        # precomputed dispatch plan of the triggers, bound when building
+        self.plan = {}
+        for target, steps in self.spec.get('triggers', {}).items():
+            p, _, e = target.partition('.')
+            self._check(p, e, events, target)
+            self.plan[(p, e)] = [self._parse(s, events) for s in steps]
+        self.start = []
+        for s in self.spec.get('start', []):
+            self.start.append((self._parse(s['call'], events),
+                               dict(s.get('where', {}))))
+        self.simulation = dict(self.spec.get('simulation', {}))
+
+    @staticmethod
+    def _check(p, e, events, text):
+        if p not in events:
+            raise ValueError(f'unknown population {p} in {text!r}')
+        if e is not None and e not in events[p]:
+            raise ValueError(f'unknown event {p}.{e} in {text!r}')
+
+    def _parse(self, text, events):
+        "helper function to parse a trigger step into (pop, event, method, partner)"
+        m = STEP.match(text.replace(' ', ''))
+        if m is None:
+            raise ValueError(f'cannot parse trigger step {text!r}')
+        p, e, method, partner = m.groups()
+        if method is None:
+            if e != 'next_event':
+                raise ValueError(f'trigger step {text!r} needs a method')
+            self._check(p, None, events, text)
+            return (p, None, 'next_event', False)
+        self._check(p, e, events, text)
+        return (p, e, method, partner is not None)
+
+    def value(self, v):
+        "function to get a parameter value, {'expr' : ...} is computed"
+        if isinstance(v, dict) and list(v) == ['expr']:
+            return Expression(v['expr'], self.constants)(None)
+        return v
+
+    def _params(self, params, population_dict):
+        "helper function to get the class params of a trait or event"
+        params = dict((k, self.value(v)) for k, v in params.items())
+        for k in POPULATION_PARAMS:
+            if k in params and isinstance(params[k], str):
+                params[k] = population_dict[params[k]]
+        for k in FUNCTION_PARAMS:
+            if k in params and isinstance(params[k], str):
+                params[k] = Expression(params[k], self.constants,
+                                       FUNCTION_PARAMS[k])
+        return params
+
+    def build_populations(self, tile=None):
+        """ function to create the populations, traits, events and triggers
+
+        Parameters
+        ----------
+
+        tile : Tile or None
+            build only the part of the environment of a tile, with sizes
+            and implicit capacities scaled by its fraction, see
+            TiledSimulation
+
+        Returns
+        -------
+
+        population_dict : dict
+            population names with Population2D objects
+        """
+        population_dict = {}
+        for p in self.populations:
+            spec = self.populations[p]
+            init_size = self.value(spec['init_size'])
+            capacity = self.value(spec.get('implicit_capacity'))
+            xdim, ydim = self.value(spec['xdim']), self.value(spec['ydim'])
+            if tile is not None:
+                init_size = int(init_size * tile.fraction)
+                if capacity:
+                    capacity = int(capacity * tile.fraction)
+                xdim, ydim = tile.xdim, tile.ydim
+            if spec.get('type') == 'DensityGrid':
+                kwargs = dict((k, self.value(v)) for k, v in spec.items()
+                              if k not in ('type', 'init_size', 'xdim', 'ydim',
+                                           'implicit_capacity'))
+                population_dict[p] = DensityGrid(name=p, init_size=init_size,
+                                                 xdim=xdim, ydim=ydim,
+                                                 implicit_capacity=capacity,
+                                                 **kwargs)
+                continue
+            population_dict[p] = Population2D(name=p, init_size=int(init_size),
+                                              xdim=xdim, ydim=ydim,
+                                              implicit_capacity=capacity,
+                                              dtypes=spec.get('dtypes', 'default'))
+        # events can refer to other populations, create them all first
+        for p in self.populations:
+            spec = self.populations[p]
+            pop = population_dict[p]
+            if spec.get('type') == 'DensityGrid':
+                continue
+            pop.add_traits([(TRAITS[k], self._params(params, population_dict))
+                            for k, params in spec.get('traits', [])])
+            events = []
+            for k, params in spec.get('events', []):
+                params = self._params(params, population_dict)
+                params.setdefault('current_time', 0)
+                params.pop('set_list', None)
+                events.append((EVENTS[k], params))
+            pop.add_events(events)
+            # pauses park the other primary events
+            for k, params in spec.get('events', []):
+                if 'set_list' in params:
+                    ev = pop.event_dict[params['name']]
+                    if params['set_list'] == '*':
+                        ev.set_list = [c for c in pop.event_list
+                                       if c not in ev.ignore_list]
+                    else:
+                        ev.set_list = [f'{c}_time' for c in params['set_list']]
+
+        for (p, e), steps in self.plan.items():
+            event = population_dict[p].event_dict[e]
+            bound = [self._bind(s, population_dict) for s in steps]
+            if len(bound) == 1 and not bound[0][1] and not bound[0][2]:
+                # a single plain step is called directly, like in notebooks
+                event.triggers = bound[0][0]
+            else:
+                event.triggers = TriggerChain(bound)
+        return population_dict
+
+    @staticmethod
+    def _bind(step, population_dict):
+        "helper function to get (function, partner, next_event) of a step"
+        p, e, method, partner = step
+        pop = population_dict[p]
+        if method == 'next_event':
+            return (pop.get_next_event, False, True)
+        return (getattr(pop.event_dict[e], method), partner, False)
+
+    def __call__(self, tile=None):
+        "same as build_populations(), so a spec can be the build of a TiledSimulation"
+        return self.build_populations(tile)
+
+    def build(self, **kwargs):
+        """ function to create a ready Simulation of the model
+
+        Parameters
+        ----------
+
+        kwargs
+            Simulation arguments, override those of the spec
+
+        Returns
+        -------
+
+        sim : Simulation
+        """
+        population_dict = self.build_populations()
+        sim = Simulation(population_dict, **dict(self.simulation, **kwargs))
+        for step, where in self.start:
+            func, partner, next_event = self._bind(step, population_dict)
+            pop = population_dict[step[0]]
+            rows = dt.f.id >= 0
+            for trait, category in where.items():
+                rows = rows & (dt.f[trait] == pop.trait_dict[trait].code(category))
+            for i in pop.df[rows, 'id'].to_numpy().reshape(-1):
+                if next_event:
+                    events = [func(int(i))]
+                else:
+                    events = func(dict(actor_id=int(i), current_time=sim.time))
+                for new_event in events or []:
+                    if len(new_event) > 0:
+                        sim.schedule(new_event)
+        return sim
+
+    def to_dict(self):
+        "function to get a copy of the spec as plain data"
+        return copy.deepcopy(self.spec)
+
+    @classmethod
+    def from_json(cls, path):
+        "function to read a spec from a JSON file"
+        with open(path) as fp:
+            return cls(json.load(fp))
+
+    def to_json(self, path):
+        "function to write the spec to a JSON file"
+        with open(path, 'w') as fp:
+            json.dump(self.spec, fp, indent=2)
+
+    @classmethod
+    def from_yaml(cls, path):
+        "function to read a spec from a YAML file, needs pyyaml"
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('reading YAML specs needs pyyaml, '
+                              'or use from_json()')
+        with open(path) as fp:
+            return cls(yaml.safe_load(fp))
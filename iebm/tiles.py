@@ -0,0 +1,494 @@
+import traceback
+import multiprocessing
+import numpy as np
+import datatable as dt
+from datatable import f
+
+from .simulation import Simulation
+from .events.wall import WallEvent
+from .events.interact2d import Interact2DEvent
+from .traits.categorical_trait import CategoricalTrait
+
+
+class Tile():
+    """ Part of the environment of a TiledSimulation. A build function gets
+    a tile and creates the populations of that part only, in local
+    coordinates from (0, 0) to (xdim, ydim). Initial sizes and implicit
+    capacities should be scaled by the fraction of the environment the
+    tile covers, so densities stay the same.
+    """
+
+    def __init__(self, index, x0, y0, xdim, ydim, fraction, open_walls):
+        """ Constructor for a tile
+
+        Parameters
+        ----------
+
+        index : tuple of int
+            column and row of the tile in the grid of tiles
+
+        x0, y0 : float
+            position of the local origin in the whole environment
+
+        xdim, ydim : float
+            size of the tile
+
+        fraction : float
+            fraction of the whole environment covered by the tile
+
+        open_walls : list of str
+            walls shared with a neighbouring tile, crossed by individuals
+        """
+        self.index = index
+        self.x0 = x0
+        self.y0 = y0
+        self.xdim = xdim
+        self.ydim = ydim
+        self.fraction = fraction
+        self.open_walls = open_walls
+
+    def __repr__(self):
+        return f'Tile{self.index}'
+
+
+class TiledSimulation():
+    """ Simulation of a large environment split into a grid of tiles, each
+    tile simulated by its own Simulation in a worker process, so a single
+    run uses several cores.
+
+    Tiles run in windows of simulated time and synchronize between them.
+    Individuals that cross a border between tiles (an open wall, see
+    WallEvent) leave their tile, and are handed over to the tile they
+    reached at the end of the window, moved along their velocity for the
+    time in between. The window is the lookahead of the tiles: by default
+    the time in which the fastest individual moves the largest interaction
+    radius, so an individual in transit misses at most the interactions
+    within one radius of a border.
+
+    Tiles are otherwise independent, and results are biased compared to a
+    Simulation of the whole environment. Interactions between individuals
+    on both sides of a border are never predicted, and individuals in
+    transit are in no tile until the window ends. Both lose interactions,
+    for a fraction of about (2 D + 2 v w) B / pi of all interactions, with
+    D the interaction distance, v the speed, w the window and B the length
+    of borders per area, see border_loss(). With the default window and D
+    twice the radius this is 6 R B / pi: 4 R B / pi for pairs across a
+    border, 2 R B / pi for individuals in transit. Rates that depend on
+    interactions are lowered near borders, so tiles should be much larger
+    than the interaction radii. e.g. 400 individuals of radius 1 and speed
+    0.2 counting contacts in a 100 x 100 environment lost 8.1 % +- 0.8 % of
+    contacts with 4 x 4 tiles, where the estimate is 11.5 %. offspring
+    placed at random also land in the tile of their parent.
+
+    Example
+    -------
+    def build(tile):
+        prey = Population2D(name='prey', init_size=int(10000 * tile.fraction),
+                            xdim=tile.xdim, ydim=tile.ydim)
+        ...
+        return {'prey' : prey, 'pred' : pred}
+
+    if __name__ == '__main__':
+        sim = TiledSimulation(build, xdim=2000, ydim=2000, tiles=(4, 4))
+        sim.run(5000)
+        res = sim.get_results()
+        sim.close()
+    """
+
+    def __init__(self, build, xdim, ydim, tiles=(2, 2), window=None,
+                 continue_threshold=3):
+        """ Constructor for a tiled simulation, starts one worker process
+        per tile
+
+        Parameters
+        ----------
+
+        build : function or ModelSpec
+            module-level function that takes a Tile and returns the
+            population dictionary of the tile, called in the workers. a
+            ModelSpec (see iebm.spec) builds tiles too
+
+        xdim, ydim : float
+            size of the whole environment
+
+        tiles : tuple of int
+            number of tiles along x and y
+
+        window : float or None
+            simulated time between synchronizations. if None, the time in
+            which the fastest individual moves the largest radius, updated
+            every window. tiles without moving individuals are only
+            synchronized at the end of every run()
+
+        continue_threshold : int
+            stop a run once a population is at or below this total size
+        """
+        self.xdim = xdim
+        self.ydim = ydim
+        self.nx, self.ny = tiles
+        self.window = window
+        self.continue_threshold = continue_threshold
+        self.time = 0
+        # fastest speed and largest radius seen so far, for the lookahead
+        self.speed = 0
+        self.radius = 0
+        # individuals handed over between tiles
+        self.handoffs = 0
+
+        tile_x, tile_y = xdim / self.nx, ydim / self.ny
+        self.tiles = []
+        for j in range(self.ny):
+            for i in range(self.nx):
+                open_walls = [w for w, is_open in (('x0', i > 0),
+                                                   ('x1', i < self.nx - 1),
+                                                   ('y0', j > 0),
+                                                   ('y1', j < self.ny - 1))
+                              if is_open]
+                self.tiles.append(Tile((i, j), i * tile_x, j * tile_y,
+                                       tile_x, tile_y,
+                                       1 / (self.nx * self.ny), open_walls))
+
+        # one worker process per tile
+        context = multiprocessing.get_context('spawn')
+        self.workers = []
+        self.conns = []
+        for tile in self.tiles:
+            conn, child_conn = context.Pipe()
+            worker = context.Process(target=_tile_worker,
+                                     args=(child_conn, build, tile),
+                                     daemon=True)
+            worker.start()
+            child_conn.close()
+            self.workers.append(worker)
+            self.conns.append(conn)
+        try:
+            infos = [self._receive(k) for k in range(len(self.tiles))]
+        except RuntimeError:
+            self.close()
+            raise
+
+        self.population_list = infos[0]['populations']
+        # rows waiting to enter every tile at the next window
+        self.arrivals = [{} for _ in self.tiles]
+        self.time_history = []
+        self.population_history = dict((p, []) for p in self.population_list)
+        self.trait_history = {}
+        self.update_history(infos)
+
+    def _receive(self, k):
+        "helper function to get the reply of a worker, raises its errors"
+        try:
+            reply = self.conns[k].recv()
+        except EOFError:
+            raise RuntimeError(f'worker of {self.tiles[k]} stopped')
+        if isinstance(reply, str):
+            raise RuntimeError(f'error in worker of {self.tiles[k]}:\n{reply}')
+        return reply
+
+    def lookahead(self):
+        """ function to get the simulated time until the next
+        synchronization of the tiles
+
+        Returns
+        -------
+
+        window : float
+            the given window, or the time in which the fastest individual
+            moves the largest radius. inf if nothing moves
+        """
+        if self.window is not None:
+            return self.window
+        if self.speed > 0 and self.radius > 0:
+            return self.radius / self.speed
+        return np.inf
+
+    def border_loss(self, distance=None):
+        """ function to estimate the fraction of interactions missed at the
+        borders between tiles, an upper estimate for individuals that move
+        straight at the same speed and are spread evenly
+
+        Parameters
+        ----------
+
+        distance : float or None
+            distance of an interaction, twice the largest radius if None
+
+        Returns
+        -------
+
+        loss : float
+            estimated fraction of missed interactions, see TiledSimulation
+        """
+        if distance is None:
+            distance = 2 * self.radius
+        borders = (self.nx - 1) / self.xdim + (self.ny - 1) / self.ydim
+        transit = self.speed * self.lookahead() if self.speed > 0 else 0
+        return min((2 * distance + 2 * transit) * borders / np.pi, 1.)
+
+    def run(self, runtime, progress_bar=True):
+        """ Function to start (or continue) a tiled simulation."""
+
+        if progress_bar:
+            from tqdm import tqdm
+            pbar = tqdm(total=round(runtime, 4),
+                        bar_format=("{l_bar}{bar}| {n:.4f}/{total_fmt} " +
+                                    "[{elapsed}<{remaining}, {rate_fmt}{postfix}]"))
+
+        while self.time < runtime:
+
+            until = min(self.time + self.lookahead(), runtime)
+            # tiles run the window in parallel
+            for k, conn in enumerate(self.conns):
+                conn.send((until, self.arrivals[k]))
+            replies = [self._receive(k) for k in range(len(self.tiles))]
+            self.arrivals = [{} for _ in self.tiles]
+            self.route([departures for _, departures in replies], until)
+
+            if progress_bar:
+                pbar.update(until - self.time)
+            self.time = until
+
+            continue_run = self.update_history([info for info, _ in replies])
+            if not continue_run:
+                break
+
+        if progress_bar:
+            pbar.close()
+
+    def route(self, departures, current_time):
+        """ function to hand individuals that left their tile over to the
+        tile they reached at the current time
+
+        Parameters
+        ----------
+
+        departures : list of dict
+            for every tile, population names with (times, rows) of the
+            individuals that left, in global coordinates
+
+        current_time : float
+            time of the synchronization
+        """
+        populations = set(p for d in departures for p in d)
+        for p in populations:
+            times = np.concatenate([d[p][0] for d in departures if p in d])
+            rows = dt.rbind(*[d[p][1] for d in departures if p in d],
+                            force=True)
+            # keep moving along the velocity until the synchronization
+            elapsed = current_time - times
+            xy = []
+            for c, dim in (('x', self.xdim), ('y', self.ydim)):
+                pos = rows.to_numpy(column=rows.colindex(c)).astype(np.float64)
+                if f'vel_{c}' in rows.names:
+                    vel = rows.to_numpy(column=rows.colindex(f'vel_{c}'))
+                    pos = pos + np.nan_to_num(np.ma.filled(vel, 0)) * elapsed
+                xy.append(np.clip(pos, 0, dim))
+            rows[:, 'x'] = dt.Frame(xy[0])
+            rows[:, 'y'] = dt.Frame(xy[1])
+            i = np.clip((xy[0] // self.tiles[0].xdim).astype(int), 0, self.nx - 1)
+            j = np.clip((xy[1] // self.tiles[0].ydim).astype(int), 0, self.ny - 1)
+            dest = j * self.nx + i
+            for k in np.unique(dest):
+                self.arrivals[k][p] = rows[np.flatnonzero(dest == k).tolist(), :]
+            self.handoffs += rows.nrows
+
+    def update_history(self, infos):
+        """ helper function to store the total population sizes and trait
+        values of all tiles, and to determine if a run should stop
+
+        Parameters
+        ----------
+
+        infos : list of dict
+            state of every tile at the current time
+        """
+        continue_run = True
+        self.time_history.append(self.time)
+        for i, p in enumerate(self.population_list):
+            size = sum(info['sizes'][i] for info in infos)
+            if size <= self.continue_threshold:
+                continue_run = False
+            self.population_history[p].append(size)
+        for key in infos[0]['traits']:
+            values = np.concatenate([np.asarray(info['traits'][key][0])
+                                     for info in infos])
+            counts = np.concatenate([np.asarray(info['traits'][key][1])
+                                     for info in infos])
+            # same value in several tiles, add up the counts
+            values, inverse = np.unique(values, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts,
+                                 minlength=len(values)).astype(int)
+            self.trait_history.setdefault(key, []).append((values, counts))
+        for info in infos:
+            self.speed = max(self.speed, info['speed'])
+            self.radius = max(self.radius, info['radius'])
+        return continue_run
+
+    def get_results(self):
+        res = {}
+        res['time'] = self.time_history
+        res['size'] = dict(self.population_history)
+        res['trait'] = dict(self.trait_history)
+        res['handoffs'] = self.handoffs
+        res['border_loss'] = self.border_loss()
+        return res
+
+    def close(self):
+        "Function to stop the worker processes"
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker, conn in zip(self.workers, self.conns):
+            worker.join()
+            conn.close()
+        self.workers = []
+        self.conns = []
+
+
+def _tile_worker(conn, build, tile):
+    """ helper function running the simulation of one tile in a worker
+    process. replies with the tile state after every window, or with the
+    traceback of an error"""
+    try:
+        population_dict = build(tile)
+        for p in population_dict:
+            pop = population_dict[p]
+            pop.open_walls = set(tile.open_walls)
+            # wall times for the open walls
+            for k in pop.event_dict:
+                if isinstance(pop.event_dict[k], WallEvent) and pop.df.nrows > 0:
+                    pop.event_dict[k].set_next_rows(range(pop.df.nrows), 0)
+        sim = Simulation(population_dict, continue_threshold=-1,
+                         keep_history=False)
+        info = _tile_info(sim)
+        info['populations'] = [str(p) for p in population_dict]
+        conn.send(info)
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            until, arrivals = message
+            departures = _run_tile(sim, tile, until, arrivals)
+            conn.send((_tile_info(sim, departures), departures))
+    except Exception:
+        conn.send(traceback.format_exc())
+    conn.close()
+
+
+def _tile_info(sim, departures=None):
+    """ helper function to get the sizes, tracked traits and lookahead of a
+    tile. individuals in transit are counted in the tile they left, until
+    they arrive"""
+    departures = departures or {}
+    speed, radius = 0, 0
+    for p in sim.population_dict:
+        df = sim.population_dict[p].df
+        if df.nrows == 0:
+            continue
+        if 'vel_x' in df.names:
+            vel = np.hypot(np.ma.filled(df.to_numpy(column=df.colindex('vel_x')), 0),
+                           np.ma.filled(df.to_numpy(column=df.colindex('vel_y')), 0))
+            speed = max(speed, float(np.nanmax(vel)))
+        for c in df.names:
+            if c.endswith('radius'):
+                radius = max(radius, float(np.nanmax(
+                    np.ma.filled(df.to_numpy(column=df.colindex(c)), 0))))
+    sizes = [sim.population_dict[p].size +
+             (departures[str(p)][1].nrows if str(p) in departures else 0)
+             for p in sim.population_dict]
+    traits = {}
+    for (p, t) in sim.trait_tracks:
+        trait = sim.trait_tracks[(p, t)]
+        values, counts = trait.track_values()
+        if str(p) in departures:
+            rows = departures[str(p)][1]
+            moving = rows.to_numpy(column=rows.colindex(str(t))).reshape(-1)
+            if isinstance(trait, CategoricalTrait):
+                moving = trait.table.names[moving]
+            # repeated values are added up with the other tiles
+            moving, moving_counts = np.unique(moving, return_counts=True)
+            values = np.concatenate([np.asarray(values), moving])
+            counts = np.concatenate([np.asarray(counts), moving_counts])
+        traits[(str(p), str(t))] = (values, counts)
+    return dict(sizes=sizes, traits=traits, speed=speed, radius=radius)
+
+
+def _run_tile(sim, tile, until, arrivals):
+    """ helper function to add the arrivals of a tile and to handle its
+    events up to the end of the window
+
+    Returns
+    -------
+
+    departures : dict
+        population names with (times, rows) of individuals that left the
+        tile, in global coordinates
+    """
+    new_events = []
+    for p in arrivals:
+        pop = sim.population_dict[p]
+        rows = arrivals[p]
+        rows[:, 'x'] = rows[:, f.x - tile.x0]
+        rows[:, 'y'] = rows[:, f.y - tile.y0]
+        actor_idxs, events = pop.immigrate(rows, sim.time)
+        new_events += events
+        new_events += _introduce(sim, pop, actor_idxs)
+    if len(arrivals) > 0 or any(len(sim.population_dict[p].emigrants) > 0
+                                for p in sim.population_dict):
+        # positions changed outside of events, e.g. spatial indexes
+        for p in sim.population_dict:
+            for k in sim.population_dict[p].event_dict:
+                sim.population_dict[p].event_dict[k].restored()
+    for new_event in new_events:
+        if len(new_event) > 0 and new_event[0] > sim.time:
+            sim.schedule(new_event)
+
+    while sim.scheduler.peek() is not None and sim.scheduler.peek()[0] <= until:
+        sim.step()
+    # move everyone to the end of the window
+    for p in sim.population_dict:
+        sim.population_dict[p].update(until - sim.time)
+    sim.time = until
+
+    departures = {}
+    for p in sim.population_dict:
+        pop = sim.population_dict[p]
+        if len(pop.emigrants) > 0:
+            times = np.array([t for t, _ in pop.emigrants])
+            rows = dt.rbind(*[row for _, row in pop.emigrants], force=True)
+            rows[:, 'x'] = rows[:, f.x + tile.x0]
+            rows[:, 'y'] = rows[:, f.y + tile.y0]
+            departures[str(p)] = (times, rows)
+            pop.emigrants = []
+    return departures
+
+
+def _introduce(sim, pop, actor_idxs):
+    """ helper function to predict the interactions of individuals in a
+    tile with new arrivals
+
+    Returns
+    -------
+
+    new_events : list
+        next events of individuals with a new interaction
+    """
+    new_events = []
+    if len(actor_idxs) == 0:
+        return new_events
+    actor_ids = pop.df[actor_idxs, 'id'].to_list()[0]
+    for p in sim.population_dict:
+        for k in sim.population_dict[p].event_dict:
+            e = sim.population_dict[p].event_dict[k]
+            if not isinstance(e, Interact2DEvent) or not e.is_primary:
+                continue
+            if e.other is pop:
+                for actor_id in actor_ids:
+                    new_events += e.set_other_next(
+                        dict(actor_id=actor_id, current_time=sim.time))
+            elif e.population is pop and e.other is None:
+                for actor_idx in actor_idxs:
+                    new_events += e.refresh_partner(actor_idx, sim.time)
+    return new_events
@@ -27,10 +27,28 @@ class Trait(ABC):
         "function to overwrite with subclass method to get value of parent"
         pass
     
+    def inherit_values(self, parent_id, n):
+        """helper function to get trait values for n offspring of the same
+        parent at once. subclasses can overwrite with a vectorized version"""
+        return np.array([self.inherit_value(parent_id) for _ in range(n)])
+
+    def add_values(self, values):
+        """called after new individuals with the given trait values are added
+        to the population. traits that keep counters overwrite this"""
+        pass
+
+    def remove_value(self, actor_idx):
+        """called before the individual at the given row number is removed
+        from the population. traits that keep counters overwrite this"""
+        pass
+
     def track_values(self):
         "helper funtion to keep track of trait values"
-        vals, counts = np.unique(self.population.df[str(self)].to_numpy(column=0),
-                                 return_counts=True)
+        vals = self.population.df[str(self)].to_numpy(column=0)
+        # ignore rows flagged dead
+        if self.population.dead_count > 0:
+            vals = vals[self.population.alive_mask()]
+        vals, counts = np.unique(vals, return_counts=True)
         return vals, counts
 
     def __repr__(self):
@@ -1,5 +1,6 @@
 import numpy as np
 from .base import Trait
+from ..populations.categories import Categories
 
 class CategoricalTrait(Trait):
     
@@ -24,27 +25,108 @@ class CategoricalTrait(Trait):
         
         self.categories = params['categories']
         init_fractions = params['fractions']
+
+        # the column stores int8 codes, names are in the category table
+        self.table = Categories(self.categories)
+        self.population.categories[str(self)] = self.table
         
-        cats = [c for t, frac in enumerate(init_fractions) 
-                for c in [self.categories[t]]*int(frac*self.population.size)]
-        cats = np.array(cats)
+        cats = [t for t, frac in enumerate(init_fractions) 
+                for _ in range(int(frac*self.population.size))]
+        cats = np.array(cats, dtype=self.table.dtype)
         np.random.shuffle(cats)
-        self.population.df[str(self)] = np.array(cats)
+        self.population.df[str(self)] = cats
+        # number of individuals in each category, kept up to date by
+        # set_code(), add_values() and remove_value(), recount() counts
+        # them again from the column
+        self.counts = np.bincount(cats, minlength=len(self.table))
+        
+    def code(self, name):
+        "helper function to get the integer code of a category name"
+        return self.table.code(name)
+
+    def set_code(self, actor_idx, code):
+        """ function to change the category of an individual and update the
+        category counts. events should change categories through this
+        function, code that writes to the dataframe directly has to call
+        recount() afterwards
+
+        Parameters
+        ----------
+
+        actor_idx : int
+            row number of individual
+        code : int
+            new category code
+        """
+        old_code = self.population.df[actor_idx, str(self)]
+        self.population.df[actor_idx, str(self)] = code
+        self.counts[old_code] -= 1
+        self.counts[code] += 1
+
+    def add_values(self, values):
+        self.counts += np.bincount(np.asarray(values, dtype=int),
+                                   minlength=len(self.table))
+
+    def remove_value(self, actor_idx):
+        self.counts[self.population.df[actor_idx, str(self)]] -= 1
         
     def get_value(self, actor_id):
         
         actor_idx = self.population._get_actor_idx(actor_id)
         if actor_idx is not None:
-            # return value at row number and trait column name
-            return self.population.df[actor_idx, str(self)]
+            # return category name at row number and trait column name
+            return self.table.names[self.population.df[actor_idx, str(self)]]
         else:
             return None
     
     def inherit_value(self, parent_id):
         
+        parent_code = self.inherit_code(parent_id)
+        if parent_code is not None:
+            # return category name of the parent, like get_value()
+            return self.table.names[parent_code]
+        else:
+            return None
+
+    def inherit_code(self, parent_id):
+        "helper function to get the category code an offspring inherits"
         parent_idx = self.population._get_actor_idx(parent_id)
         if parent_idx is not None:
-            # return value at row number and trait column name
+            # return code at row number and trait column name
             return self.population.df[parent_idx, str(self)]
         else:
-            return None
\ No newline at end of file
+            return None
+
+    def inherit_values(self, parent_id, n):
+        
+        parent_code = self.inherit_code(parent_id)
+        # every offspring gets the parent category, stored as code
+        return np.full(n, parent_code, dtype=self.table.dtype)
+
+    def recount(self):
+        """ function to count the individuals in each category from the
+        column again, for code that writes to the dataframe directly
+        instead of using set_code(). this scans the whole column
+
+        Returns
+        -------
+
+        counts : numpy array of int
+            number of individuals of every category code
+        """
+        df = self.population.df
+        codes = df.to_numpy(column=df.colindex(str(self)))
+        if self.population.dead_count > 0:
+            codes = codes[self.population.alive_mask()]
+        self.counts = np.bincount(np.asarray(codes, dtype=int).reshape(-1),
+                                  minlength=len(self.table))
+        return self.counts
+
+    def track_values(self):
+        """helper funtion to keep track of trait values, with category names.
+        like other traits only the categories present, sorted by name,
+        taken from the counts without scanning the column"""
+        counts = self.counts
+        order = np.argsort(self.table.names)
+        order = order[counts[order] > 0]
+        return self.table.names[order], counts[order]
@@ -57,4 +57,18 @@ class LinkedTrait(Trait):
         parent_id : int
             identifier interger for the parent
         """
-        return self.get_value(parent_id)
\ No newline at end of file
+        return self.get_value(parent_id)
+
+    def inherit_values(self, parent_id, n):
+        """function to pass trait values from a parent to n offspring, the
+        link function is only applied once
+
+        Parameters
+        ----------
+
+        parent_id : int
+            identifier interger for the parent
+        n : int
+            number of offspring
+        """
+        return np.array([self.get_value(parent_id)] * n)
@@ -84,6 +84,23 @@ class MutableTrait(Trait):
         parent_val = self.population.df[parent_idx, str(self)]
         off_val = self.mutate(parent_val)
         return off_val
+
+    def inherit_values(self, parent_id, n):
+        """function to pass trait values from a parent to n offspring at once,
+        each offspring has its own mutation possibility
+
+        Parameters
+        ----------
+
+        parent_id : int
+            identifier interger for the parent
+        n : int
+            number of offspring
+        """
+
+        parent_idx = self.population._get_actor_idx(parent_id)
+        parent_val = self.population.df[parent_idx, str(self)]
+        return self.mutate_values(np.array([parent_val] * n))
         
     
     def mutate(self, value):
@@ -117,5 +134,30 @@ class MutableTrait(Trait):
                 # return new val
                 return val
         # otherwise, return initial passed value
-        return value        
-        
\ No newline at end of file
+        return value
+
+    def mutate_values(self, values):
+        """Vectorized version of mutate(). Given an array of values, possibly
+        change each value independently.
+
+        Parameters
+        ----------
+
+        values : numpy array
+            values that might mutate
+        """
+
+        if self.mutate_rate:
+            # draw a random step size for every value
+            steps = np.random.poisson(self.mutate_rate, len(values))
+            # add a chance that the step size could go down
+            steps[np.random.rand(len(values)) < 0.5] *= -1
+            # update values based on step sizes and step value
+            values = values + steps * self.mutate_step
+            # check to make sure new values in proper range
+            if self.min_value:
+                values = np.maximum(values, self.min_value)
+            if self.max_value:
+                values = np.minimum(values, self.max_value)
+        # unchanged values if no mutation
+        return values
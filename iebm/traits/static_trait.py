@@ -34,4 +34,7 @@ class StaticTrait(Trait):
     def inherit_value(self, parent_id):
         "simply return the static value"
         return self.value
-        
\ No newline at end of file
+
+    def inherit_values(self, parent_id, n):
+        "simply return the static value for every offspring"
+        return np.array([self.value] * n)
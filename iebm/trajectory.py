@@ -0,0 +1,261 @@
+import os
+import json
+import numpy as np
+
+
+# one row per snapshot of a population: time, first row in the column
+# files and number of individuals
+INDEX_DTYPE = np.dtype([('time', np.float64),
+                        ('offset', np.int64),
+                        ('count', np.int64)])
+
+
+class TrajectoryRecorder():
+    """ Recorder of individual positions and traits at fixed simulated-time
+    intervals. Every population gets a directory with one append-only
+    binary file per column and an index file of snapshot offsets, read
+    them back with TrajectoryReader without loading the whole files.
+
+    Positions between events are extrapolated from the velocities, the
+    populations themselves are only moved at events.
+
+    Example
+    -------
+    recorder = TrajectoryRecorder('tracks', interval=10,
+                                  columns={'pred' : ['radius']})
+    sim = Simulation(pop_dict, recorder=recorder)
+    sim.run(5000)
+    sim.close()
+    tracks = TrajectoryReader('tracks')
+    frame = tracks.frame('pred', 100) # dict of columns
+    """
+
+    def __init__(self, path, interval, columns=None, start_time=0):
+        """ Constructor for a trajectory recorder
+
+        Parameters
+        ----------
+
+        path : str
+            directory to write to, created if missing
+
+        interval : float
+            simulated time between snapshots
+
+        columns : dict or None
+            population names with lists of extra columns (e.g. traits) to
+            record, besides 'id', 'x', 'y' and 'status'
+
+        start_time : float
+            time of the first snapshot
+        """
+        self.path = path
+        self.interval = interval
+        self.columns = columns if columns is not None else {}
+        self.next_time = start_time
+        self.files = {}
+        self.dtypes = {}
+        self.offsets = {}
+        self.closed = False
+        os.makedirs(path, exist_ok=True)
+
+    def open(self, population_dict):
+        """ function called by the Simulation to create the files of every
+        population"""
+        meta = dict(interval=self.interval, populations={})
+        for p in population_dict:
+            pop = population_dict[p]
+            columns = ['id', 'x', 'y', 'status'] + [
+                c for c in self.columns.get(str(p), []) if c in pop.df.names]
+            os.makedirs(os.path.join(self.path, str(p)), exist_ok=True)
+            self.files[p] = dict((c, open(self._file(p, c), 'wb'))
+                                 for c in columns + ['index'])
+            self.dtypes[p] = dict((c, self._dtype(pop, c)) for c in columns)
+            self.offsets[p] = 0
+            meta['populations'][str(p)] = dict(
+                columns=columns,
+                categories=dict((k, list(pop.categories[k].names))
+                                for k in pop.categories if k in columns))
+        self.meta = meta
+
+    def _dtype(self, population, column):
+        """helper function to get the stored dtype of a column from its
+        stype, before any snapshot. ids and category codes are never
+        missing and keep their integer type. other integer columns, e.g.
+        partner ids in *_extra columns, can become NA later and are stored
+        as float64 with NaN"""
+        dtype = np.dtype(population.df[column].stype.dtype)
+        if (dtype.kind in 'biu' and column != 'id' and
+                column not in population.categories):
+            dtype = np.dtype(np.float64)
+        return dtype.str
+
+    def _file(self, p, column):
+        return os.path.join(self.path, str(p), f'{column}.bin')
+
+    def record_until(self, population_dict, current_time, until_time):
+        """ function to record all snapshots up to a time, from the
+        population state at the current time
+
+        Parameters
+        ----------
+
+        population_dict : dict
+            populations of the simulation
+
+        current_time : float
+            time of the population state
+
+        until_time : float
+            record snapshots with times up to (and including) this time
+        """
+        while self.next_time <= until_time:
+            for p in population_dict:
+                self.snapshot(p, population_dict[p],
+                              self.next_time, self.next_time - current_time)
+            self.next_time += self.interval
+
+    def snapshot(self, p, population, time, lapse=0):
+        """ function to append one snapshot of a population
+
+        Parameters
+        ----------
+
+        p : str
+            population name
+
+        population : Population2D
+            the population
+
+        time : float
+            time of the snapshot
+
+        lapse : float
+            time since the population state was last updated, positions
+            are moved this far along the velocities
+        """
+        df = population.df
+        files = self.files[p]
+        if population.dead_count > 0:
+            keep = population.alive_mask()
+        else:
+            keep = None
+        count = 0
+        for c in files:
+            if c == 'index':
+                continue
+            dtype = self.dtypes[p][c]
+            values = df.to_numpy(column=df.colindex(c))
+            if np.ma.isMaskedArray(values):
+                if np.dtype(dtype).kind != 'f':
+                    raise ValueError(f'column {c} of population {p} has '
+                                     'missing values')
+                values = np.ma.filled(values.astype(np.float64), np.nan)
+            if lapse and c in ('x', 'y') and f'vel_{c}' in df.names:
+                values = values + df.to_numpy(
+                    column=df.colindex(f'vel_{c}')) * lapse
+            if keep is not None:
+                values = values[keep]
+            files[c].write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            count = len(values)
+        row = np.array([(time, self.offsets[p], count)], dtype=INDEX_DTYPE)
+        files['index'].write(row.tobytes())
+        self.offsets[p] += count
+
+    def flush(self):
+        "function to write buffered data and the metadata, makes it readable"
+        for p in self.files:
+            for c in self.files[p]:
+                self.files[p][c].flush()
+            self.meta['populations'][str(p)]['dtypes'] = self.dtypes[p]
+        with open(os.path.join(self.path, 'meta.json'), 'w') as fp:
+            json.dump(self.meta, fp)
+
+    def close(self):
+        "function to flush and close all files"
+        if not self.closed:
+            self.flush()
+            for p in self.files:
+                for c in self.files[p]:
+                    self.files[p][c].close()
+            self.closed = True
+
+
+class TrajectoryReader():
+    """ Reader of files written by TrajectoryRecorder. Column files are
+    memory mapped, a snapshot only reads its own rows.
+    """
+
+    def __init__(self, path):
+        """ Constructor for a trajectory reader
+
+        Parameters
+        ----------
+
+        path : str
+            directory the recorder wrote to
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as fp:
+            self.meta = json.load(fp)
+        self.populations = list(self.meta['populations'])
+        self.index = {}
+        self.data = {}
+        for p in self.populations:
+            self.index[p] = self._memmap(p, 'index', INDEX_DTYPE)
+            info = self.meta['populations'][p]
+            self.data[p] = dict(
+                (c, self._memmap(p, c, np.dtype(info['dtypes'][c])))
+                for c in info['columns'] if c in info['dtypes'])
+
+    def _memmap(self, p, column, dtype):
+        file = os.path.join(self.path, p, f'{column}.bin')
+        if os.path.getsize(file) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(file, dtype=dtype, mode='r')
+
+    def __len__(self):
+        "number of snapshots, of the first population"
+        return len(self.index[self.populations[0]])
+
+    def times(self, p):
+        "function to get the snapshot times of a population"
+        return np.asarray(self.index[p]['time'])
+
+    def frame(self, p, i, columns=None):
+        """ function to get one snapshot of a population
+
+        Parameters
+        ----------
+
+        p : str
+            population name
+
+        i : int
+            snapshot number
+
+        columns : list of str or None
+            columns to read, all if None
+
+        Returns
+        -------
+
+        frame : dict
+            column names with arrays of the individuals at that time
+        """
+        _, offset, count = self.index[p][i]
+        if columns is None:
+            columns = list(self.data[p])
+        return dict((c, np.asarray(self.data[p][c][offset:offset + count]))
+                    for c in columns)
+
+    def at(self, p, time, columns=None):
+        """ function to get the last snapshot of a population at or before
+        a time, see frame()"""
+        i = np.searchsorted(self.times(p), time, side='right') - 1
+        return self.frame(p, max(i, 0), columns)
+
+    def decode(self, p, column, codes):
+        "function to get category names of an integer coded column"
+        names = self.meta['populations'][p]['categories'][column]
+        return np.array(names, dtype=object)[np.asarray(codes, dtype=int)]
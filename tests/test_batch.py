@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+
+import datatable as dt
+import numpy as np
+
+from iebm.events.infection import InfectionSIREvent
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.traits.categorical_trait import CategoricalTrait
+from iebm.traits.static_trait import StaticTrait
+
+
+def sir(batch_window, runtime=20, seed=4):
+    """ helper function to run a small SIR of moving individuals from one
+    seed, without the reseeding from entropy of the engine. every contact
+    is seen by both individuals at the same time
+
+    Returns
+    -------
+
+    sim : Simulation
+
+    steps : int
+        number of steps, batches count once
+    """
+    np.random.seed(seed)
+    with mock.patch.object(np.random, 'seed'):
+        pop = Population2D(name='pop', init_size=150, xdim=40, ydim=40)
+        pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 1.}),
+                        (StaticTrait, {'name' : 'interact_radius', 'value' : 1.}),
+                        (StaticTrait, {'name' : 'velocity', 'value' : 0.5}),
+                        (CategoricalTrait, {'name' : 'infection',
+                                            'categories' : ['susceptible',
+                                                            'infected',
+                                                            'recovered'],
+                                            'fractions' : [0.8, 0.2, 0],
+                                            'track' : True}),
+                        (StaticTrait, {'name' : 'recovery_rate', 'value' : 0.05})])
+        pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                     'current_time' : 0, 'bounce' : 'random'}),
+                        (Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                           'current_time' : 0}),
+                        (InfectionSIREvent, {'name' : 'infection',
+                                             'is_primary' : False,
+                                             'current_time' : 0})])
+        pop.event_dict['wall'].triggers = pop.event_dict['interact'].set_next
+        pop.event_dict['interact'].triggers = pop.event_dict['infection'].handle
+        sim = Simulation({'pop' : pop}, batch_window=batch_window)
+        infected = pop.trait_dict['infection'].code('infected')
+        for i in pop.df[dt.f.infection == infected, 'id'].to_numpy().reshape(-1):
+            params = dict(actor_id=i, current_time=0)
+            sim.schedule(pop.event_dict['infection'].set_next(params)[0])
+        steps = 0
+        while sim.time < runtime and len(sim.scheduler) > 0:
+            sim.step()
+            steps += 1
+    return sim, steps
+
+
+class TestBatch(unittest.TestCase):
+    """ a batch window of 0 only groups events of the same time, the run
+    is the same as without batches """
+
+    def test_window_zero(self):
+        sim, steps = sir(None)
+        batched, batched_steps = sir(0)
+        # contacts of both individuals came in one batch
+        self.assertLess(batched_steps, steps)
+        self.assertEqual(batched.handled, sim.handled)
+        self.assertEqual(batched.time, sim.time)
+        pop, batched_pop = sim.population_dict['pop'], batched.population_dict['pop']
+        for c in ('id', 'x', 'y', 'infection', 'interact_time'):
+            np.testing.assert_array_equal(batched_pop.df[:, c].to_numpy(),
+                                          pop.df[:, c].to_numpy())
+        # history is stored once per batch, the last entries are the same
+        last = sim.get_results()['trait'][('pop', 'infection')][-1]
+        batched_last = batched.get_results()['trait'][('pop', 'infection')][-1]
+        self.assertEqual([v.tolist() for v in last],
+                         [v.tolist() for v in batched_last])
+        self.assertIn('recovered', last[0].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from iebm.populations.population2D import Population2D
+from iebm.traits.categorical_trait import CategoricalTrait
+
+
+class TestTrackValues(unittest.TestCase):
+    """ tracked categories keep the format of other traits, the counts
+    follow set_code() and direct writes after recount() """
+
+    def setUp(self):
+        np.random.seed(0)
+        self.pop = Population2D(name='pop', init_size=100, xdim=10, ydim=10)
+        self.pop.add_traits([(CategoricalTrait, {'name' : 'infection',
+                                                 'categories' : ['susceptible',
+                                                                 'infected',
+                                                                 'recovered'],
+                                                 'fractions' : [0.9, 0.1, 0]})])
+        self.trait = self.pop.trait_dict['infection']
+
+    def test_present_categories_by_name(self):
+        names, counts = self.trait.track_values()
+        self.assertEqual(list(names), ['infected', 'susceptible'])
+        self.assertEqual(counts.sum(), self.pop.size)
+
+    def test_set_code(self):
+        recovered = self.trait.code('recovered')
+        for i in range(10):
+            self.trait.set_code(i, recovered)
+        tracked = dict(zip(*self.trait.track_values()))
+        self.assertEqual(tracked['recovered'], 10)
+        counts = self.trait.counts.copy()
+        np.testing.assert_array_equal(self.trait.recount(), counts)
+
+    def test_direct_write(self):
+        self.pop.df[0:50, 'infection'] = self.trait.code('recovered')
+        self.trait.recount()
+        names, counts = self.trait.track_values()
+        tracked = dict(zip(names, counts))
+        self.assertEqual(tracked['recovered'], 50)
+        self.assertEqual(sum(tracked.values()), self.pop.size)
+        self.assertEqual(self.trait.counts[self.trait.code('recovered')], 50)
+
+
+class TestInherit(unittest.TestCase):
+    """ offspring inherit the parent code, values are names """
+
+    def test_inherit(self):
+        np.random.seed(0)
+        pop = Population2D(name='pop', init_size=10, xdim=10, ydim=10)
+        pop.add_traits([(CategoricalTrait, {'name' : 'status',
+                                            'categories' : ['a', 'b'],
+                                            'fractions' : [0.5, 0.5]})])
+        trait = pop.trait_dict['status']
+        parent_id = pop.df[0, 'id']
+        name = trait.get_value(parent_id)
+        self.assertEqual(trait.inherit_value(parent_id), name)
+        self.assertEqual(trait.inherit_code(parent_id), trait.code(name))
+        codes = trait.inherit_values(parent_id, 3)
+        self.assertEqual(codes.dtype, trait.table.dtype)
+        self.assertEqual(codes.tolist(), [trait.code(name)] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
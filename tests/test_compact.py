@@ -0,0 +1,75 @@
+import unittest
+
+import datatable as dt
+import numpy as np
+
+from iebm.events.birth import BirthEvent
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.traits.static_trait import StaticTrait
+
+
+def build(dtypes, size=20):
+    "helper function to build a moving, interacting and breeding population"
+    np.random.seed(6)
+    pop = Population2D(name='pop', init_size=size, xdim=20, ydim=20,
+                       dtypes=dtypes)
+    pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 0.5}),
+                    (StaticTrait, {'name' : 'interact_radius', 'value' : 0.5}),
+                    (StaticTrait, {'name' : 'velocity', 'value' : 1.}),
+                    (StaticTrait, {'name' : 'birth_rate', 'value' : 0.1})])
+    pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                 'current_time' : 0, 'bounce' : 'random'}),
+                    (Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                       'current_time' : 0}),
+                    (BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                  'current_time' : 0})])
+    return pop
+
+
+class TestCompact(unittest.TestCase):
+    """ compact populations keep float32 and int32 columns, with float64
+    event times """
+
+    def check_types(self, pop):
+        types = dict(zip(pop.df.names, pop.df.stypes))
+        for c, stype in types.items():
+            if c.endswith('_time'):
+                self.assertEqual(stype, dt.stype.float64, c)
+            elif c == 'id' or c.endswith('_extra'):
+                self.assertEqual(stype, dt.stype.int32, c)
+            elif c in ('x', 'y', 'vel_x', 'vel_y', 'angle', 'radius', 'velocity'):
+                self.assertEqual(stype, dt.stype.float32, c)
+
+    def test_types(self):
+        pop = build('compact')
+        self.check_types(pop)
+        pop.conform()
+        self.check_types(pop)
+        # new rows and moves keep the types
+        pop.event_dict['birth'].handle(dict(actor_id=0, current_time=1.))
+        pop.update(0.5)
+        self.assertEqual(pop.size, 21)
+        self.check_types(pop)
+        self.assertEqual(pop.df[:, 'interact_time'].stypes[0], dt.stype.float64)
+
+    def test_default(self):
+        pop = build('default')
+        pop.conform()
+        self.assertEqual(pop.df[:, ['x', 'velocity', 'interact_time']].stypes,
+                         (dt.stype.float64,) * 3)
+        self.assertEqual(pop.df[:, 'id'].stypes[0], dt.stype.int64)
+
+    def test_id_overflow(self):
+        pop = build('compact')
+        # ids past the int32 range are stored as int64
+        pop.id_count = np.iinfo(np.int32).max
+        pop.event_dict['birth'].handle(dict(actor_id=0, current_time=1.))
+        self.assertEqual(pop.df[:, 'id'].stypes[0], dt.stype.int64)
+        self.assertEqual(pop.df[-1, 'id'], np.iinfo(np.int32).max)
+        self.assertEqual(pop.df[:, 'x'].stypes[0], dt.stype.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
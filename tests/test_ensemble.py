@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from iebm.ensemble import Ensemble
+from iebm.events.birth import BirthEvent
+from iebm.events.death import DeathEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.traits.static_trait import StaticTrait
+
+
+def ensemble(replicates, seed):
+    "helper function to build the logistic model of the tests as an Ensemble"
+    ens = Ensemble(replicates=replicates, xdim=50, ydim=50, seed=seed)
+    ens.add_population('pop', init_size=20, birth_rate=0.2, death_rate=0.05,
+                       implicit_capacity=100)
+    return ens
+
+
+def simulation():
+    "helper function to build the same logistic model as a Simulation"
+    pop = Population2D(name='pop', init_size=20, implicit_capacity=100,
+                       xdim=50, ydim=50)
+    pop.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : 0.2}),
+                    (StaticTrait, {'name' : 'death_rate', 'value' : 0.05})])
+    pop.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                  'current_time' : 0}),
+                    (DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                  'current_time' : 0})])
+    return Simulation({'pop' : pop}, keep_history=False)
+
+
+class TestEnsemble(unittest.TestCase):
+    """ replicates of an Ensemble follow the same model as Simulation, with
+    their own random numbers """
+
+    def test_own_random_state(self):
+        np.random.seed(0)
+        state = np.random.get_state()[1].copy()
+        first = ensemble(5, seed=1)
+        first.run(10, progress_bar=False)
+        np.testing.assert_array_equal(np.random.get_state()[1], state)
+        second = ensemble(5, seed=1)
+        second.run(10, progress_bar=False)
+        self.assertEqual(first.get_results(), second.get_results())
+
+    def test_same_mean_as_simulation(self):
+        runtime = 30
+        ens = ensemble(200, seed=2)
+        ens.run(runtime, progress_bar=False)
+        ens_sizes = np.array([r['size']['pop'][-1] for r in ens.get_results()])
+        sim_sizes = []
+        for _ in range(20):
+            sim = simulation()
+            sim.run(runtime, progress_bar=False)
+            sim_sizes.append(sim.population_dict['pop'].size)
+        sim_sizes = np.array(sim_sizes)
+        # near the equilibrium 100 * (1 - 0.05 / 0.2)
+        error = np.hypot(ens_sizes.std() / np.sqrt(len(ens_sizes)),
+                         sim_sizes.std() / np.sqrt(len(sim_sizes)))
+        self.assertLess(abs(ens_sizes.mean() - sim_sizes.mean()), 4.5 * error)
+        self.assertLess(abs(ens_sizes.mean() - 75), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
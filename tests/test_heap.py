@@ -0,0 +1,95 @@
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from iebm.simulation import Simulation
+from tests.test_spec import wired
+from tests.test_suspend import dying
+
+
+def pausing(compact_every=None, steps=200):
+    """ helper function to run a dying population where individuals are
+    suspended and resumed all the time, leaving cancelled heap entries.
+    returns the handled records and the heap stats around compactions """
+    choice = random.Random(0)
+    handled, stats = [], []
+    # without the reseeding from entropy of the engine, see test_spec
+    np.random.seed(2)
+    with mock.patch.object(np.random, 'seed'):
+        pop = dying(300)
+        sim = Simulation({'pop' : pop}, keep_history=False)
+    # the same steps after every handled event, skipped entries left out
+    while len(handled) < steps:
+        record = sim.scheduler.peek()
+        lapse, _ = sim.step()
+        if lapse is None:
+            continue
+        handled.append(record)
+        n = len(handled)
+        if compact_every and n % compact_every == 0:
+            before = sim.heap_stats()
+            sim.compact_heap()
+            stats.append((before, sim.heap_stats()))
+        if n % 3 == 0:
+            ids = pop.df[:, 'id'].to_numpy().reshape(-1)
+            if pop.dead_count > 0:
+                ids = ids[pop.alive_mask()]
+            ids = [i for i in ids.tolist() if i not in pop.suspended]
+            pop.suspend(choice.choice(ids), sim.time, ['death_time'])
+        if n % 3 == 1 and len(pop.suspended) > 0:
+            actor_id = choice.choice(sorted(pop.suspended))
+            for new_event in pop.resume(actor_id, sim.time):
+                if len(new_event) > 0:
+                    sim.schedule(new_event)
+    return handled, stats
+
+
+class TestCompaction(unittest.TestCase):
+    """ compacting the heap only removes entries that would be skipped or
+    handled without effect """
+
+    def check_stats(self, stats):
+        self.assertGreater(sum(b['stale'] for b, _ in stats), 0)
+        for before, after in stats:
+            self.assertEqual(after['stale'], 0)
+            self.assertEqual(after['live'], before['live'])
+            self.assertEqual(after['size'], before['live'])
+            self.assertEqual(after['purged'] - before['purged'], before['stale'])
+
+    def test_cancelled_identical(self):
+        # cancelled entries are skipped without moving anything, the runs
+        # handle the same records to the last digit
+        handled, _ = pausing()
+        compacted, stats = pausing(compact_every=20)
+        self.check_stats(stats)
+        self.assertEqual(compacted, handled)
+
+    def test_predation(self):
+        # entries of eaten prey are handled without effect, but still move
+        # the populations. event times can differ in the last digits
+        runs = []
+        for compact_every in (None, 25):
+            np.random.seed(3)
+            with mock.patch.object(np.random, 'seed'):
+                sim = wired()
+                stats = []
+                n = 0
+                while sim.time < 20 and len(sim.scheduler) > 0:
+                    if compact_every and n % compact_every == 0:
+                        before = sim.heap_stats()
+                        sim.compact_heap()
+                        stats.append((before, sim.heap_stats()))
+                    sim.step()
+                    n += 1
+            runs.append(sim)
+        self.check_stats(stats)
+        whole, compacted = runs
+        self.assertEqual([p.size for p in whole.population_dict.values()],
+                         [p.size for p in compacted.population_dict.values()])
+        self.assertLess(compacted.heap_stats()['size'], whole.heap_stats()['size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
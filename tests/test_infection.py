@@ -0,0 +1,114 @@
+import unittest
+
+import numpy as np
+
+from iebm.events.infection import CompartmentalInfectionEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.traits.categorical_trait import CategoricalTrait
+from iebm.traits.static_trait import StaticTrait
+
+
+def compartmental(model, fractions, size=200, waning=0):
+    """ helper function to build a population with a compartmental
+    infection event, every period has rate 1. the trigger records the
+    transitions as (actor_id, compartment) """
+    np.random.seed(1)
+    pop = Population2D(name='pop', init_size=size, xdim=10, ydim=10)
+    names = CompartmentalInfectionEvent.compartments(model)
+    pop.add_traits([(CategoricalTrait, {'name' : 'infection',
+                                        'categories' : names,
+                                        'fractions' : fractions}),
+                    (StaticTrait, {'name' : 'latent_rate', 'value' : 1}),
+                    (StaticTrait, {'name' : 'recovery_rate', 'value' : 1}),
+                    (StaticTrait, {'name' : 'waning_rate', 'value' : waning})])
+    pop.add_events([(CompartmentalInfectionEvent, {'name' : 'infection',
+                                                   'model' : model,
+                                                   'is_primary' : False,
+                                                   'current_time' : 0})])
+    event = pop.event_dict['infection']
+    transitions = []
+
+    def record(params):
+        name = event.trait.get_value(params['actor_id'])
+        transitions.append((params['actor_id'], name))
+        return []
+
+    event.triggers = record
+    return Simulation({'pop' : pop}), event, transitions
+
+
+def run(sim, runtime):
+    "helper function to run until the runtime or until no event is left"
+    while sim.time < runtime and len(sim.scheduler) > 0:
+        sim.step()
+
+
+class TestCompartmental(unittest.TestCase):
+    """ period timers move individuals along the compartments of the
+    model, with counters that match the column """
+
+    def check_counts(self, event):
+        counts = event.trait.counts.copy()
+        np.testing.assert_array_equal(event.trait.recount(), counts)
+
+    def test_one_clock_event(self):
+        sim, event, transitions = compartmental('SIR', [0.5, 0.5, 0])
+        # one timer per infected, only the earliest in the simulation heap
+        self.assertEqual(len(event.timers), 100)
+        self.assertEqual(len(sim.scheduler), 1)
+        self.assertEqual(sim.scheduler.peek()[0], event.timers[0][0])
+
+    def test_sir(self):
+        sim, event, transitions = compartmental('SIR', [0.5, 0.5, 0])
+        run(sim, 50)
+        # every infected recovered once, and stays recovered
+        self.assertEqual(len(transitions), 100)
+        self.assertEqual(set(n for _, n in transitions), {'recovered'})
+        self.assertEqual(event.counts(), {'susceptible' : 100,
+                                          'infected' : 0,
+                                          'recovered' : 100})
+        self.check_counts(event)
+
+    def test_seir(self):
+        sim, event, transitions = compartmental('SEIR', [0.5, 0.5, 0, 0])
+        run(sim, 50)
+        # exposed become infected, then recovered, in that order
+        for actor_id in set(i for i, _ in transitions):
+            steps = [n for i, n in transitions if i == actor_id]
+            self.assertEqual(steps, ['infected', 'recovered'])
+        self.assertEqual(len(transitions), 200)
+        self.assertEqual(event.counts()['recovered'], 100)
+        self.check_counts(event)
+
+    def test_sirs(self):
+        sim, event, transitions = compartmental('SIRS', [0, 1, 0], waning=1)
+        run(sim, 5)
+        # recovered lose their immunity again
+        names = [n for _, n in transitions]
+        self.assertIn('susceptible', names)
+        for actor_id in set(i for i, _ in transitions):
+            steps = [n for i, n in transitions if i == actor_id]
+            self.assertEqual(steps, ['recovered', 'susceptible'][:len(steps)])
+        self.check_counts(event)
+
+    def test_contact(self):
+        sim, event, transitions = compartmental('SEIR', [0.5, 0, 0.5, 0])
+        df = event.population.df
+        codes = df[:, 'infection'].to_numpy().reshape(-1)
+        ids = df[:, 'id'].to_numpy().reshape(-1)
+        s = ids[codes == event.susceptible][0]
+        i = ids[codes == event.infected[0]][0]
+        new_events = event.handle(dict(actor_id=s, extra=i, current_time=0))
+        self.assertEqual(event.trait.get_value(s), 'exposed')
+        self.assertEqual(event.counts()['exposed'], 1)
+        # the clock was already scheduled, unless the new timer is earlier
+        self.assertLessEqual(len(new_events), 1)
+        # a second contact does nothing
+        self.assertEqual(event.handle(dict(actor_id=s, extra=i,
+                                           current_time=0)), [])
+        self.check_counts(event)
+
+
+if __name__ == '__main__':
+    unittest.main()
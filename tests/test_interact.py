@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.traits.static_trait import StaticTrait
+
+
+def recorded(pop, contacts):
+    "helper function to record contacts as (time, actor_id, partner_id)"
+    event = pop.event_dict['interact']
+
+    def record(params):
+        contacts.append((params['current_time'], params['actor_id'],
+                         params['extra']))
+        return []
+
+    event.triggers = record
+
+
+def crowd(pairs=False, runtime=10):
+    """ helper function to run 30 individuals bouncing off the walls from
+    one seed, without the reseeding from entropy of the engine. returns
+    the recorded contacts and the simulation """
+    np.random.seed(2)
+    with mock.patch.object(np.random, 'seed'):
+        pop = Population2D(name='pop', init_size=30, xdim=10, ydim=10)
+        pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 0.5}),
+                        (StaticTrait, {'name' : 'interact_radius', 'value' : 0.5}),
+                        (StaticTrait, {'name' : 'velocity', 'value' : 1.})])
+        pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                     'current_time' : 0, 'bounce' : 'random'}),
+                        (Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                           'current_time' : 0, 'pairs' : pairs})])
+        pop.event_dict['wall'].triggers = pop.event_dict['interact'].set_next
+        contacts = []
+        recorded(pop, contacts)
+        sim = Simulation({'pop' : pop}, keep_history=False)
+        steps = 0
+        while sim.time < runtime and len(sim.scheduler) > 0 and steps < 5000:
+            sim.step()
+            steps += 1
+    return contacts, sim
+
+
+def pair(dtypes='default', pairs=False):
+    """ helper function to build two individuals moving along x, the first
+    one catching up with the second. every contact is recorded as
+    (time, actor_id, partner_id) """
+    np.random.seed(8)
+    pop = Population2D(name='pop', init_size=2, xdim=20, ydim=20, dtypes=dtypes)
+    pop.add_traits([(StaticTrait, {'name' : 'interact_radius', 'value' : 0.5})])
+    df = pop.df
+    df['x'] = np.array([2., 5.])
+    df['y'] = np.array([10., 10.])
+    df['vel_x'] = np.array([1., 0.25])
+    df['vel_y'] = np.array([0., 0.])
+    pop.conform()
+    pop.add_events([(Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                       'current_time' : 0, 'pairs' : pairs})])
+    contacts = []
+    recorded(pop, contacts)
+    return Simulation({'pop' : pop}, keep_history=False), contacts
+
+
+class TestContact(unittest.TestCase):
+    """ a pair moving in straight lines meets once, not again while it
+    still touches. every individual sees the contact, the pair is only
+    handled once in pairs mode """
+
+    def test_once(self):
+        for dtypes in ('default', 'compact'):
+            sim, contacts = pair(dtypes)
+            while sim.time < 10 and len(sim.scheduler) > 0:
+                sim.step()
+            # they touch when 1 apart, after 2 / 0.75
+            # one contact seen by each of them, when 1 apart after 2 / 0.75
+            self.assertEqual(sorted(c[1] for c in contacts), [0, 1], dtypes)
+            for time, _, _ in contacts:
+                self.assertAlmostEqual(time, 2 / 0.75, places=5)
+
+    def test_no_repeat(self):
+        # pairs that just met touch within rounding, the same contact was
+        # found again a few steps later, up to forever
+        contacts, sim = crowd()
+        self.assertGreaterEqual(sim.time, 10)
+        last = {}
+        for time, actor_id, partner_id in contacts:
+            key = (actor_id, partner_id)
+            if key in last:
+                self.assertGreater(time - last[key], 1e-6)
+            last[key] = time
+
+    def test_pair_once(self):
+        sim, contacts = pair(pairs=True)
+        while sim.time < 10 and len(sim.scheduler) > 0:
+            sim.step()
+        self.assertEqual(len(contacts), 1)
+        self.assertAlmostEqual(contacts[0][0], 2 / 0.75, places=5)
+
+    def test_pairs(self):
+        # the contacts seen from both sides without pairs, handled once
+        def met(contacts):
+            return [(round(t, 6), min(a, b), max(a, b)) for t, a, b in contacts]
+
+        contacts, _ = crowd()
+        pair_contacts, sim = crowd(pairs=True)
+        self.assertGreaterEqual(sim.time, 10)
+        self.assertEqual(len(set(met(pair_contacts))), len(pair_contacts))
+        self.assertTrue(set(met(pair_contacts)) <= set(met(contacts)))
+        # a few contacts are only seen by one side without pairs, if the
+        # other one turned right before
+        self.assertGreater(len(pair_contacts), 0.95 * len(set(met(contacts))))
+        self.assertLess(len(pair_contacts), 0.75 * len(contacts))
+
+if __name__ == '__main__':
+    unittest.main()
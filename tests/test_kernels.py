@@ -0,0 +1,30 @@
+import unittest
+
+from iebm import kernels
+
+
+class TestBackends(unittest.TestCase):
+    """ the loop kernels give exactly the same times and rows as the NumPy
+    kernels, uncompiled and, if installed, with numba """
+
+    def test_python_loops(self):
+        for seed in range(8):
+            with self.subTest(seed=seed):
+                self.assertTrue(kernels.check_backends(size=200, seed=seed,
+                                                       backend='python'))
+
+    @unittest.skipIf(kernels.numba is None, 'numba is not installed')
+    def test_numba_loops(self):
+        for seed in range(8):
+            with self.subTest(seed=seed):
+                self.assertTrue(kernels.check_backends(size=200, seed=seed,
+                                                       backend='numba'))
+
+    def test_backend_is_restored(self):
+        before = kernels.BACKEND
+        kernels.check_backends(size=20, backend='python')
+        self.assertEqual(kernels.BACKEND, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from tests.test_suspend import dying
+
+
+def moving(size=10):
+    "helper function to build a population moving straight, without events"
+    np.random.seed(9)
+    pop = Population2D(name='moving', init_size=size, xdim=1000, ydim=1000)
+    angle = np.random.rand(size) * 2 * np.pi
+    pop.df['vel_x'] = np.cos(angle) * 0.5
+    pop.df['vel_y'] = np.sin(angle) * 0.5
+    return pop
+
+
+class TestLazy(unittest.TestCase):
+    """ populations add up the lapses of events, and move once when their
+    dataframe is used """
+
+    def test_move_once(self):
+        pop = moving()
+        x, vx = pop.df[:, ['x', 'vel_x']].to_numpy().T
+        with mock.patch.object(pop, 'advance', wraps=pop.advance) as advance:
+            pop.update(0.5)
+            pop.update(0.25)
+            self.assertEqual(advance.call_count, 0)
+            self.assertEqual(pop.pending, 0.75)
+            moved = pop.df[:, 'x'].to_numpy().reshape(-1)
+            pop.df[:, 'y']
+            self.assertEqual(advance.call_count, 1)
+        self.assertEqual(pop.pending, 0)
+        np.testing.assert_allclose(moved, x + vx * 0.75)
+
+    def test_untouched_population(self):
+        # events of one population do not move the other one
+        pop, other = dying(50), moving()
+        x, vx = other.df[:, ['x', 'vel_x']].to_numpy().T
+        sim = Simulation({'pop' : pop, 'moving' : other}, keep_history=False)
+        with mock.patch.object(other, 'advance', wraps=other.advance) as advance:
+            for _ in range(20):
+                sim.step()
+            self.assertEqual(advance.call_count, 0)
+            self.assertAlmostEqual(other.pending, sim.time)
+            np.testing.assert_allclose(other.df[:, 'x'].to_numpy().reshape(-1),
+                                       x + vx * sim.time)
+            self.assertEqual(advance.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import math
+import random
+import unittest
+
+from iebm.schedulers import Scheduler, HeapScheduler, CalendarQueue
+
+
+class TestCalendarQueue(unittest.TestCase):
+    """ the calendar queue hands out records in the same order as the heap,
+    whatever the mix of push, peek and pop """
+
+    def test_push_after_peek(self):
+        queue = CalendarQueue()
+        queue.push((150., 0, 0, 0, 0, None))
+        self.assertEqual(queue.peek()[0], 150.)
+        # the peek must not skip the buckets of an earlier record
+        queue.push((3., 1, 0, 0, 0, None))
+        self.assertEqual(queue.pop()[0], 3.)
+        self.assertEqual(queue.pop()[0], 150.)
+
+    def test_random_operations(self):
+        rng = random.Random(11)
+        for case in range(20):
+            heap, queue = HeapScheduler(), CalendarQueue(buckets=4)
+            now = 0.
+            for i in range(2000):
+                op = rng.random()
+                if op < 0.5 or len(heap) == 0:
+                    # mostly later records, some earlier than the last pop
+                    t = now + rng.expovariate(1.) * rng.choice([0.01, 1, 100])
+                    if rng.random() < 0.05:
+                        t = rng.uniform(0, now)
+                    elif rng.random() < 0.02:
+                        t = math.inf
+                    record = (t, i, rng.randrange(3), i, -1, None)
+                    heap.push(record)
+                    queue.push(record)
+                elif op < 0.7:
+                    self.assertEqual(queue.peek(), heap.peek())
+                else:
+                    record = heap.pop()
+                    self.assertEqual(queue.pop(), record)
+                    if record[0] != math.inf:
+                        now = record[0]
+                self.assertEqual(len(queue), len(heap))
+            self.assertEqual([queue.pop() for _ in range(len(queue))],
+                             [heap.pop() for _ in range(len(heap))])
+
+    def test_rebuild(self):
+        records = [(float(t), t, 0, t, -1, None) for t in range(50, 0, -1)]
+        queue = CalendarQueue()
+        queue.rebuild(records + [(math.inf, 0, 0, 0, -1, None)])
+        self.assertEqual([queue.pop()[0] for _ in range(len(queue))],
+                         [float(t) for t in range(1, 51)] + [math.inf])
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Scheduler()
+
+
+if __name__ == '__main__':
+    unittest.main()
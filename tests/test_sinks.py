@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from iebm.sinks import ResultSink, NPZSink, ParquetSink, ArrowSink
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def write_results(sink):
+    """ helper function to write a few rows of sizes and traits, over more
+    than one chunk, with a numeric and a categorical trait """
+    sink.open(['prey', 'pred'])
+    for i in range(5):
+        traits = {('pred', 'radius') : ([1.0, 1.5], [3, i]),
+                  ('prey', 'infection') : (np.array(['s', 'i']), [10 - i, i])}
+        sink.write(float(i), [100 + i, 20 - i], traits)
+    sink.close()
+
+
+class RoundTrip():
+    """ results read back are the ones written, for every sink """
+
+    sink = None
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as path:
+            write_results(self.sink(path, chunk_size=3))
+            sizes, traits = self.sink.read(path)
+
+        self.assertEqual(sizes[:, 'time'].to_list()[0], [0., 1., 2., 3., 4.])
+        self.assertEqual(sizes[:, 'prey'].to_list()[0], [100, 101, 102, 103, 104])
+        self.assertEqual(sizes[:, 'pred'].to_list()[0], [20, 19, 18, 17, 16])
+
+        self.assertEqual(traits.nrows, 20)
+        rows = list(zip(*traits[:, ['time', 'population', 'trait', 'label',
+                                    'count']].to_list()))
+        self.assertIn((4., 'prey', 'infection', 'i', 4), rows)
+        self.assertIn((2., 'pred', 'radius', '', 2), rows)
+        # NaN values of categorical traits are missing in datatable
+        values = dict(zip(traits[:, 'label'].to_list()[0],
+                          traits[:, 'value'].to_list()[0]))
+        self.assertIn(values[''], [1.0, 1.5])
+        self.assertIsNone(values['s'])
+
+
+class TestNPZSink(RoundTrip, unittest.TestCase):
+    sink = NPZSink
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestParquetSink(RoundTrip, unittest.TestCase):
+    sink = ParquetSink
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestArrowSink(RoundTrip, unittest.TestCase):
+    sink = ArrowSink
+
+
+class TestResultSink(unittest.TestCase):
+
+    def test_abstract(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(TypeError):
+                ResultSink(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
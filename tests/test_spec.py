@@ -0,0 +1,159 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from iebm.events.birth import BirthEvent
+from iebm.events.death import DeathEvent
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.spec import ModelSpec
+from iebm.traits.linked_trait import LinkedTrait
+from iebm.traits.static_trait import StaticTrait
+
+
+R, D, VEL = 0.1, 0.1, np.pi / 16
+
+SPEC = {
+    'constants' : {'r' : R, 'd' : D, 'a' : 1, 'radius' : 1},
+    'populations' : {
+        'prey' : {'init_size' : 60, 'xdim' : 30, 'ydim' : 30,
+                  'traits' : [['StaticTrait', {'name' : 'birth_rate',
+                                               'value' : {'expr' : 'r'}}],
+                              ['StaticTrait', {'name' : 'radius',
+                                               'value' : {'expr' : 'radius'}}],
+                              ['LinkedTrait', {'name' : 'predation_radius',
+                                               'link_trait' : 'radius',
+                                               'link_func' : 'x'}],
+                              ['StaticTrait', {'name' : 'velocity',
+                                               'value' : {'expr' : 'a * np.pi / (8 * 2 * radius)'}}]],
+                  'events' : [['BirthEvent', {'name' : 'birth', 'is_primary' : True}],
+                              ['WallEvent', {'name' : 'wall', 'is_primary' : True,
+                                             'bounce' : 'random'}],
+                              ['DeathEvent', {'name' : 'death', 'is_primary' : False}]]},
+        'pred' : {'init_size' : 30, 'xdim' : 30, 'ydim' : 30,
+                  'traits' : [['StaticTrait', {'name' : 'radius',
+                                               'value' : {'expr' : 'radius'}}],
+                              ['LinkedTrait', {'name' : 'predation_radius',
+                                               'link_trait' : 'radius',
+                                               'link_func' : 'x'}],
+                              ['StaticTrait', {'name' : 'velocity',
+                                               'value' : {'expr' : 'a * np.pi / (8 * 2 * radius)'}}],
+                              ['StaticTrait', {'name' : 'death_rate',
+                                               'value' : {'expr' : 'd'}}]],
+                  'events' : [['DeathEvent', {'name' : 'death', 'is_primary' : True}],
+                              ['WallEvent', {'name' : 'wall', 'is_primary' : True,
+                                             'bounce' : 'random'}],
+                              ['Interact2DEvent', {'name' : 'predation',
+                                                   'is_primary' : True,
+                                                   'other' : 'prey'}],
+                              ['BirthEvent', {'name' : 'birth', 'is_primary' : False}]]}},
+    'triggers' : {'prey.birth' : ['pred.predation.set_other_next'],
+                  'prey.wall' : ['pred.predation.set_other_next'],
+                  'pred.wall' : ['pred.predation.set_next'],
+                  'pred.predation' : ['prey.death.handle(extra)',
+                                      'pred.birth.handle']}}
+
+
+def wired():
+    "helper function to build the model of SPEC by hand, like the notebooks"
+    prey = Population2D(name='prey', init_size=60, xdim=30, ydim=30)
+    pred = Population2D(name='pred', init_size=30, xdim=30, ydim=30)
+    prey.add_traits([(StaticTrait, {'name' : 'birth_rate', 'value' : R}),
+                     (StaticTrait, {'name' : 'radius', 'value' : 1}),
+                     (LinkedTrait, {'name' : 'predation_radius',
+                                    'link_trait' : 'radius',
+                                    'link_func' : lambda x : x}),
+                     (StaticTrait, {'name' : 'velocity', 'value' : VEL})])
+    prey.add_events([(BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                  'bounce' : 'random', 'current_time' : 0}),
+                     (DeathEvent, {'name' : 'death', 'is_primary' : False,
+                                   'current_time' : 0})])
+    pred.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 1}),
+                     (LinkedTrait, {'name' : 'predation_radius',
+                                    'link_trait' : 'radius',
+                                    'link_func' : lambda x : x}),
+                     (StaticTrait, {'name' : 'velocity', 'value' : VEL}),
+                     (StaticTrait, {'name' : 'death_rate', 'value' : D})])
+    pred.add_events([(DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                   'current_time' : 0}),
+                     (WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                  'bounce' : 'random', 'current_time' : 0}),
+                     (Interact2DEvent, {'name' : 'predation',
+                                        'is_primary' : True,
+                                        'current_time' : 0, 'other' : prey}),
+                     (BirthEvent, {'name' : 'birth', 'is_primary' : False,
+                                   'current_time' : 0})])
+
+    def predation_trigger(params):
+        other_params = params.copy()
+        other_params['actor_id'] = other_params['extra']
+        events = prey.event_dict['death'].handle(other_params)
+        events += pred.event_dict['birth'].handle(params)
+        return events
+
+    prey.event_dict['birth'].triggers = pred.event_dict['predation'].set_other_next
+    prey.event_dict['wall'].triggers = pred.event_dict['predation'].set_other_next
+    pred.event_dict['wall'].triggers = pred.event_dict['predation'].set_next
+    pred.event_dict['predation'].triggers = predation_trigger
+    return Simulation({'prey' : prey, 'pred' : pred})
+
+
+def seeded_run(build, seed=3, runtime=20):
+    """ helper function to build and run a simulation from one seed. the
+    engine reseeds numpy from entropy when events and simulations are
+    created, that is turned off for the run """
+    np.random.seed(seed)
+    with mock.patch.object(np.random, 'seed'):
+        sim = build()
+        while sim.time < runtime and len(sim.scheduler) > 0:
+            sim.step()
+    return sim.time, sim.population_history
+
+
+class TestModelSpec(unittest.TestCase):
+    """ specs survive pickle and JSON, and build the same model as the
+    hand-wired version """
+
+    def test_round_trips(self):
+        spec = ModelSpec(SPEC)
+        again = pickle.loads(pickle.dumps(spec))
+        self.assertEqual(again.to_dict(), SPEC)
+        self.assertEqual(again.plan, spec.plan)
+        with tempfile.TemporaryDirectory() as path:
+            fn = os.path.join(path, 'spec.json')
+            spec.to_json(fn)
+            with open(fn) as fp:
+                self.assertEqual(json.load(fp), SPEC)
+            self.assertEqual(ModelSpec.from_json(fn).to_dict(), SPEC)
+        # built populations pickle too, functions included
+        population_dict = pickle.loads(pickle.dumps(spec.build_populations()))
+        self.assertEqual(population_dict['pred'].trait_dict['predation_radius'].link_func(2), 2)
+
+    def test_same_run_as_wired(self):
+        spec = ModelSpec(SPEC)
+        time, history = seeded_run(spec.build)
+        wired_time, wired_history = seeded_run(wired)
+        self.assertEqual(time, wired_time)
+        self.assertEqual([list(history[p]) for p in history],
+                         [list(wired_history[p]) for p in wired_history])
+        # the run did something
+        self.assertGreater(len(history[list(history)[0]]), 20)
+
+    def test_errors(self):
+        spec = json.loads(json.dumps(SPEC))
+        spec['triggers']['pred.predation'] = ['prey.hunt.handle(extra)']
+        with self.assertRaises(ValueError):
+            ModelSpec(spec)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from iebm.events.death import DeathEvent
+from iebm.populations.population2D import Population2D
+from iebm.simulation import Simulation
+from iebm.traits.static_trait import StaticTrait
+
+
+def dying(size=5):
+    "helper function to build a population with only a death event"
+    np.random.seed(2)
+    pop = Population2D(name='pop', init_size=size, xdim=10, ydim=10)
+    pop.add_traits([(StaticTrait, {'name' : 'death_rate', 'value' : 0.1})])
+    pop.add_events([(DeathEvent, {'name' : 'death', 'is_primary' : True,
+                                  'current_time' : 0})])
+    return pop
+
+
+class TestSuspend(unittest.TestCase):
+    """ suspended individuals keep their parked times, shifted on resume,
+    and their scheduled event is skipped """
+
+    def setUp(self):
+        self.pop = dying()
+        self.sim = Simulation({'pop' : self.pop})
+        # individual with the first event in the heap
+        record = self.sim.scheduler.peek()
+        self.actor_id = record[3]
+        self.death_time = record[0]
+
+    def test_resume_shift(self):
+        self.pop.suspend(self.actor_id, 0.5, ['death_time'])
+        self.assertEqual(self.pop.get_next_event(self.actor_id), [])
+        new_events = self.pop.resume(self.actor_id, 2.0)
+        self.assertEqual(len(new_events), 1)
+        self.assertAlmostEqual(new_events[0][0], self.death_time + 1.5)
+        self.assertEqual(self.pop.suspended, {})
+
+    def test_suspend_twice(self):
+        self.pop.suspend(self.actor_id, 0.5, ['death_time'])
+        # the second suspend keeps the first parked times and start time
+        self.assertEqual(self.pop.suspend(self.actor_id, 1.0, ['death_time']), [])
+        self.assertEqual(self.pop.suspended[self.actor_id],
+                         (0.5, {'death_time' : self.death_time}))
+        new_events = self.pop.resume(self.actor_id, 2.0)
+        self.assertAlmostEqual(new_events[0][0], self.death_time + 1.5)
+
+    def test_cancelled(self):
+        size = self.pop.size
+        self.pop.suspend(self.actor_id, 0., ['death_time'])
+        self.assertEqual(len(self.pop.cancelled), 1)
+        # the scheduled death is skipped, and its hash is gone
+        lapse, _ = self.sim.step()
+        self.assertIsNone(lapse)
+        self.assertEqual(self.pop.cancelled, {})
+        self.assertEqual(self.pop.size, size)
+        self.assertIsNotNone(self.pop._get_actor_idx(self.actor_id))
+
+    def test_cancelled_past(self):
+        # a hash cancelled before its time already passed is dropped
+        self.pop.cancelled[12345] = 0.5
+        other_id = [i for i in self.pop.df[:, 'id'].to_list()[0]
+                    if i != self.actor_id][0]
+        self.pop.suspend(other_id, 1.0, ['death_time'])
+        self.assertNotIn(12345, self.pop.cancelled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+from iebm.events.interact2d import Interact2DEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.tiles import TiledSimulation
+from iebm.traits.categorical_trait import CategoricalTrait
+from iebm.traits.static_trait import StaticTrait
+
+
+def build(tile):
+    "module-level build function of 80 moving individuals, in two kinds"
+    pop = Population2D(name='pop', init_size=int(round(80 * tile.fraction)),
+                       xdim=tile.xdim, ydim=tile.ydim)
+    pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 0.5}),
+                    (StaticTrait, {'name' : 'interact_radius', 'value' : 0.5}),
+                    (StaticTrait, {'name' : 'velocity', 'value' : 1}),
+                    (CategoricalTrait, {'name' : 'kind',
+                                        'categories' : ['a', 'b'],
+                                        'fractions' : [0.5, 0.5],
+                                        'track' : True})])
+    pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                 'current_time' : 0, 'bounce' : 'random'}),
+                    (Interact2DEvent, {'name' : 'interact', 'is_primary' : True,
+                                       'current_time' : 0})])
+    pop.event_dict['wall'].triggers = pop.event_dict['interact'].set_next
+    return {'pop' : pop}
+
+
+class TestTiles(unittest.TestCase):
+    """ individuals crossing borders are handed over to the next tile,
+    none are lost or copied """
+
+    @classmethod
+    def setUpClass(cls):
+        np.random.seed(5)
+        cls.sim = TiledSimulation(build, xdim=20, ydim=10, tiles=(2, 1))
+        cls.sim.run(30, progress_bar=False)
+        cls.res = cls.sim.get_results()
+        cls.sim.close()
+
+    def test_handoff(self):
+        self.assertGreater(self.res['handoffs'], 0)
+        self.assertEqual(self.res['time'][-1], 30)
+
+    def test_conservation(self):
+        self.assertEqual(set(self.res['size']['pop']), {80})
+        for values, counts in self.res['trait'][('pop', 'kind')]:
+            self.assertEqual(dict(zip(values, counts)), {'a' : 40, 'b' : 40})
+
+    def test_border_loss(self):
+        # one border of length 10 in an area of 200, window 0.5
+        self.assertAlmostEqual(self.res['border_loss'],
+                               (2 * 1 + 2 * 0.5) * (1 / 20) / np.pi)
+
+
+if __name__ == '__main__':
+    unittest.main()
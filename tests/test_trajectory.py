@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from iebm.populations.population2D import Population2D
+from iebm.trajectory import TrajectoryRecorder, TrajectoryReader
+
+
+class TestTrajectory(unittest.TestCase):
+    """ snapshots read back are the ones recorded, also for integer
+    columns that become NA after the first snapshot """
+
+    def test_round_trip(self):
+        np.random.seed(3)
+        pop = Population2D(name='pop', init_size=4, xdim=10, ydim=10)
+        pop.df['interact_extra'] = np.array([7, 8, 9, 10], dtype=np.int32)
+        with tempfile.TemporaryDirectory() as path:
+            recorder = TrajectoryRecorder(path, interval=1,
+                                          columns={'pop' : ['interact_extra']})
+            recorder.open({'pop' : pop})
+            xs = pop.df[:, 'x'].to_numpy().reshape(-1)
+            recorder.snapshot('pop', pop, 0.)
+            # the partner of the first individual is gone
+            pop.df[0, 'interact_extra'] = None
+            recorder.snapshot('pop', pop, 1.)
+            recorder.close()
+
+            tracks = TrajectoryReader(path)
+            self.assertEqual(len(tracks), 2)
+            np.testing.assert_array_equal(tracks.times('pop'), [0., 1.])
+            first = tracks.frame('pop', 0)
+            second = tracks.at('pop', 1.5)
+            np.testing.assert_array_equal(first['x'], xs)
+            np.testing.assert_array_equal(first['id'], [0, 1, 2, 3])
+            self.assertEqual(first['id'].dtype.kind, 'i')
+            np.testing.assert_array_equal(first['interact_extra'],
+                                          [7, 8, 9, 10])
+            np.testing.assert_array_equal(second['interact_extra'],
+                                          [np.nan, 8, 9, 10])
+            self.assertEqual(list(tracks.decode('pop', 'status',
+                                                second['status'])),
+                             list(pop.categories['status'].names[
+                                 pop.df[:, 'status'].to_numpy().reshape(-1)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
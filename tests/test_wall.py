@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from iebm.events.birth import BirthEvent
+from iebm.events.wall import WallEvent
+from iebm.populations.population2D import Population2D
+from iebm.traits.static_trait import StaticTrait
+
+
+class TestLitter(unittest.TestCase):
+    """ every offspring of a litter gets a heading and a wall time """
+
+    def test_litter_of_three(self):
+        np.random.seed(4)
+        pop = Population2D(name='pop', init_size=5, xdim=50, ydim=50)
+        pop.add_traits([(StaticTrait, {'name' : 'radius', 'value' : 1}),
+                        (StaticTrait, {'name' : 'velocity', 'value' : 0.5}),
+                        (StaticTrait, {'name' : 'birth_rate', 'value' : 0.1}),
+                        (StaticTrait, {'name' : 'number_offspring', 'value' : 3})])
+        pop.add_events([(WallEvent, {'name' : 'wall', 'is_primary' : True,
+                                     'current_time' : 0, 'bounce' : 'random'}),
+                        (BirthEvent, {'name' : 'birth', 'is_primary' : True,
+                                      'current_time' : 0})])
+        new_events = pop.event_dict['birth'].handle(dict(actor_id=0,
+                                                         current_time=1.))
+        self.assertEqual(pop.size, 8)
+
+        litter = pop.df[5:, ['angle', 'vel_x', 'vel_y', 'wall_time']]
+        self.assertEqual(litter.countna().to_list(), [[0], [0], [0], [0]])
+        angle, vx, vy, wall_time = litter.to_numpy().T
+        np.testing.assert_allclose(vx, np.cos(angle) * 0.5)
+        np.testing.assert_allclose(vy, np.sin(angle) * 0.5)
+        self.assertTrue((wall_time > 1.).all())
+        # next events of the offspring and of the parent
+        self.assertEqual(len([e for e in new_events if len(e) > 0]), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()